@@ -0,0 +1,29 @@
+"""Unique index on character.external_id
+
+Revision ID: 7c1f3a9d2b64
+Revises: 44ab00d87364
+Create Date: 2026-10-17 10:12:31.418205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1f3a9d2b64'
+down_revision: Union[str, Sequence[str], None] = '44ab00d87364'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # El upsert masivo hace ON CONFLICT (external_id), que necesita un indice unico
+    op.create_index(op.f('ix_character_external_id'), 'character', ['external_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_character_external_id'), table_name='character')
@@ -0,0 +1,108 @@
+"""Precomputed stats counters maintained by triggers
+
+Revision ID: a6d2e4b8c913
+Revises: f3a9c2d71e58
+Create Date: 2026-10-17 20:14:05.271683
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d2e4b8c913'
+down_revision: Union[str, Sequence[str], None] = 'f3a9c2d71e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tabla -> [(metrica, columna agrupada)]
+STATS_TABLES = {
+    'character': [('clan_members', 'clan_id'), ('characters_by_rank', 'rank')],
+    'characterjutsulink': [('jutsu_learners', 'jutsu_id')],
+}
+UPSERT = 'ON CONFLICT (metric, bucket) DO UPDATE SET value = statscounter.value + excluded.value'
+
+
+def bucket(source: str, column: str) -> str:
+    return f"coalesce(CAST({source}.{column} AS TEXT), '')"
+
+
+def postgres_triggers():
+    # Triggers por sentencia con tablas de transicion: un delta agregado por contador y sentencia
+    for table, metrics in STATS_TABLES.items():
+        for event, sources in (('insert', ('new_rows',)), ('delete', ('old_rows',)), ('update', ('old_rows', 'new_rows'))):
+            parts = [
+                f"SELECT '{metric}' AS metric, {bucket(source, column)} AS bucket, {'-1' if source == 'old_rows' else '1'} AS delta FROM {source}"
+                for metric, column in metrics for source in sources
+            ]
+            delta = (
+                'INSERT INTO statscounter (metric, bucket, value) '
+                f"SELECT metric, bucket, sum(delta) FROM ({' UNION ALL '.join(parts)}) AS changes "
+                f'GROUP BY metric, bucket HAVING sum(delta) <> 0 ORDER BY metric, bucket {UPSERT}'
+            )
+            transition = ' '.join(f"{'OLD' if source == 'old_rows' else 'NEW'} TABLE AS {source}" for source in sources)
+            function = f'{table}_stats_{event}'
+            yield function, table, (
+                f'CREATE OR REPLACE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN {delta}; RETURN NULL; END $$',
+                f'CREATE TRIGGER {function} AFTER {event.upper()} ON {table} REFERENCING {transition} FOR EACH STATEMENT EXECUTE FUNCTION {function}()',
+            )
+
+
+def sqlite_triggers():
+    # SQLite solo tiene triggers por fila
+    def bump(metric, column, source, delta):
+        return f"INSERT INTO statscounter (metric, bucket, value) VALUES ('{metric}', {bucket(source, column)}, {delta}) {UPSERT};"
+
+    for table, metrics in STATS_TABLES.items():
+        yield f'{table}_stats_ai', f"CREATE TRIGGER {table}_stats_ai AFTER INSERT ON {table} BEGIN {' '.join(bump(m, c, 'new', 1) for m, c in metrics)} END"
+        yield f'{table}_stats_ad', f"CREATE TRIGGER {table}_stats_ad AFTER DELETE ON {table} BEGIN {' '.join(bump(m, c, 'old', -1) for m, c in metrics)} END"
+        for metric, column in metrics:
+            yield f'{table}_stats_au_{column}', (
+                f'CREATE TRIGGER {table}_stats_au_{column} AFTER UPDATE OF {column} ON {table} '
+                f'WHEN old.{column} IS NOT new.{column} BEGIN {bump(metric, column, "old", -1)} {bump(metric, column, "new", 1)} END'
+            )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('statscounter',
+    sa.Column('metric', sa.String(), nullable=False),
+    sa.Column('bucket', sa.String(), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('metric', 'bucket')
+    )
+    op.create_index('ix_statscounter_metric_value', 'statscounter', ['metric', 'value'], unique=False)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for _, _, statements in postgres_triggers():
+            for statement in statements:
+                op.execute(statement)
+    elif dialect == 'sqlite':
+        for _, statement in sqlite_triggers():
+            op.execute(statement)
+
+    # Carga inicial con los datos que ya existen
+    for table, metrics in STATS_TABLES.items():
+        for metric, column in metrics:
+            op.execute(
+                'INSERT INTO statscounter (metric, bucket, value) '
+                f"SELECT '{metric}', {bucket(table, column)}, count(*) FROM {table} GROUP BY {table}.{column}"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for function, table, _ in postgres_triggers():
+            op.execute(f'DROP TRIGGER IF EXISTS {function} ON {table}')
+            op.execute(f'DROP FUNCTION IF EXISTS {function}()')
+    elif dialect == 'sqlite':
+        for name, _ in sqlite_triggers():
+            op.execute(f'DROP TRIGGER IF EXISTS {name}')
+    op.drop_index('ix_statscounter_metric_value', table_name='statscounter')
+    op.drop_table('statscounter')
@@ -0,0 +1,43 @@
+"""Add row version and updated_at columns
+
+Revision ID: b52e8d0f6a13
+Revises: 7c1f3a9d2b64
+Create Date: 2026-10-17 11:40:08.203517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52e8d0f6a13'
+down_revision: Union[str, Sequence[str], None] = '7c1f3a9d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tablas que exponen ETag en la API
+VERSIONED_TABLES = ('clan', 'jutsu', 'character')
+
+
+def utc_now_default() -> sa.TextClause:
+    # La app guarda updated_at en UTC sin zona (utc_now): now() de PostgreSQL iria en la hora del servidor
+    if op.get_bind().dialect.name == 'postgresql':
+        return sa.text("timezone('utc', now())")
+    return sa.text('CURRENT_TIMESTAMP')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Los server_default rellenan las filas existentes: todas empiezan en la version 1
+    for table in VERSIONED_TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=utc_now_default(), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(VERSIONED_TABLES):
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'version')
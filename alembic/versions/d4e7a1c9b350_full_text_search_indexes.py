@@ -0,0 +1,82 @@
+"""Full-text and trigram search indexes
+
+Revision ID: d4e7a1c9b350
+Revises: b52e8d0f6a13
+Create Date: 2026-10-17 18:05:12.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e7a1c9b350'
+down_revision: Union[str, Sequence[str], None] = 'b52e8d0f6a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tabla -> (columnas del tsvector con su peso, columnas con indice trigram)
+SEARCH_TABLES = {
+    'character': ((('name', 'A'), ('full_name', 'A'), ('biography', 'C')), ('name', 'full_name')),
+    'clan': ((('name', 'A'), ('description', 'B')), ('name',)),
+    'jutsu': ((('name', 'A'),), ('name',)),
+}
+
+
+def sqlite_fts(table, columns):
+    # Tabla FTS5 de contenido externo sobre la tabla original, sincronizada con triggers por fila
+    names = ', '.join(column for column, _ in columns)
+    new_values = ', '.join(f'new.{column}' for column, _ in columns)
+    old_values = ', '.join(f'old.{column}' for column, _ in columns)
+    fts = f'{table}_fts'
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});'
+    return fts, [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f'CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END',
+        f'CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END',
+        f'CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN {delete_old} {insert_new} END',
+        # Indexa las filas que ya existen
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # tsvector y pg_trgm son de PostgreSQL; en SQLite la busqueda usa FTS5 (ver app/utils/search.py)
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for table, (columns, _) in SEARCH_TABLES.items():
+            for statement in sqlite_fts(table, columns)[1]:
+                op.execute(statement)
+    if dialect != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, (columns, trigram_columns) in SEARCH_TABLES.items():
+        vector = ' || '.join(f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')" for column, weight in columns)
+        # Columna generada: PostgreSQL la mantiene al dia en cada INSERT/UPDATE, sin triggers
+        op.execute(f'ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED')
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], postgresql_using='gin')
+        for column in trigram_columns:
+            # gin_trgm_ops acelera similarity/% (erratas) y tambien LIKE/ILIKE 'prefijo%'
+            op.create_index(f'ix_{table}_{column}_trgm', table, [column], postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for table, (columns, _) in SEARCH_TABLES.items():
+            fts, _ = sqlite_fts(table, columns)
+            for trigger in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {fts}_{trigger}')
+            op.execute(f'DROP TABLE IF EXISTS {fts}')
+    if dialect != 'postgresql':
+        return
+    for table, (_, trigram_columns) in SEARCH_TABLES.items():
+        for column in trigram_columns:
+            op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.drop_column(table, 'search_vector')
@@ -0,0 +1,35 @@
+"""B-tree indexes on character.clan_id, character.name and characterjutsulink.jutsu_id
+
+Revision ID: e81b5f3a2c47
+Revises: d4e7a1c9b350
+Create Date: 2026-10-17 18:09:47.115302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81b5f3a2c47'
+down_revision: Union[str, Sequence[str], None] = 'd4e7a1c9b350'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Miembros de un clan y filtro ?clan_id=
+    op.create_index(op.f('ix_character_clan_id'), 'character', ['clan_id'], unique=False)
+    # Orden y paginacion por nombre (?sort=name)
+    op.create_index(op.f('ix_character_name'), 'character', ['name'], unique=False)
+    # La PK (character_id, jutsu_id) no sirve para ir de un jutsu a sus usuarios
+    op.create_index(op.f('ix_characterjutsulink_jutsu_id'), 'characterjutsulink', ['jutsu_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_characterjutsulink_jutsu_id'), table_name='characterjutsulink')
+    op.drop_index(op.f('ix_character_name'), table_name='character')
+    op.drop_index(op.f('ix_character_clan_id'), table_name='character')
@@ -0,0 +1,32 @@
+"""Composite index (jutsu_id, character_id) on characterjutsulink
+
+Revision ID: f3a9c2d71e58
+Revises: e81b5f3a2c47
+Create Date: 2026-10-17 19:02:38.550914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c2d71e58'
+down_revision: Union[str, Sequence[str], None] = 'e81b5f3a2c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Sustituye al indice simple: sirve igual para filtrar por jutsu_id y ademas devuelve los
+    # usuarios de un jutsu ya ordenados por character_id (paginacion y agregados solo con el indice)
+    op.create_index('ix_characterjutsulink_jutsu_id_character_id', 'characterjutsulink', ['jutsu_id', 'character_id'], unique=False)
+    op.drop_index(op.f('ix_characterjutsulink_jutsu_id'), table_name='characterjutsulink')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_characterjutsulink_jutsu_id'), 'characterjutsulink', ['jutsu_id'], unique=False)
+    op.drop_index('ix_characterjutsulink_jutsu_id_character_id', table_name='characterjutsulink')
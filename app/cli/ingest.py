@@ -0,0 +1,382 @@
+"""
+Ingesta masiva offline de personajes desde un volcado JSON, NDJSON o CSV.
+
+El fichero se lee en streaming. Los clanes y jutsus se resuelven por nombre con mapas en
+memoria (los que no existen se crean). Los personajes se insertan o actualizan por
+external_id en lotes grandes, junto con sus enlaces CharacterJutsuLink. En PostgreSQL cada
+lote se carga con COPY en una tabla temporal y se vuelca con un unico INSERT ... ON CONFLICT.
+
+Cada lote se confirma por separado y deja un checkpoint: si la ingesta se corta, --resume
+continua desde el ultimo lote confirmado. Volver a ingerir el mismo fichero no duplica nada.
+
+Uso:
+    python -m app.cli.ingest personajes.ndjson --batch-size 5000
+    python -m app.cli.ingest personajes.csv --resume
+
+Formato de cada registro (en CSV, jutsus separados por '|'):
+    {"external_id": "naruto-001", "name": "Naruto", "rank": "Hokage", "clan": "Uzumaki",
+     "jutsus": ["Rasengan", {"name": "Kage Bunshin", "learned_in_episode": 1}]}
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config.settings import settings
+from ..db.session import async_session, dispose_engines
+from ..models.db_models import Character, Clan, Jutsu, utc_now
+from ..utils.bulk import build_insert_statement
+from ..utils.cache import response_cache
+from ..utils.links import upsert_links
+
+# Columnas de personaje que se leen del volcado
+CHARACTER_COLUMNS = ("external_id", "name", "full_name", "rank", "clan_id", "biography", "image_url")
+# Namespaces de cache que dependen de las tablas que escribe la ingesta
+INVALIDATED_NAMESPACES = ("characters", "clans", "jutsus", "clans:members")
+
+
+def api_cache_reachable() -> bool:
+    """
+    La cache de la API solo se puede invalidar desde este proceso si es compartida y esta en Redis:
+    la de memoria (y el almacen local de 'shared' sin CACHE_URL) es de cada worker.
+    """
+    return settings.CACHE_BACKEND == "shared" and bool(settings.CACHE_URL)
+
+
+async def invalidate_items(touched: Dict[str, Set[int]]) -> None:
+    # Entradas de elemento (namespace:item:id) de las filas que ha escrito un lote
+    for namespace, item_ids in touched.items():
+        for item_id in item_ids:
+            await response_cache.invalidate_item(namespace, item_id)
+
+
+# --- Lectura en streaming ---
+
+def _iter_json_array(file, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre un array JSON de objetos leyendo el fichero por bloques, sin cargarlo entero.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("El fichero JSON debe contener un array de objetos")
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,")
+        if buffer.startswith("]"):
+            return
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # El objeto esta partido entre dos bloques: leemos el siguiente y reintentamos
+            if eof:
+                raise
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield record
+        buffer = buffer[end:]
+
+
+def iter_records(path: str, file_format: str) -> Iterator[Dict[str, Any]]:
+    """
+    Registros del fichero, uno a uno y en orden.
+    """
+    with open(path, encoding="utf-8", newline="" if file_format == "csv" else None) as file:
+        if file_format == "ndjson":
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        elif file_format == "csv":
+            yield from csv.DictReader(file)
+        else:
+            yield from _iter_json_array(file)
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    formats = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv", ".json": "json"}
+    if extension not in formats:
+        raise ValueError(f"No se reconoce el formato de '{path}': usa --format json, ndjson o csv")
+    return formats[extension]
+
+
+# --- Normalizacion de registros ---
+
+@dataclass
+class ParsedRecord:
+    """
+    Registro del volcado listo para insertar: la fila de personaje y los nombres a resolver.
+    """
+    row: Dict[str, Any]
+    clan: Optional[str]
+    jutsus: List[Tuple[str, Optional[int]]]
+
+
+def _clean(value: Any) -> Any:
+    # En CSV los valores vacios llegan como cadenas vacias
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def parse_record(record: Dict[str, Any]) -> Optional[ParsedRecord]:
+    """
+    Normaliza un registro del volcado. Devuelve None si no tiene external_id o name.
+    """
+    row = {column: _clean(record.get(column)) for column in CHARACTER_COLUMNS}
+    if not row["external_id"] or not row["name"]:
+        return None
+    row["external_id"] = str(row["external_id"])
+    if row["clan_id"] is not None:
+        row["clan_id"] = int(row["clan_id"])
+
+    jutsus = record.get("jutsus") or []
+    if isinstance(jutsus, str):
+        jutsus = jutsus.split("|")
+    links = []
+    for jutsu in jutsus:
+        if isinstance(jutsu, dict):
+            name, episode = _clean(jutsu.get("name")), _clean(jutsu.get("learned_in_episode"))
+        else:
+            name, episode = _clean(jutsu), None
+        if name:
+            links.append((name, int(episode) if episode is not None else None))
+    return ParsedRecord(row=row, clan=_clean(record.get("clan")), jutsus=links)
+
+
+# --- Checkpoints ---
+
+def _fingerprint(path: str) -> Dict[str, Any]:
+    stat = os.stat(path)
+    return {"file": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def load_checkpoint(checkpoint_path: str, source_path: str) -> int:
+    """
+    Registros ya confirmados en una ejecucion anterior. Lanza error si el fichero ha cambiado desde entonces.
+    """
+    if not os.path.exists(checkpoint_path):
+        return 0
+    with open(checkpoint_path, encoding="utf-8") as file:
+        checkpoint = json.load(file)
+    if {key: checkpoint.get(key) for key in ("file", "size", "mtime")} != _fingerprint(source_path):
+        raise ValueError(f"El checkpoint {checkpoint_path} es de otro fichero o el fichero ha cambiado")
+    return checkpoint["records"]
+
+
+def save_checkpoint(checkpoint_path: str, source_path: str, records: int) -> None:
+    # Escritura atomica: un corte a mitad nunca deja un checkpoint corrupto
+    temporary = checkpoint_path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump({**_fingerprint(source_path), "records": records}, file)
+    os.replace(temporary, checkpoint_path)
+
+
+# --- Escritura en la BD ---
+
+@dataclass
+class IngestStats:
+    records: int = 0
+    upserted: int = 0
+    links: int = 0
+    skipped: int = 0
+    created_clans: int = 0
+    created_jutsus: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    def progress(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.upserted / elapsed if elapsed else 0.0
+        return f"{self.records} registros, {self.upserted} personajes, {self.links} enlaces, {self.skipped} descartados - {rate:,.0f} filas/s"
+
+
+async def load_name_map(db: AsyncSession, DBModel) -> Dict[str, int]:
+    """
+    Mapa nombre -> id de toda la tabla. Con nombres repetidos gana el id mas bajo.
+    """
+    table = DBModel.__table__
+    rows = (await db.execute(select(table.c.name, table.c.id).order_by(table.c.id.desc()))).all()
+    return {name: item_id for name, item_id in rows}
+
+
+async def create_missing(db: AsyncSession, DBModel, names: Sequence[str], name_map: Dict[str, int]) -> int:
+    """
+    Crea las filas de clan o jutsu que aun no existen y las añade al mapa de nombres.
+    """
+    missing = sorted({name for name in names if name not in name_map})
+    if not missing:
+        return 0
+    table = DBModel.__table__
+    now = utc_now()
+    statement = insert(table).returning(table.c.id, table.c.name, sort_by_parameter_order=True)
+    result = await db.execute(statement, [{"name": name, "version": 1, "updated_at": now} for name in missing])
+    for item_id, name in result.all():
+        name_map[name] = item_id
+    return len(missing)
+
+
+def _use_copy(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.driver == "asyncpg"
+
+
+async def upsert_characters_copy(db: AsyncSession, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    PostgreSQL: COPY del lote a una tabla temporal y un unico INSERT ... SELECT ... ON CONFLICT (external_id).
+    Devuelve el id de cada external_id.
+    """
+    await db.execute(text(
+        "CREATE TEMP TABLE ingest_character (external_id varchar, name varchar, full_name varchar, rank varchar, "
+        "clan_id integer, biography varchar, image_url varchar) ON COMMIT DROP"
+    ))
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(  # type: ignore[union-attr]
+        "ingest_character", records=[tuple(row[column] for column in CHARACTER_COLUMNS) for row in rows], columns=list(CHARACTER_COLUMNS),
+    )
+
+    columns = ", ".join(CHARACTER_COLUMNS)
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in CHARACTER_COLUMNS if column != "external_id")
+    result = await db.execute(
+        text(
+            f"INSERT INTO character ({columns}, created_at, version, updated_at) "
+            f"SELECT {columns}, CAST(:now AS timestamp), 1, CAST(:now AS timestamp) FROM ingest_character "
+            f"ON CONFLICT (external_id) DO UPDATE SET {updates}, version = character.version + 1, updated_at = EXCLUDED.updated_at "
+            "RETURNING id, external_id"
+        ),
+        {"now": utc_now()},
+    )
+    return {external_id: item_id for item_id, external_id in result.all()}
+
+
+async def upsert_characters_insert(db: AsyncSession, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Resto de dialectos: INSERT multi-fila ... ON CONFLICT (external_id), el mismo que usa el upsert de la API.
+    """
+    statement = build_insert_statement(db, Character, [column for column in CHARACTER_COLUMNS if column != "external_id"], "external_id")
+    now = utc_now()
+    result = await db.execute(statement, [{**row, "created_at": now, "version": 1, "updated_at": now} for row in rows])
+    return {row["external_id"]: item_id for row, item_id in zip(rows, result.scalars().all())}
+
+
+async def ingest_batch(db: AsyncSession, batch: List[ParsedRecord], clans: Dict[str, int], jutsus: Dict[str, int], stats: IngestStats, use_copy: bool) -> None:
+    """
+    Escribe y confirma un lote: clanes y jutsus nuevos, personajes y enlaces.
+    """
+    # Un mismo external_id dos veces en el lote haria fallar ON CONFLICT: gana el ultimo
+    records = list({record.row["external_id"]: record for record in batch}.values())
+
+    stats.created_clans += await create_missing(db, Clan, [record.clan for record in records if record.clan], clans)
+    stats.created_jutsus += await create_missing(db, Jutsu, [name for record in records for name, _ in record.jutsus], jutsus)
+
+    rows = []
+    for record in records:
+        row = dict(record.row)
+        if record.clan:
+            row["clan_id"] = clans[record.clan]
+        rows.append(row)
+
+    ids = await (upsert_characters_copy(db, rows) if use_copy else upsert_characters_insert(db, rows))
+
+    # Un enlace por (personaje, jutsu): si el registro repite un jutsu se queda el ultimo episodio
+    links: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for record in records:
+        character_id = ids[record.row["external_id"]]
+        for name, episode in record.jutsus:
+            links[(character_id, jutsus[name])] = {"character_id": character_id, "jutsu_id": jutsus[name], "learned_in_episode": episode}
+    if links:
+        await upsert_links(db, list(links.values()))
+
+    await db.commit()
+    stats.upserted += len(rows)
+    stats.links += len(links)
+    if api_cache_reachable():
+        await invalidate_items({
+            "characters": set(ids.values()),
+            "clans": {row["clan_id"] for row in rows if row.get("clan_id") is not None},
+            "jutsus": {jutsu_id for _, jutsu_id in links},
+        })
+
+
+async def ingest(path: str, file_format: str, batch_size: int, checkpoint_path: str, resume: bool, use_copy: Optional[bool] = None) -> IngestStats:
+    """
+    Ingiere el fichero completo por lotes, guardando un checkpoint tras cada lote confirmado.
+    """
+    start_at = load_checkpoint(checkpoint_path, path) if resume else 0
+    if start_at:
+        print(f"Reanudando desde el registro {start_at}")
+    stats = IngestStats(records=start_at)
+
+    async with async_session() as db:
+        if use_copy is None:
+            use_copy = _use_copy(db)
+        clans = await load_name_map(db, Clan)
+        jutsus = await load_name_map(db, Jutsu)
+        await db.commit()
+
+        batch: List[ParsedRecord] = []
+        for position, record in enumerate(iter_records(path, file_format)):
+            # Los registros ya confirmados se leen pero no se vuelven a escribir
+            if position < start_at:
+                continue
+            stats.records += 1
+            parsed = parse_record(record)
+            if parsed is None:
+                stats.skipped += 1
+            else:
+                batch.append(parsed)
+
+            if len(batch) >= batch_size:
+                await ingest_batch(db, batch, clans, jutsus, stats, use_copy)
+                save_checkpoint(checkpoint_path, path, stats.records)
+                print(stats.progress())
+                batch = []
+
+        if batch:
+            await ingest_batch(db, batch, clans, jutsus, stats, use_copy)
+        save_checkpoint(checkpoint_path, path, stats.records)
+
+    # Terminada la ingesta el checkpoint ya no hace falta
+    os.remove(checkpoint_path)
+    if api_cache_reachable():
+        for namespace in INVALIDATED_NAMESPACES:
+            await response_cache.invalidate_namespace(namespace)
+    else:
+        print(f"Aviso: la cache de la API (CACHE_BACKEND={settings.CACHE_BACKEND}) no esta en Redis y no se puede invalidar "
+              f"desde aqui; reinicia la API o espera CACHE_TTL_SECONDS ({settings.CACHE_TTL_SECONDS} s)")
+    return stats
+
+
+async def main(args: argparse.Namespace) -> None:
+    file_format = args.format or detect_format(args.path)
+    checkpoint_path = args.checkpoint or args.path + ".checkpoint.json"
+    try:
+        stats = await ingest(args.path, file_format, args.batch_size, checkpoint_path, args.resume, False if args.no_copy else None)
+    finally:
+        await dispose_engines()
+    print(f"Terminado: {stats.progress()}; {stats.created_clans} clanes y {stats.created_jutsus} jutsus nuevos")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Fichero JSON (array), NDJSON o CSV")
+    parser.add_argument("--format", choices=("json", "ndjson", "csv"), help="Formato del fichero (por defecto, segun la extension)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Registros por lote (una transaccion y un checkpoint por lote)")
+    parser.add_argument("--checkpoint", help="Fichero de checkpoint (por defecto <fichero>.checkpoint.json)")
+    parser.add_argument("--resume", action="store_true", help="Continua desde el ultimo lote confirmado")
+    parser.add_argument("--no-copy", action="store_true", help="No usa COPY aunque la BD sea PostgreSQL")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except ValueError as error:
+        sys.exit(str(error))
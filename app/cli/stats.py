@@ -0,0 +1,39 @@
+"""
+Reconstruccion completa de los contadores de /stats (tabla statscounter).
+
+Los contadores se mantienen solos con triggers; este comando es la alternativa si se han
+desajustado (datos cargados con los triggers desactivados, restauraciones parciales...).
+
+Uso:
+    python -m app.cli.stats            # recalcula todos los contadores
+    python -m app.cli.stats --check    # solo informa de los que no cuadran
+"""
+import argparse
+import asyncio
+import sys
+
+from ..db.session import dispose_engines, get_engine
+from ..utils.stats import rebuild_stats, stats_drift
+
+
+async def main(args: argparse.Namespace) -> int:
+    try:
+        async with get_engine().begin() as conn:
+            if args.check:
+                drift = await stats_drift(conn)
+                for metric, mismatches in drift.items():
+                    for bucket, stored, actual in mismatches:
+                        print(f"{metric}[{bucket or 'NULL'}]: guardado {stored}, real {actual}")
+                print("Contadores correctos" if not drift else f"Desajustes en: {', '.join(drift)}")
+                return 1 if drift else 0
+            await rebuild_stats(conn)
+    finally:
+        await dispose_engines()
+    print("Contadores reconstruidos")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="Compara los contadores con el recuento real sin modificarlos")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -7,13 +7,68 @@ load_dotenv()
 class Settings:
     """
     Centraliza todas las configuraciones de la aplicación.
-    Lee variables de .env y las valida.
+    Lee variables de .env al crearse; la validacion se hace al arrancar la app (validate),
+    asi importar los modulos no exige tener la BD configurada.
     """
-    # Base de datos
-    DATABASE_URL : str = os.getenv('DATABASE_URL','')
-    # Validaciones
-    if not DATABASE_URL:
-        raise ValueError("DATABASE_URL no está configurada en .env")
+
+    def __init__(self):
+        # Base de datos
+        self.DATABASE_URL : str = os.getenv('DATABASE_URL','')
+        # Replica de solo lectura para los GET (vacio = todo va a DATABASE_URL)
+        self.READ_DATABASE_URL : str = os.getenv('READ_DATABASE_URL','')
+        # Pool de conexiones (por worker): tamaño, conexiones extra, espera maxima y reciclado en segundos
+        self.DB_POOL_SIZE : int = int(os.getenv('DB_POOL_SIZE','5'))
+        self.DB_MAX_OVERFLOW : int = int(os.getenv('DB_MAX_OVERFLOW','10'))
+        self.DB_POOL_TIMEOUT : float = float(os.getenv('DB_POOL_TIMEOUT','30'))
+        self.DB_POOL_RECYCLE : int = int(os.getenv('DB_POOL_RECYCLE','-1'))
+        # Conexiones del pool que se abren al arrancar, para que las primeras peticiones no paguen la conexion
+        self.DB_POOL_WARM : int = int(os.getenv('DB_POOL_WARM','2'))
+        self.DB_POOL_PRE_PING : bool = os.getenv('DB_POOL_PRE_PING','false').lower() in ('1','true','yes')
+        self.DB_ECHO : bool = os.getenv('DB_ECHO','false').lower() in ('1','true','yes')
+        # Opciones de asyncpg: sentencias preparadas cacheadas por conexion y timeout de cada comando
+        self.DB_STATEMENT_CACHE_SIZE : int = int(os.getenv('DB_STATEMENT_CACHE_SIZE','100'))
+        self.DB_COMMAND_TIMEOUT : Optional[float] = float(os.getenv('DB_COMMAND_TIMEOUT')) if os.getenv('DB_COMMAND_TIMEOUT') else None
+        # Segundos que las lecturas de un cliente van a la BD principal despues de que escriba
+        self.READ_YOUR_WRITES_SECONDS : int = int(os.getenv('READ_YOUR_WRITES_SECONDS','5'))
+        # Cache de respuestas: 'memory' (LRU en proceso) o 'shared' (Redis en CACHE_URL o almacen local)
+        self.CACHE_BACKEND : str = os.getenv('CACHE_BACKEND','memory')
+        self.CACHE_URL : str = os.getenv('CACHE_URL','')
+        self.CACHE_TTL_SECONDS : int = int(os.getenv('CACHE_TTL_SECONDS','60'))
+        self.CACHE_MAX_ENTRIES : int = int(os.getenv('CACHE_MAX_ENTRIES','10000'))
+        # Metricas: umbral para avisar de queries lentas y cabecera Server-Timing (solo para depurar)
+        self.SLOW_QUERY_MS : float = float(os.getenv('SLOW_QUERY_MS','200'))
+        self.SERVER_TIMING : bool = os.getenv('SERVER_TIMING','false').lower() in ('1','true','yes')
+        # Control de admision (por worker): peticiones simultaneas por clase de ruta, cola de espera,
+        # espera maxima en la cola, espera reciente del pool a partir de la cual no se encola y Retry-After del 503
+        self.ADMISSION_CONTROL : bool = os.getenv('ADMISSION_CONTROL','true').lower() in ('1','true','yes')
+        self.ADMISSION_READ_CONCURRENCY : int = int(os.getenv('ADMISSION_READ_CONCURRENCY','50'))
+        self.ADMISSION_WRITE_CONCURRENCY : int = int(os.getenv('ADMISSION_WRITE_CONCURRENCY','20'))
+        self.ADMISSION_EXPORT_CONCURRENCY : int = int(os.getenv('ADMISSION_EXPORT_CONCURRENCY','2'))
+        self.ADMISSION_QUEUE_SIZE : int = int(os.getenv('ADMISSION_QUEUE_SIZE','100'))
+        self.ADMISSION_QUEUE_TIMEOUT : float = float(os.getenv('ADMISSION_QUEUE_TIMEOUT','1.0'))
+        self.ADMISSION_MAX_POOL_WAIT_MS : float = float(os.getenv('ADMISSION_MAX_POOL_WAIT_MS','250'))
+        self.ADMISSION_RETRY_AFTER : int = int(os.getenv('ADMISSION_RETRY_AFTER','1'))
+        # Compresion de las respuestas (Accept-Encoding): activada, codificaciones en orden de preferencia
+        # (vacio = las instaladas de zstd, br y gzip), tamaño minimo en bytes, tamaño a partir del cual se comprime
+        # en el threadpool (fuera del bucle de eventos) y memoria para cuerpos ya comprimidos
+        self.COMPRESSION : bool = os.getenv('COMPRESSION','true').lower() in ('1','true','yes')
+        self.COMPRESSION_ENCODINGS : str = os.getenv('COMPRESSION_ENCODINGS','')
+        self.COMPRESSION_MIN_SIZE : int = int(os.getenv('COMPRESSION_MIN_SIZE','1024'))
+        self.COMPRESSION_THREADPOOL_SIZE : int = int(os.getenv('COMPRESSION_THREADPOOL_SIZE', str(256 * 1024)))
+        self.COMPRESSION_CACHE_BYTES : int = int(os.getenv('COMPRESSION_CACHE_BYTES', str(64 * 1024 * 1024)))
+        # Feed de cambios: 'auto' (NOTIFY de PostgreSQL si la BD lo es, si no en memoria), 'postgres' o 'memory';
+        # eventos guardados para reanudar, cola por suscriptor, suscriptores por worker y segundos entre heartbeats
+        self.CHANGE_FEED_BACKEND : str = os.getenv('CHANGE_FEED_BACKEND','auto')
+        self.CHANGE_FEED_BUFFER : int = int(os.getenv('CHANGE_FEED_BUFFER','1000'))
+        self.CHANGE_FEED_QUEUE_SIZE : int = int(os.getenv('CHANGE_FEED_QUEUE_SIZE','500'))
+        self.CHANGE_FEED_MAX_SUBSCRIBERS : int = int(os.getenv('CHANGE_FEED_MAX_SUBSCRIBERS','1000'))
+        self.CHANGE_FEED_HEARTBEAT : float = float(os.getenv('CHANGE_FEED_HEARTBEAT','15'))
+    def validate(self) -> None:
+        """
+        Comprueba la configuracion obligatoria. Se llama al arrancar la app y al crear los engines.
+        """
+        if not self.DATABASE_URL:
+            raise ValueError("DATABASE_URL no está configurada en .env")
 
 
 # Crear una instancia global para usar en toda la app
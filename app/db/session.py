@@ -1,41 +1,261 @@
+import time
 from app.config.settings import settings
-from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-
-DATABASE_URL: str = settings.DATABASE_URL
-
-# Crear el engine asíncrono
-# El engine es el "gerente" de conexiones a la BD
-# echo=False significa que NO muestra las queries en la terminal
-# (cámbialo a True si quieres ver qué queries ejecuta)
-engine = create_async_engine(
-    DATABASE_URL,  # ← URL de settings
-    echo=False,
-    future=True
-)
-
-# Crear la factory de sesiones asíncronas
-# Esta "factory" es como una máquina que produce sesiones nuevas cuando las necesites
-async_session = async_sessionmaker(
-    engine,                    # ← usa el engine creado arriba
-    class_=AsyncSession,       # ← produce sesiones asíncronas
-    expire_on_commit=False,    # ← los datos siguen siendo válidos después de commit
-    autoflush=False            # ← no guarda automáticamente (tú controlas cuándo hacer commit)
-)
-
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    """
-    Proporciona una sesión asíncrona a los endpoints.
-    
-    FastAPI automáticamente:
-    1. Llama esta función.
-    2. Te da la sesión.
-    3. Cuando terminas, cierra la sesión.
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Optional
+from fastapi import Request, Response
+from sqlalchemy import QueuePool, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+from app.utils.metrics import InstrumentedQueuePool, instrument_engine
+
+# Cookie que marca a un cliente que acaba de escribir: mientras exista, sus lecturas van a la BD principal
+READ_YOUR_WRITES_COOKIE = "konohapi_primary"
+# Clave en session.info con el estado de la peticion (scope["state"]) y marca que deja el commit en el
+READ_YOUR_WRITES_STATE = "konohapi_committed"
+
+
+def engine_options(url: str, name: str) -> Dict[str, Any]:
+    """
+    Opciones de create_async_engine segun la configuracion del pool en settings.
+    El tamaño del pool es por proceso: con N workers el total de conexiones es N * (pool_size + max_overflow).
+    name identifica el engine en las metricas ('primary' o 'replica').
+    """
+    options: Dict[str, Any] = {
+        "echo": settings.DB_ECHO,           # True para ver en la terminal las queries que se ejecutan
+        "future": True,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,  # comprueba la conexion antes de usarla (descarta las caidas)
+        "pool_recycle": settings.DB_POOL_RECYCLE,    # cierra las conexiones con mas de N segundos (-1 = nunca)
+    }
+    backend = make_url(url).get_backend_name()
+
+    # SQLite (desarrollo y tests) no usa un pool con tamaño configurable
+    if backend != "sqlite":
+        options.update(
+            poolclass=InstrumentedQueuePool,  # mide la espera de cada checkout para /metrics
+            pool_logging_name=name,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+
+    # Las opciones de asyncpg van al connect() de cada conexion
+    if make_url(url).get_driver_name() == "asyncpg":
+        connect_args: Dict[str, Any] = {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+        if settings.DB_COMMAND_TIMEOUT is not None:
+            connect_args["command_timeout"] = settings.DB_COMMAND_TIMEOUT
+        options["connect_args"] = connect_args
+    return options
+
+
+# Engines y factories de sesiones del proceso. Se crean la primera vez que se usan, o en el
+# arranque de la app (lifespan), no al importar el modulo
+_engine: Optional[AsyncEngine] = None
+_read_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[async_sessionmaker] = None
+_read_session_factory: Optional[async_sessionmaker] = None
+
+
+def init_engines(database_url: Optional[str] = None, read_database_url: Optional[str] = None) -> AsyncEngine:
+    """
+    Crea el engine principal y el de lectura (si no existen ya) y devuelve el principal.
+    Sin argumentos usa DATABASE_URL y READ_DATABASE_URL; con ellos se puede apuntar la app
+    a otra BD (p. ej. SQLite en memoria para tests).
+    """
+    global _engine, _read_engine, _session_factory, _read_session_factory
+    if _engine is not None:
+        return _engine
+    if database_url is None:
+        settings.validate()
+        database_url = settings.DATABASE_URL
+    if read_database_url is None:
+        read_database_url = settings.READ_DATABASE_URL
+
+    # El engine es el "gerente" de conexiones a la BD
+    engine = create_async_engine(database_url, **engine_options(database_url, "primary"))
+    instrument_engine(engine, "primary")
+
+    # Engine de lectura: la replica si esta configurada y, si no, el mismo engine principal
+    read_engine = create_async_engine(read_database_url, **engine_options(read_database_url, "replica")) if read_database_url else engine
+    if read_engine is not engine:
+        instrument_engine(read_engine, "replica")
+
+    # La factory de sesiones es como una máquina que produce sesiones nuevas cuando las necesites
+    _session_factory = async_sessionmaker(
+        engine,                    # ← usa el engine creado arriba
+        class_=AsyncSession,       # ← produce sesiones asíncronas
+        expire_on_commit=False,    # ← los datos siguen siendo válidos después de commit
+        autoflush=False            # ← no guarda automáticamente (tú controlas cuándo hacer commit)
+    )
+    # Misma factory sobre el engine de lectura
+    _read_session_factory = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+    _engine, _read_engine = engine, read_engine
+    return engine
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Engine principal (se crea si todavia no existe).
+    """
+    return _engine or init_engines()
+
+
+def get_read_engine() -> AsyncEngine:
+    """
+    Engine de lectura: la replica o, sin replica, el principal.
+    """
+    init_engines()
+    return _read_engine # type: ignore
+
+
+def async_session() -> AsyncSession:
+    """
+    Nueva sesion sobre la BD principal (para usar con async with fuera de los endpoints).
+    """
+    init_engines()
+    return _session_factory() # type: ignore
+
+
+def read_async_session() -> AsyncSession:
+    """
+    Nueva sesion sobre el engine de lectura.
+    """
+    init_engines()
+    return _read_session_factory() # type: ignore
+
+
+async def dispose_engines() -> None:
+    """
+    Cierra las conexiones de los pools y olvida los engines (se vuelven a crear si se usan otra vez).
+    """
+    global _engine, _read_engine, _session_factory, _read_session_factory
+    engines = {id(engine): engine for engine in (_engine, _read_engine) if engine is not None}
+    _engine = _read_engine = _session_factory = _read_session_factory = None
+    for engine in engines.values():
+        await engine.dispose()
+
+
+async def warm_pool(engine: AsyncEngine, connections: int) -> int:
+    """
+    Abre hasta connections conexiones del pool (sin pasar de pool_size) y las devuelve, para que
+    las primeras peticiones no paguen el establecimiento de la conexion. Devuelve cuantas se han abierto.
     """
-    async with async_session() as session: # Al usar una clausula with nos aseguramos que la session se maneja correctamente y libera la memoria al finalizar su ejecucion
+    pool = engine.sync_engine.pool
+    if isinstance(pool, QueuePool):
+        connections = min(connections, pool.size())
+    if connections <= 0:
+        return 0
+
+    # Se mantienen todas abiertas hasta el final para que el pool no devuelva siempre la misma
+    async with AsyncExitStack() as stack:
+        for _ in range(connections):
+            conn = await stack.enter_async_context(engine.connect())
+            await conn.execute(text("SELECT 1"))
+    return connections
+
+
+async def ping(engine: AsyncEngine) -> float:
+    """
+    Ida y vuelta a la BD (SELECT 1) en segundos, con una conexion del pool.
+    """
+    start = time.perf_counter()
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return time.perf_counter() - start
+
+
+def has_read_replica() -> bool:
+    """
+    Indica si las lecturas van a una BD distinta de la principal.
+    """
+    return get_read_engine() is not get_engine()
+
+
+def session_target(session: AsyncSession) -> str:
+    """
+    BD a la que va una sesion ('primary' o 'replica'). Dos lecturas iguales contra BDs distintas
+    pueden dar resultados distintos (retraso de la replica), asi que no se agrupan.
+    """
+    return "replica" if has_read_replica() and session.bind is _read_engine else "primary"
+
+
+@asynccontextmanager
+async def _session_scope(factory: Callable[[], AsyncSession]) -> AsyncIterator[AsyncSession]:
+    async with factory() as session: # Al usar una clausula with nos aseguramos que la session se maneja correctamente y libera la memoria al finalizar su ejecucion
         try:
             yield session  # ← proporciona la sesión al endpoint
         except Exception:
             await session.rollback() # Si hay un error se deshacen los cambios
             raise #Se relanza la excepcion para que FastAPI la maneje
-        
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session: Session) -> None:
+    # La peticion ha escrito en la principal: ReadYourWritesMiddleware pondra la cookie en su respuesta
+    request_state = session.info.get(READ_YOUR_WRITES_STATE)
+    if request_state is not None:
+        request_state[READ_YOUR_WRITES_STATE] = True
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pone la cookie de read-your-writes en la respuesta que realmente se envia cuando la peticion ha
+    hecho commit en la BD principal, tambien si la ruta devuelve su propio Response (207, 204...).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_state = scope.setdefault("state", {})
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and request_state.get(READ_YOUR_WRITES_STATE) and has_read_replica() and settings.READ_YOUR_WRITES_SECONDS > 0:
+                cookie = Response()
+                cookie.set_cookie(READ_YOUR_WRITES_COOKIE, "1", max_age=settings.READ_YOUR_WRITES_SECONDS, httponly=True, samesite="lax")
+                message = {**message, "headers": [*message.get("headers", []), *(header for header in cookie.raw_headers if header[0] == b"set-cookie")]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+async def get_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Proporciona una sesión asíncrona sobre la BD principal a los endpoints que escriben.
+
+    FastAPI automáticamente:
+    1. Llama esta función.
+    2. Te da la sesión.
+    3. Cuando terminas, cierra la sesión.
+
+    Con replica de lectura, si la sesion hace commit se marca al cliente con una cookie para que sus
+    siguientes lecturas vayan tambien a la principal durante READ_YOUR_WRITES_SECONDS (lee sus
+    propias escrituras aunque la replica vaya con retraso). La pone ReadYourWritesMiddleware.
+    """
+    async with _session_scope(async_session) as session:
+        session.info[READ_YOUR_WRITES_STATE] = request.scope.setdefault("state", {})
+        yield session
+
+
+async def get_primary_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Sesión de lectura sobre la BD principal, sin marcar al cliente. Para lecturas que no toleran
+    el retraso de la replica, como las que rellenan la cache justo despues de una invalidacion.
+    """
+    async with _session_scope(async_session) as session:
+        yield session
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Proporciona una sesión para los endpoints de solo lectura: la replica si esta configurada,
+    o la BD principal si el cliente ha escrito hace poco (cookie de read-your-writes).
+    """
+    factory = read_async_session
+    if READ_YOUR_WRITES_COOKIE in request.cookies:
+        factory = async_session
+    async with _session_scope(factory) as session:
+        yield session
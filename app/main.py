@@ -1,11 +1,110 @@
-from fastapi import FastAPI
-from .routers import characters, clans, jutsus
-app = FastAPI()
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
 
-app.include_router(characters.router)
-app.include_router(clans.router)
-app.include_router(jutsus.router)
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-@app.get('/')
-async def hello():
-    return {'Hello ninjas!'}
\ No newline at end of file
+from .config.settings import settings
+from .db.session import ReadYourWritesMiddleware, dispose_engines, get_engine, get_read_engine, has_read_replica, init_engines, ping, warm_pool
+
+
+def create_app(database_url: Optional[str] = None, read_database_url: Optional[str] = None) -> FastAPI:
+    """
+    Factoria de la aplicacion. Importar este modulo no crea engines ni valida la configuracion:
+    eso pasa al arrancar (lifespan) o con la primera peticion que use la BD.
+    database_url y read_database_url sustituyen a DATABASE_URL / READ_DATABASE_URL (p. ej. en tests).
+
+        uvicorn app.main:create_app --factory
+    """
+    # Los routers se importan aqui: construir sus rutas y schemas es lo mas caro del arranque
+    from .routers import batch, changes, characters, clans, jutsus, search, stats
+    from .utils.admission import AdmissionMiddleware
+    from .utils.cache import response_cache
+    from .utils.changes import changes as change_feed
+    from .utils.compression import available_compressors
+    from .utils.metrics import MetricsMiddleware, render_metrics
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # La configuracion se valida al arrancar: un error aqui impide que el worker acepte peticiones
+        if database_url is None:
+            settings.validate()
+        # Una codificacion de COMPRESSION_ENCODINGS sin su paquete tambien es un error de arranque
+        available_compressors()
+        engine = init_engines(database_url, read_database_url)
+        await warm_pool(engine, settings.DB_POOL_WARM)
+        try:
+            yield
+        finally:
+            await change_feed.close()
+            await dispose_engines()
+
+    app = FastAPI(lifespan=lifespan)
+    if database_url is not None:
+        # Sin lifespan (p. ej. httpx.ASGITransport) los engines se crean con la primera peticion
+        init_engines(database_url, read_database_url)
+    # El ultimo middleware añadido es el mas externo: las metricas tambien cuentan los 503 del control de admision
+    app.add_middleware(ReadYourWritesMiddleware)
+    app.add_middleware(AdmissionMiddleware)
+    app.add_middleware(MetricsMiddleware)
+
+    app.include_router(characters.router)
+    app.include_router(clans.router)
+    app.include_router(jutsus.router)
+    app.include_router(search.router)
+    app.include_router(stats.router)
+    app.include_router(batch.router)
+    app.include_router(changes.router)
+
+    @app.get('/')
+    async def hello():
+        return {'Hello ninjas!'}
+
+    @app.get('/ready')
+    async def ready():
+        """
+        Comprobacion de disponibilidad: ida y vuelta a la BD principal (y a la replica) en milisegundos.
+        Responde 503 si alguna no contesta
+        """
+        targets = {"primary": get_engine()}
+        if has_read_replica():
+            targets["replica"] = get_read_engine()
+        results = await asyncio.gather(*(ping(engine) for engine in targets.values()), return_exceptions=True)
+
+        databases: Dict[str, Dict[str, Any]] = {}
+        for name, result in zip(targets, results):
+            if isinstance(result, BaseException):
+                databases[name] = {"status": "error", "error": type(result).__name__}
+            else:
+                databases[name] = {"status": "ok", "latency_ms": round(result * 1000, 2)}
+        is_ready = all(database["status"] == "ok" for database in databases.values())
+        return JSONResponse(
+            {"status": "ok" if is_ready else "unavailable", "databases": databases},
+            status_code=status.HTTP_200_OK if is_ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    @app.get('/cache/stats')
+    async def cache_stats():
+        """
+        Contadores de aciertos/fallos de la cache de respuestas
+        """
+        return response_cache.stats()
+
+    @app.get('/metrics', response_class=PlainTextResponse)
+    async def metrics():
+        """
+        Latencia por ruta, queries y tiempo de BD por peticion y estado de los pools, en formato Prometheus
+        """
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+
+def __getattr__(name: str):
+    # 'app.main:app' sigue funcionando (uvicorn, benchmarks): la app se crea la primera vez que se pide
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
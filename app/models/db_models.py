@@ -1,16 +1,44 @@
 from typing import List, Optional
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime, timezone
+from sqlalchemy import DateTime, Index
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+def utc_now() -> datetime:
+    """Fecha y hora actual en UTC, sin zona horaria (asi se guarda en la BD)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class utc_timestamp(FunctionElement):
+    """Equivalente en la BD de utc_now, para server_default: now() de PostgreSQL va en la zona del servidor"""
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utc_timestamp, "postgresql")
+def _utc_timestamp_postgresql(element, compiler, **kw):
+    return "timezone('utc', now())"
+
+@compiles(utc_timestamp)
+def _utc_timestamp_default(element, compiler, **kw):
+    # CURRENT_TIMESTAMP de SQLite ya es UTC
+    return "CURRENT_TIMESTAMP"
 
 class CharacterJutsuLink(SQLModel, table=True):
     character_id: Optional[int] = Field(default=None, foreign_key="character.id", primary_key=True)
     jutsu_id: Optional[int] = Field(default=None, foreign_key="jutsu.id", primary_key=True)
     learned_in_episode: Optional[int] = None
 
+    # La PK empieza por character_id: para ir de un jutsu a sus usuarios ya ordenados por personaje
+    # (paginas de /jutsus/{id}/users, personajes con jutsus en comun) hace falta el indice inverso
+    __table_args__ = (Index("ix_characterjutsulink_jutsu_id_character_id", "jutsu_id", "character_id"),)
+
 class Clan(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     description: Optional[str] = None
+    # Version de la fila: se incrementa en cada escritura y alimenta el ETag
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    updated_at: datetime = Field(default_factory=utc_now, sa_column_kwargs={"server_default": utc_timestamp()})
     members: List["Character"] = Relationship(back_populates="clan")
 
 class Jutsu(SQLModel, table=True):
@@ -18,17 +46,34 @@ class Jutsu(SQLModel, table=True):
     name: str
     type: Optional[str] = None
     rank: Optional[str] = None
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    updated_at: datetime = Field(default_factory=utc_now, sa_column_kwargs={"server_default": utc_timestamp()})
     users: List["Character"] = Relationship(back_populates="jutsus", link_model=CharacterJutsuLink)
 
 class Character(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    external_id: Optional[str] = None
-    name: str
+    external_id: Optional[str] = Field(default=None, unique=True, index=True)
+    name: str = Field(index=True)
     full_name: Optional[str] = None
     rank: Optional[str] = None
-    clan_id: Optional[int] = Field(default=None, foreign_key="clan.id")
+    clan_id: Optional[int] = Field(default=None, foreign_key="clan.id", index=True)
     clan: Optional[Clan] = Relationship(back_populates="members")
     jutsus: List[Jutsu] = Relationship(back_populates="users", link_model=CharacterJutsuLink)
     biography: Optional[str] = None
     image_url: Optional[str] = None
-    created_at: datetime = Field(default_factory = lambda : datetime.now(timezone.utc).replace(tzinfo=None))
\ No newline at end of file
+    created_at: datetime = Field(default_factory = utc_now)
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    updated_at: datetime = Field(default_factory = utc_now, sa_column_kwargs={"server_default": utc_timestamp()})
+
+class StatsCounter(SQLModel, table=True):
+    """
+    Contadores precalculados de /stats (miembros por clan, personajes por rango, usuarios por jutsu).
+    Los mantienen triggers de la BD en la misma transaccion que la escritura (ver app/utils/stats.py)
+    """
+    metric: str = Field(primary_key=True)
+    # Valor agrupado como texto (id del clan o del jutsu, rango); '' representa NULL
+    bucket: str = Field(primary_key=True)
+    value: int = Field(default=0)
+
+    # Los 'top N' de una metrica se leen recorriendo este indice, sin ordenar
+    __table_args__ = (Index("ix_statscounter_metric_value", "metric", "value"),)
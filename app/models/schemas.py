@@ -1,5 +1,8 @@
 from sqlmodel import SQLModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Generic, Optional, List, TypeVar
+
+ItemType = TypeVar("ItemType")
 
 class CharacterCreate(SQLModel):
     name: str
@@ -37,7 +40,6 @@ class ClanRead(SQLModel):
     id: int
     name: str
     description: Optional[str] = None
-    members: List[CharacterRead] = []
 
 class ClanUpdate(SQLModel):
     name: Optional[str] = None
@@ -61,4 +63,129 @@ class JutsuRead(SQLModel):
 class JutsuUpdate(SQLModel):
     name: Optional[str] = None
     type: Optional[str] = None
-    rank: Optional[str] = None
\ No newline at end of file
+    rank: Optional[str] = None
+
+# Schemas con relaciones expandidas (?expand=). Las relaciones solo aparecen si se piden
+class CharacterReadExpanded(CharacterRead):
+    clan: Optional["ClanReadExpanded"] = None
+    jutsus: Optional[List["JutsuReadExpanded"]] = None
+
+class ClanReadExpanded(ClanRead):
+    members: Optional[List[CharacterReadExpanded]] = None
+
+class JutsuReadExpanded(JutsuRead):
+    users: Optional[List[CharacterReadExpanded]] = None
+
+CharacterReadExpanded.model_rebuild()
+
+# Paginacion
+class PageMeta(BaseModel):
+    """Metadatos de una pagina de resultados"""
+    limit: int
+    count: int
+    sort: str
+    has_more: bool
+    next_cursor: Optional[str] = None
+
+class Page(BaseModel, Generic[ItemType]):
+    items: List[ItemType]
+    meta: PageMeta
+
+class MultiGet(BaseModel, Generic[ItemType]):
+    """Lectura multiple (?ids=): elementos en el orden pedido y los ids que no existen"""
+    items: List[ItemType]
+    missing: List[int]
+
+# Operaciones masivas
+class BulkItemResult(BaseModel):
+    """Resultado de un elemento de una peticion masiva, en el mismo orden que la entrada"""
+    index: int
+    status: str
+    id: Optional[int] = None
+    # Version de la fila tras la escritura (1 si se ha creado): sirve para el ETag / If-Match
+    version: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    committed: bool
+    results: List[BulkItemResult]
+
+# Jutsus aprendidos (tabla CharacterJutsuLink)
+class JutsuLearn(BaseModel):
+    jutsu_id: int
+    learned_in_episode: Optional[int] = None
+
+class CharacterLearn(BaseModel):
+    character_id: int
+    learned_in_episode: Optional[int] = None
+
+class LinkRead(BaseModel):
+    """Enlace personaje-jutsu tal como queda en la BD"""
+    character_id: int
+    jutsu_id: int
+    learned_in_episode: Optional[int] = None
+
+class LearnedJutsu(JutsuRead):
+    learned_in_episode: Optional[int] = None
+
+class JutsuUser(CharacterRead):
+    learned_in_episode: Optional[int] = None
+
+class SharedJutsusCharacter(BaseModel):
+    """Personaje con jutsus en comun con otro, y cuantos comparten"""
+    id: int
+    name: str
+    shared_jutsus: int
+
+# Estadisticas precalculadas
+class ClanMembersStat(BaseModel):
+    id: int
+    name: str
+    members: int
+
+class ClanStats(BaseModel):
+    clans: List[ClanMembersStat]
+    without_clan: int
+
+class RankStat(BaseModel):
+    rank: Optional[str] = None
+    characters: int
+
+class JutsuLearnersStat(BaseModel):
+    id: int
+    name: str
+    learners: int
+
+# Busqueda
+class SearchHit(BaseModel):
+    """Resultado de busqueda, con su puntuacion de relevancia (mayor = mas relevante)"""
+    id: int
+    name: str
+    score: float
+
+class SearchResults(BaseModel):
+    query: str
+    characters: Optional[List[SearchHit]] = None
+    clans: Optional[List[SearchHit]] = None
+    jutsus: Optional[List[SearchHit]] = None
+
+# Peticiones agrupadas (/batch)
+class BatchSubRequest(BaseModel):
+    """Subpeticion de /batch: metodo, ruta con su query y cuerpo JSON opcional"""
+    method: str = Field("GET", pattern="^(GET|HEAD|POST|PUT|PATCH|DELETE)$")
+    path: str = Field(..., max_length=2000)
+    body: Optional[Any] = None
+    headers: Optional[Dict[str, str]] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest]
+
+class BatchSubResponse(BaseModel):
+    status: int
+    headers: Dict[str, str]
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException, Request, Response, status
+
+from ..models.schemas import BatchRequest, BatchResponse
+from ..utils.batch import MAX_BATCH_REQUESTS, run_batch
+
+router = APIRouter(prefix="/batch", tags=["Batch"])
+
+
+@router.post('', response_model=BatchResponse, status_code=status.HTTP_200_OK)
+async def batch(*, request: Request, response: Response, batch_in: BatchRequest):
+    """
+    Ejecuta varias peticiones de la API en una sola llamada. Las lecturas consecutivas se ejecutan
+    a la vez y las escrituras en orden; cada subpeticion tiene su propio status, cabeceras y cuerpo
+    """
+    if not batch_in.requests:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La lista de peticiones esta vacia")
+    if len(batch_in.requests) > MAX_BATCH_REQUESTS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Maximo {MAX_BATCH_REQUESTS} peticiones por batch")
+
+    sub_requests = [sub.model_dump() for sub in batch_in.requests]
+    results, set_cookies = await run_batch(request.app, request.scope, sub_requests, dict(request.cookies))
+    # Las cookies de las subpeticiones (p. ej. read-your-writes tras una escritura) llegan al cliente
+    for header in set_cookies:
+        response.headers.append("set-cookie", header)
+    return {"responses": results}
@@ -0,0 +1,134 @@
+import asyncio
+import json
+from typing import Any, Dict, Optional, Set
+
+from fastapi import APIRouter, Header, HTTPException, Query, WebSocket, WebSocketDisconnect, WebSocketException, status
+from fastapi.responses import StreamingResponse
+
+from ..config.settings import settings
+from ..models.db_models import Character, Clan, Jutsu
+from ..utils.changes import Subscription, changes, resource_name
+
+router = APIRouter(prefix="/changes", tags=["Changes"])
+
+# Recursos que publican eventos en el feed
+FEED_RESOURCES = tuple(resource_name(DBModel) for DBModel in (Character, Clan, Jutsu))
+resources_description = f"Recursos separados por comas ({', '.join(FEED_RESOURCES)}). Por defecto todos"
+after_description = "Cursor del ultimo evento recibido: se reenvian los eventos posteriores que sigan en el historial"
+
+
+def parse_resources(resources: Optional[str]) -> Optional[Set[str]]:
+    if not resources:
+        return None
+    selected = {name.strip() for name in resources.split(",") if name.strip()}
+    unknown = sorted(selected - set(FEED_RESOURCES))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Recursos no validos: {', '.join(unknown)}. Recursos disponibles: {', '.join(FEED_RESOURCES)}",
+        )
+    return selected
+
+
+class FeedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que da de baja la suscripcion al terminar, pase lo que pase: si el cliente
+    se va antes de que empiece el cuerpo, el generador no llega a arrancar y su finally no se ejecuta.
+    """
+
+    def __init__(self, subscription: Subscription, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.subscription = subscription
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            changes.unsubscribe(self.subscription)
+
+
+async def next_message(subscription: Subscription) -> Dict[str, Any]:
+    """
+    Siguiente mensaje para el cliente: un cambio, un reset (tiene que volver a cargar los datos)
+    o un ping si no ha pasado nada en CHANGE_FEED_HEARTBEAT segundos.
+    """
+    try:
+        change = await asyncio.wait_for(subscription.get(), settings.CHANGE_FEED_HEARTBEAT)
+    except asyncio.TimeoutError:
+        return {"type": "ping"}
+    if "reset" in change:
+        return {"type": "reset", "reason": change["reset"], "cursor": changes.broker.cursor()}
+    return {"type": "change", **change}
+
+
+@router.get('/stream', response_class=StreamingResponse, status_code=status.HTTP_200_OK)
+async def stream_changes(
+    *,
+    resources: Optional[str] = Query(None, description=resources_description),
+    after: Optional[str] = Query(None, description=after_description),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Feed de cambios por Server-Sent Events. Cada evento 'change' lleva recurso, operacion, id y version
+    de la fila; el id del evento es el cursor, asi que el navegador reanuda solo con Last-Event-ID
+    """
+    selected = parse_resources(resources)
+    subscription = changes.subscribe("sse", selected, last_event_id or after)
+    if subscription is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Demasiados suscriptores al feed de cambios")
+
+    async def events():
+        yield f"retry: 3000\nevent: ready\ndata: {json.dumps({'cursor': changes.broker.cursor()})}\n\n"
+        while True:
+            message = await next_message(subscription)
+            if message["type"] == "ping":
+                yield ": ping\n\n"
+            elif message["type"] == "reset":
+                yield f"event: reset\ndata: {json.dumps(message)}\n\n"
+            else:
+                yield f"id: {message['cursor']}\nevent: change\ndata: {json.dumps(message)}\n\n"
+
+    # La baja la hace la respuesta y no el generador: asi tambien se cubre la desconexion antes del cuerpo
+    return FeedStreamingResponse(subscription, events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket('/ws')
+async def websocket_changes(
+    websocket: WebSocket,
+    resources: Optional[str] = Query(None, description=resources_description),
+    after: Optional[str] = Query(None, description=after_description),
+):
+    """
+    Feed de cambios por WebSocket: mismos mensajes que el SSE, como JSON con un campo 'type'
+    ('ready', 'change', 'reset' o 'ping')
+    """
+    try:
+        selected = parse_resources(resources)
+    except HTTPException as error:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=error.detail)
+    subscription = changes.subscribe("websocket", selected, after)
+    if subscription is None:
+        raise WebSocketException(code=status.WS_1013_TRY_AGAIN_LATER, reason="Demasiados suscriptores al feed de cambios")
+
+    async def send_messages():
+        await websocket.send_json({"type": "ready", "cursor": changes.broker.cursor()})
+        while True:
+            await websocket.send_json(await next_message(subscription))
+
+    async def wait_disconnect():
+        # El cliente no envia nada: solo se lee para enterarse de que se ha ido
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    await websocket.accept()
+    tasks = [asyncio.create_task(send_messages()), asyncio.create_task(wait_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        changes.unsubscribe(subscription)
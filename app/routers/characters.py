@@ -1,12 +1,13 @@
-from fastapi import APIRouter,status, Depends, HTTPException
+from fastapi import APIRouter,status, Depends, HTTPException, Body, Query
 from sqlmodel import select
 
 from ..utils.db_utilities import search_model_by_id, update_model
-from ..models.schemas import CharacterCreate, CharacterRead, CharacterUpdate
-from typing import Dict, List
+from ..models.schemas import CharacterCreate, CharacterRead, CharacterUpdate, CharacterReadExpanded, JutsuLearn, LearnedJutsu, LinkRead, Page, SharedJutsusCharacter
+from typing import Dict, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from ..db.session import get_session
-from ..models.db_models import Character
+from ..db.session import get_read_session, get_session
+from ..models.db_models import Character, Jutsu
+from ..utils.links import characters_sharing_jutsus, check_link_batch, decode_link_cursor, delete_link, ensure_exist, invalidate_link_views, link_page, linked_page, record_link_changes, upsert_links
 from .crud_router import create_crud_router, CRUDConfig
 
 #Definimos la configuracion de personajes
@@ -15,11 +16,74 @@ character_config = CRUDConfig(
     create_schema = CharacterCreate,
     read_schema = CharacterRead,
     update_schema = CharacterUpdate,
+    expand_schema = CharacterReadExpanded,
     path_prefix = "/characters",
-    tag = "Characters"
+    tag = "Characters",
+    filter_fields = {"rank": "eq", "clan_id": "eq", "name": "prefix"},
+    sort_fields = ["name", "rank", "created_at"],
+    upsert_key = "external_id",
+    invalidates = ["clans:members"],
+    coalesce_reads = True
 )
 
 #Definimos el router de characters
 router = create_crud_router(config=character_config)
 
-#TODO : Implementar un endpoint para aprender jutsus
+# --- Jutsus aprendidos (tabla CharacterJutsuLink) ---
+@router.post("/{character_id}/jutsus", response_model=List[LinkRead], status_code=status.HTTP_201_CREATED)
+async def learn_jutsus(character_id: int, jutsus_in: List[JutsuLearn] = Body(...), db: AsyncSession = Depends(get_session)):
+    """
+    Enseña varios jutsus a un personaje con un solo INSERT ... ON CONFLICT. Si ya conocia alguno,
+    solo se actualiza learned_in_episode (cuando viene informado)
+    """
+    check_link_batch(jutsus_in)
+    await ensure_exist(db, Character, [character_id])
+    await ensure_exist(db, Jutsu, [item.jutsu_id for item in jutsus_in])
+    links = await upsert_links(db, [{"character_id": character_id, **item.model_dump()} for item in jutsus_in])
+    pairs = [(link["character_id"], link["jutsu_id"]) for link in links]
+    await record_link_changes(db, "link", pairs)
+    await db.commit()
+    await invalidate_link_views(pairs)
+    return links
+
+@router.get("/{character_id}/jutsus", response_model=Page[LearnedJutsu])
+async def get_character_jutsus(
+    character_id: int,
+    db: AsyncSession = Depends(get_read_session),
+    limit: int = Query(50, ge=1, le=200, description="Numero maximo de jutsus por pagina"),
+    cursor: Optional[str] = Query(None, description="Token next_cursor devuelto por la pagina anterior"),
+):
+    """
+    Jutsus que conoce un personaje, ordenados por id y leidos desde la tabla de enlaces
+    """
+    rows, has_more = await linked_page(db, "character_id", character_id, Jutsu, limit, decode_link_cursor(cursor, "jutsu_id", Jutsu))
+    # Solo sin resultados hace falta distinguir 'sin jutsus' de 'no existe'
+    if not rows and not cursor:
+        await ensure_exist(db, Character, [character_id])
+    return link_page(rows, has_more, limit, "jutsu_id")
+
+@router.delete("/{character_id}/jutsus/{jutsu_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def forget_jutsu(character_id: int, jutsu_id: int, db: AsyncSession = Depends(get_session)) -> None:
+    """
+    Elimina el enlace entre un personaje y un jutsu
+    """
+    if not await delete_link(db, character_id, jutsu_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"El personaje {character_id} no conoce el jutsu {jutsu_id}")
+    await record_link_changes(db, "unlink", [(character_id, jutsu_id)])
+    await db.commit()
+    await invalidate_link_views([(character_id, jutsu_id)])
+
+@router.get("/{character_id}/shared-jutsus", response_model=List[SharedJutsusCharacter])
+async def get_characters_sharing_jutsus(
+    character_id: int,
+    db: AsyncSession = Depends(get_read_session),
+    limit: int = Query(10, ge=1, le=100, description="Numero maximo de personajes"),
+    min_shared: int = Query(1, ge=1, description="Jutsus en comun minimos"),
+):
+    """
+    Personajes que comparten jutsus con este, de mas a menos jutsus en comun (una sola query agregada)
+    """
+    rows = await characters_sharing_jutsus(db, character_id, limit, min_shared)
+    if not rows:
+        await ensure_exist(db, Character, [character_id])
+    return rows
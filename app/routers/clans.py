@@ -1,12 +1,18 @@
-from fastapi import APIRouter,status, Depends, HTTPException
+from fastapi import APIRouter,status, Depends, HTTPException, Request
 from sqlmodel import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import noload, selectinload
 from ..utils.db_utilities import search_model_by_id, update_model
-from ..models.schemas import ClanCreate,ClanRead,ClanUpdate
+from ..models.schemas import ClanCreate,ClanRead,ClanUpdate,ClanReadExpanded,ClanReadWithMembers
 from typing import Dict, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from ..db.session import get_session
+from ..db.session import get_primary_session, get_session, session_target
 from ..models.db_models import Clan
+from ..utils.cache import response_cache
+from ..utils.coalesce import flight_key, read_flights
+from ..utils.compression import ResponseCompressor
+from ..utils.serialization import json_dumper
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from .crud_router import create_crud_router, CRUDConfig
 
 #Definimos la configuracion de personajes
@@ -15,21 +21,45 @@ clan_config = CRUDConfig(
     create_schema = ClanCreate,
     read_schema = ClanRead,
     update_schema = ClanUpdate,
+    expand_schema = ClanReadExpanded,
     path_prefix = "/clans",
-    tag = "Clans"
+    tag = "Clans",
+    filter_fields = {"name": "prefix"},
+    sort_fields = ["name"],
+    cache_enabled = True,
+    invalidates = ["clans:members"],
+    coalesce_reads = True
 )
 
 #Definimos el router de characters
 router = create_crud_router(config=clan_config)
+dumps = json_dumper(clan_config.use_orjson)
+# La vista con miembros esta cacheada: su cuerpo comprimido tambien se reutiliza
+members_compressor = ResponseCompressor("clans:members", clan_config.compression_min_size, clan_config.compression_levels, reuse=True)
 
 # AÑADIMOS esto al router existente para sobrescribir o extender
-@router.get("/{clan_id}/{with_members}", response_model=ClanRead)
-async def get_clan_with_members(clan_id: int, db: AsyncSession = Depends(get_session),with_members: bool = False):
-    # Usamos selectinload para traer los miembros en la misma consulta de forma eficiente
-    query = select(Clan).where(Clan.id == clan_id).options(selectinload(Clan.members) if with_members else None)
-    result = await db.execute(query)
-    clan = result.scalars().first()
-    
-    if not clan:
-        raise HTTPException(status_code=404, detail="Clan not found")
-    return clan
\ No newline at end of file
+@router.get("/{clan_id}/{with_members}", response_model=ClanReadWithMembers)
+async def get_clan_with_members(request: Request, clan_id: int, db: AsyncSession = Depends(get_primary_session),with_members: bool = False):
+    async def load_clan():
+        # Vista de un solo clan con todos sus miembros (sin el limite de ?expand=members):
+        # selectinload, o noload si no se piden para que la serializacion no intente una carga perezosa
+        options = [selectinload(Clan.members)] if with_members else [noload(Clan.members)]
+        query = select(Clan).where(Clan.id == clan_id).options(*options)
+        result = await db.execute(query)
+        clan = result.scalars().first()
+
+        if not clan:
+            raise HTTPException(status_code=404, detail="Clan not found")
+        return jsonable_encoder(ClanReadWithMembers.model_validate(clan))
+
+    # Se invalida con cualquier escritura de clanes o personajes (namespace 'clans:members')
+    if not clan_config.coalesce_reads:
+        payload = await response_cache.get_or_load("clans:members", f"{clan_id}:{with_members}", load_clan)
+        return JSONResponse(payload)
+
+    async def build_body() -> bytes:
+        return dumps(await response_cache.get_or_load("clans:members", f"{clan_id}:{with_members}", load_clan))
+
+    # Con un clan de moda, las peticiones simultaneas (fallos de cache incluidos) comparten una carga y un cuerpo
+    key = flight_key("clans:members", clan_id, with_members, session_target(db))
+    return await members_compressor.response(request, await read_flights.run("clans:members", key, build_body, clan_config.coalesce_timeout))
\ No newline at end of file
@@ -1,12 +1,26 @@
-from dataclasses import dataclass
-from typing import Generic, Type, TypeVar
+from dataclasses import dataclass, field
+from typing import Generic, Type, TypeVar, Union
 from sqlmodel import SQLModel, select
-from fastapi import APIRouter, Body, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Any
+from typing import Dict, List, Any, Optional, Tuple
 
-from ..db.session import get_session
-from ..utils.db_utilities import search_model_by_id, update_model
+from ..db.session import get_primary_session, get_read_session, get_session, session_target
+from ..models.schemas import BulkResult, MultiGet, Page, PageMeta
+from ..utils.bulk import bulk_insert
+from ..utils.cache import response_cache
+from ..utils.changes import record_change
+from ..utils.coalesce import flight_key, read_flights
+from ..utils.compression import ResponseCompressor
+from ..utils.db_utilities import delete_model_returning, not_found, precondition_failed, search_model_by_id, supports_returning, update_model, update_model_returning
+from ..utils.etag import body_etag, collection_etag, make_etag, none_match, parse_if_match, version_matches
+from ..utils.expand import dump_expanded, expand_options, load_collections, parse_expand
+from ..utils.export import EXPORT_MEDIA_TYPES, stream_export
+from ..utils.fields import load_only_option, parse_fields, project_item
+from ..utils.serialization import dump_model_json, json_dumper
+from ..utils.pagination import apply_filters, apply_keyset, build_filter_dependency, decode_cursor, encode_cursor, parse_ids, parse_sort
 
 # 1. Definimos nuestros marcadores de posición de tipo (TypeVars)
 DbModelType = TypeVar("DbModelType", bound=SQLModel)
@@ -26,6 +40,49 @@ class CRUDConfig(Generic[DbModelType, CreateSchemaType, ReadSchemaType, UpdateSc
     update_schema: Type[UpdateSchemaType]
     path_prefix: str
     tag: str
+    # Filtros permitidos en el listado: campo -> operador ('eq' o 'prefix')
+    filter_fields: Dict[str, str] = field(default_factory=dict)
+    # Campos por los que se puede ordenar el listado (el id siempre esta permitido)
+    sort_fields: List[str] = field(default_factory=list)
+    # Tamaño de pagina por defecto y maximo que acepta el servidor
+    default_limit: int = 50
+    max_limit: int = 200
+    # Filas que se piden a la BD y se escriben en cada bloque de la exportacion
+    export_chunk_size: int = 1000
+    # Columna con indice unico usada para ON CONFLICT en el upsert masivo (None = sin upsert)
+    upsert_key: Optional[str] = None
+    # Filas por INSERT multi-fila y maximo de elementos por peticion masiva
+    bulk_batch_size: int = 500
+    bulk_max_items: int = 10000
+    # Escrituras con una sola sentencia UPDATE/DELETE ... RETURNING.
+    # Con False se usa el camino ORM (cargar, modificar, commit, refresh)
+    use_returning: bool = True
+    # Cache de lectura para GET por id y listados (pensada para datos de referencia)
+    cache_enabled: bool = False
+    cache_ttl: Optional[int] = None
+    # Namespaces de cache de otras vistas que dependen de este modelo y se invalidan al escribir
+    invalidates: List[str] = field(default_factory=list)
+    # Schema de lectura con las relaciones opcionales para ?expand= (None = read_schema)
+    expand_schema: Optional[Type[SQLModel]] = None
+    # Limites de expansion: profundidad de la ruta, rutas por peticion y elementos por coleccion
+    max_expand_depth: int = 2
+    max_expand_paths: int = 4
+    max_expand_items: int = 100
+    # Serializacion rapida del listado y del GET por id: se vuelcan directamente a bytes JSON
+    # con un TypeAdapter cacheado, sin la segunda validacion de FastAPI contra el response_model
+    fast_serialization: bool = True
+    # Vuelca con orjson los payloads que ya son dicts (requiere el paquete 'orjson' instalado)
+    use_orjson: bool = False
+    # Agrupa las lecturas concurrentes identicas (listado y GET por id) en una sola carga (single-flight)
+    # y espera maxima de las peticiones agrupadas antes de responder 504
+    coalesce_reads: bool = False
+    coalesce_timeout: float = 5.0
+    # Compresion negociada (gzip, br, zstd) del listado y del GET por id: tamaño minimo en bytes
+    # (None = COMPRESSION_MIN_SIZE) y nivel por codificacion (p. ej. {"gzip": 9}; las demas, su nivel por defecto).
+    # Con cache_enabled los cuerpos comprimidos se guardan y se reutilizan mientras no cambien
+    compress: bool = True
+    compression_min_size: Optional[int] = None
+    compression_levels: Dict[str, int] = field(default_factory=dict)
 
     
 def create_crud_router(config: CRUDConfig[DbModelType, CreateSchemaType, ReadSchemaType, UpdateSchemaType]) -> APIRouter:
@@ -34,29 +91,295 @@ def create_crud_router(config: CRUDConfig[DbModelType, CreateSchemaType, ReadSch
     """
     router = APIRouter(prefix=config.path_prefix, tags=[config.tag])
 
+    filters_dependency = build_filter_dependency(config.db_model, config.filter_fields)
+    sort_fields = tuple(config.sort_fields)
+    item_schema = config.expand_schema or config.read_schema
+    page_schema = Page[item_schema] # type: ignore
+    many_schema = MultiGet[item_schema] # type: ignore
+    expand_description = "Relaciones a incluir separadas por comas, con '.' para anidar (p.ej. clan,jutsus)"
+
+    def expand_dependency(expand: Optional[str] = Query(None, description=expand_description)):
+        return parse_expand(expand, config.db_model, config.max_expand_depth, config.max_expand_paths)
+
+    # Campos publicos que se pueden pedir con ?fields= (los del schema de lectura)
+    public_fields = [name for name in config.read_schema.model_fields if name in config.db_model.__table__.c] # type: ignore
+    fields_description = f"Campos a devolver separados por comas. Disponibles: {', '.join(public_fields)}"
+
+    def fields_dependency(fields: Optional[str] = Query(None, description=fields_description)):
+        return parse_fields(fields, public_fields)
+
+    dumps = json_dumper(config.use_orjson)
+    # Los GET van a la replica de lectura, salvo con cache: una lectura retrasada justo despues
+    # de invalidar dejaria en cache el dato antiguo hasta que caduque
+    read_session = get_primary_session if config.cache_enabled else get_read_session
+    cache_namespace = config.path_prefix.strip("/")
+    compressor = ResponseCompressor(cache_namespace, config.compression_min_size, config.compression_levels, reuse=config.cache_enabled, enabled=config.compress)
+
+    async def invalidate_cache(*item_ids: int):
+        # Tras una escritura se invalidan los elementos tocados, los listados y las vistas dependientes
+        if config.cache_enabled:
+            for item_id in item_ids:
+                await response_cache.invalidate_item(cache_namespace, item_id)
+            await response_cache.invalidate_namespace(cache_namespace)
+        for namespace in config.invalidates:
+            await response_cache.invalidate_namespace(namespace)
+
+    def item_entry(item) -> Dict[str, Any]:
+        # Entrada de cache de un elemento: su representacion publica (schema de lectura) y su ETag
+        return {"etag": make_etag(item.version, item.updated_at), "item": config.read_schema.model_validate(item).model_dump(mode="json")}
+
+    async def load_many(db: AsyncSession, item_ids: List[int], expand_tree: Dict[str, Any], field_names: Optional[List[str]]) -> Dict[str, Any]:
+        # Lectura multiple con un solo WHERE id IN (...). Con cache se sirven primero las entradas
+        # de elemento y solo los ids que faltan van a la BD (y se guardan para la siguiente vez)
+        use_cache = config.cache_enabled and not expand_tree
+        found = {item_id: entry["item"] for item_id, entry in (await response_cache.get_items(cache_namespace, item_ids)).items()} if use_cache else {}
+        pending = [item_id for item_id in item_ids if item_id not in found]
+        if pending:
+            query = select(config.db_model).where(config.db_model.id.in_(pending)).options(*expand_options(config.db_model, expand_tree)) # type: ignore
+            if field_names and not use_cache:
+                query = query.options(load_only_option(config.db_model, [*field_names, "id"]))
+            rows = list((await db.execute(query)).scalars().all())
+            await load_collections(db, config.db_model, rows, expand_tree, config.max_expand_items)
+            for row in rows:
+                if use_cache:
+                    entry = item_entry(row)
+                    found[row.id] = entry["item"]
+                    await response_cache.set_item(cache_namespace, row.id, entry, ttl=config.cache_ttl)
+                elif field_names:
+                    found[row.id] = project_item(row, field_names, expand_tree, config.max_expand_items)
+                else:
+                    found[row.id] = dump_expanded(row, expand_tree, config.max_expand_items)
+
+        items = [found[item_id] for item_id in item_ids if item_id in found]
+        if use_cache and field_names:
+            # Las entradas cacheadas son la representacion completa: la proyeccion se hace sobre ellas
+            items = [{name: item[name] for name in field_names} for item in items]
+        return {"items": items, "missing": [item_id for item_id in item_ids if item_id not in found]}
+
     # --- Endpoint 1: GET ALL ---
-    @router.get('', response_model=List[ReadSchemaType], status_code=status.HTTP_200_OK)
-    async def get_all_items(*, db: AsyncSession = Depends(get_session)):
+    @router.get('', response_model=Union[page_schema, many_schema], response_model_exclude_unset=True, status_code=status.HTTP_200_OK)
+    async def get_all_items(
+        *,
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(read_session),
+        if_none_match: Optional[str] = Header(None),
+        expand_tree: Dict[str, Any] = Depends(expand_dependency),
+        field_names: Optional[List[str]] = Depends(fields_dependency),
+        limit: int = Query(config.default_limit, ge=1, le=config.max_limit, description="Numero maximo de elementos por pagina"),
+        cursor: Optional[str] = Query(None, description="Token next_cursor devuelto por la pagina anterior"),
+        sort: Optional[str] = Query(None, description="Campo de ordenacion, con '-' delante para orden descendente"),
+        filters: Dict[str, Any] = Depends(filters_dependency),
+        ids: Optional[str] = Query(None, description="Lectura multiple: ids separados por comas (p.ej. 1,2,3). Devuelve los elementos en ese orden y los ids que no existen"),
+    ):
         """
-        Obtiene todos los elementos del modelo especificado
+        Obtiene una pagina de elementos del modelo especificado usando paginacion por cursor (keyset),
+        o varios elementos concretos con ?ids=
         """
-        result = await db.execute(select(config.db_model))
-        return result.scalars().all()
-        
+        if ids is not None:
+            if cursor or sort or any(value is not None for value in filters.values()):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids no se puede combinar con cursor, sort ni filtros")
+            item_ids = parse_ids(ids, config.max_limit)
+
+            async def build_many() -> Tuple[bytes, str]:
+                result = await load_many(db, item_ids, expand_tree, field_names)
+                body = dumps(jsonable_encoder(result)) if field_names else dump_model_json(many_schema, result, exclude_unset=True)
+                return body, body_etag(body)
+
+            if config.coalesce_reads:
+                key = flight_key(cache_namespace, "many", session_target(db), query=request.query_params.multi_items())
+                body, etag = await read_flights.run(f"{cache_namespace}:many", key, build_many, config.coalesce_timeout)
+            else:
+                body, etag = await build_many()
+            if none_match(if_none_match, etag):
+                return compressor.not_modified(request, body, etag)
+            return await compressor.response(request, body, headers={"ETag": etag})
+
+        sort_field, descending = parse_sort(sort, sort_fields)
+        sort_key = sort or "id"
+        cursor_values = decode_cursor(cursor, sort_key, config.db_model, sort_field) if cursor else None
+
+        async def load_page() -> Tuple[Dict[str, Any], str]:
+            # Construimos la query con filtros y posicion, pidiendo una fila de mas para saber si hay otra pagina
+            query = select(config.db_model).options(*expand_options(config.db_model, expand_tree))
+            if field_names:
+                # Solo las columnas pedidas, mas las que necesitan el cursor y el ETag
+                query = query.options(load_only_option(config.db_model, [*field_names, "id", "version", sort_field]))
+            query = apply_filters(query, config.db_model, config.filter_fields, filters)
+            query = apply_keyset(query, config.db_model, sort_field, descending, cursor_values)
+            result = await db.execute(query.limit(limit + 1))
+            rows = list(result.scalars().all())
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            await load_collections(db, config.db_model, rows, expand_tree, config.max_expand_items)
+            next_cursor = None
+            if has_more:
+                last = rows[-1]
+                next_cursor = encode_cursor(sort_key, getattr(last, sort_field), last.id)
+
+            # El ETag del listado cambia si cambia cualquier fila de la pagina o la paginacion
+            etag = collection_etag(((row.id, row.version) for row in rows), sort_key, limit, next_cursor, field_names)
+
+            # Volcamos a dict para que la validacion no dispare cargas perezosas de relaciones
+            if field_names:
+                items = [project_item(row, field_names, expand_tree, config.max_expand_items) for row in rows]
+            else:
+                items = [dump_expanded(row, expand_tree, config.max_expand_items) for row in rows]
+            page = {
+                "items": items,
+                "meta": PageMeta(limit=limit, count=len(rows), sort=sort_key, has_more=has_more, next_cursor=next_cursor),
+            }
+            return page, etag
+
+        def render_page(page: Dict[str, Any]) -> Dict[str, Any]:
+            # Con ?fields= los elementos ya vienen proyectados: no se validan contra el schema completo
+            if field_names:
+                return jsonable_encoder(page)
+            return page_schema.model_validate(page).model_dump(mode="json", exclude_unset=True)
+
+        def encode_page(page: Dict[str, Any]) -> bytes:
+            # Igual que render_page, pero directamente a bytes JSON y con una sola validacion
+            if field_names:
+                return dumps(jsonable_encoder(page))
+            return dump_model_json(page_schema, page, exclude_unset=True)
+
+        async def load_page_json() -> Dict[str, Any]:
+            # En cache se guarda la pagina ya lista para JSON, junto a su ETag
+            page, etag = await load_page()
+            return {"etag": etag, "page": render_page(page)}
+
+        # La clave incluye todos los parametros de la query, ordenados para que sea estable
+        cache_key = "list:" + "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+
+        async def build_body() -> Tuple[bytes, str]:
+            # Cuerpo JSON y ETag de la pagina, ya serializados para poder compartirlos
+            # Con relaciones expandidas el ETag se calcula sobre el cuerpo, porque los cambios
+            # en las filas relacionadas no alteran la version de las filas de la pagina.
+            # Tampoco se cachea: esas escrituras no invalidan este namespace
+            if expand_tree or not config.cache_enabled:
+                page, etag = await load_page()
+                body = encode_page(page)
+                return body, body_etag(body) if expand_tree else etag
+            cached = await response_cache.get_or_load(cache_namespace, cache_key, load_page_json, ttl=config.cache_ttl)
+            return dumps(cached["page"]), cached["etag"]
+
+        if config.coalesce_reads:
+            # Las peticiones identicas simultaneas comparten una sola carga (y una sola conexion)
+            key = flight_key(cache_namespace, "list", session_target(db), query=request.query_params.multi_items())
+            body, etag = await read_flights.run(f"{cache_namespace}:list", key, build_body, config.coalesce_timeout)
+        elif not config.cache_enabled and not expand_tree:
+            page, etag = await load_page()
+            # Si el cliente tiene la pagina actual no hace falta serializar nada
+            if none_match(if_none_match, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+            if not field_names and not config.fast_serialization:
+                response.headers["ETag"] = etag
+                return page
+            body = encode_page(page)
+        else:
+            body, etag = await build_body()
+
+        if none_match(if_none_match, etag):
+            return compressor.not_modified(request, body, etag)
+        return await compressor.response(request, body, headers={"ETag": etag})
+
+    # --- Endpoint 1.1: EXPORT (NDJSON / CSV) ---
+    # Se declara antes de /{item_id} para que 'export' no se interprete como un id
+    @router.get('/export', response_class=StreamingResponse, status_code=status.HTTP_200_OK)
+    async def export_items(
+        *,
+        format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Formato de salida: ndjson o csv"),
+        filters: Dict[str, Any] = Depends(filters_dependency),
+    ):
+        """
+        Exporta la tabla completa (o filtrada) en streaming, con memoria constante
+        """
+        # Seleccionamos columnas sueltas en lugar de entidades para no construir objetos ORM
+        table = config.db_model.__table__ # type: ignore
+        query = apply_filters(select(*table.c), config.db_model, config.filter_fields, filters).order_by(table.c.id)
+
+        filename = f"{config.path_prefix.strip('/')}.{format}"
+        return StreamingResponse(
+            stream_export(query, format, config.export_chunk_size),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
 
     # --- Endpoint 2: GET BY ID ---
     @router.get('/{item_id}', response_model=ReadSchemaType, status_code= status.HTTP_200_OK)
-    async def get_item_by_id(*, db: AsyncSession = Depends(get_session), item_id: int):
+    async def get_item_by_id(
+        *,
+        request: Request,
+        db: AsyncSession = Depends(read_session),
+        response: Response,
+        item_id: int,
+        if_none_match: Optional[str] = Header(None),
+        expand_tree: Dict[str, Any] = Depends(expand_dependency),
+        field_names: Optional[List[str]] = Depends(fields_dependency),
+    ):
         """
-        Obtiene un elemento mediante su id
+        Obtiene un elemento mediante su id. Responde 304 si el cliente ya tiene la version actual (If-None-Match)
         """
-        item = await search_model_by_id(config.db_model, item_id, db)
-        return item
+        def render_item(item) -> bytes:
+            if field_names:
+                return dumps(jsonable_encoder(project_item(item, field_names, expand_tree, config.max_expand_items)))
+            # Se valida contra el schema de lectura para no publicar columnas internas (version, updated_at...)
+            return dump_model_json(item_schema, dump_expanded(item, expand_tree, config.max_expand_items), exclude_unset=True)
+
+        async def build_body() -> Tuple[bytes, str]:
+            # Cuerpo JSON y ETag del elemento, ya serializados para poder compartirlos
+            if expand_tree or (field_names and not config.cache_enabled):
+                # Camino con query propia: relaciones expandidas o subconjunto de columnas
+                query = select(config.db_model).where(config.db_model.id == item_id).options(*expand_options(config.db_model, expand_tree)) # type: ignore
+                if field_names:
+                    query = query.options(load_only_option(config.db_model, [*field_names, "id", "version", "updated_at"]))
+                item = (await db.execute(query)).scalars().first()
+                if item is None:
+                    raise not_found(config.db_model, item_id)
+                await load_collections(db, config.db_model, [item], expand_tree, config.max_expand_items)
+                body = render_item(item)
+                return body, body_etag(body) if expand_tree else make_etag(item.version, item.updated_at) # type: ignore
+
+            if not config.cache_enabled:
+                item = await search_model_by_id(config.db_model, item_id, db)
+                # Se vuelca con el schema de lectura leyendo los atributos del objeto, sin pasar por un dict
+                return dump_model_json(config.read_schema, item), make_etag(item.version, item.updated_at) # type: ignore
+
+            async def load_item() -> Dict[str, Any]:
+                return item_entry(await search_model_by_id(config.db_model, item_id, db))
+
+            entry = await response_cache.get_or_load_item(cache_namespace, item_id, load_item, ttl=config.cache_ttl)
+            payload = entry["item"]
+            # La entrada cacheada es la representacion completa: la proyeccion se hace sobre ella
+            if field_names:
+                payload = {name: payload[name] for name in field_names}
+            return dumps(payload), entry["etag"]
+
+        if config.coalesce_reads:
+            key = flight_key(cache_namespace, "item", item_id, session_target(db), query=request.query_params.multi_items())
+            body, etag = await read_flights.run(f"{cache_namespace}:item", key, build_body, config.coalesce_timeout)
+        elif not config.cache_enabled and not expand_tree and not field_names:
+            item = await search_model_by_id(config.db_model, item_id, db)
+            etag = make_etag(item.version, item.updated_at) # type: ignore
+            # Si el cliente tiene la version actual no hace falta serializar nada
+            if none_match(if_none_match, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+            if not config.fast_serialization:
+                response.headers["ETag"] = etag
+                return config.read_schema.model_validate(item)
+            body = dump_model_json(config.read_schema, item)
+        else:
+            body, etag = await build_body()
+
+        if none_match(if_none_match, etag):
+            return compressor.not_modified(request, body, etag)
+        return await compressor.response(request, body, headers={"ETag": etag})
 
     create_schema = config.create_schema
     # --- Endpoint 3: CREATE (POST) ---
     @router.post('',response_model=ReadSchemaType,status_code=status.HTTP_201_CREATED)                      #Como create schema se rellena en tiempo de ejecucion, fastapi lo valida pero pylance no, asi que ignoramos el error de pylance en este caso
-    async def create_item(*, db: AsyncSession = Depends(get_session), item_in : create_schema = Body(...)): # type: ignore
+    async def create_item(*, db: AsyncSession = Depends(get_session), response: Response, item_in : create_schema = Body(...)): # type: ignore
         """
         Crea un nuevo elemento
         """
@@ -64,43 +387,118 @@ def create_crud_router(config: CRUDConfig[DbModelType, CreateSchemaType, ReadSch
         
         db_item = config.db_model.model_validate(item_in,from_attributes=True)   
         
-        #Lo registramos en la BD
+        #Lo registramos en la BD (el flush asigna el id que lleva el evento del feed de cambios)
         db.add(db_item)
+        await db.flush()
+        record_change(db, config.db_model, "create", [db_item.id], getattr(db_item, "version", None))
         await db.commit()
         await db.refresh(db_item)
+        await invalidate_cache(db_item.id)
+        response.headers["ETag"] = make_etag(db_item.version, db_item.updated_at) # type: ignore
         return db_item
     
+    # --- Endpoint 3.1: BULK CREATE / UPSERT (POST) ---
+    @router.post('/bulk', response_model=BulkResult, status_code=status.HTTP_201_CREATED)
+    async def create_items_bulk(
+        *,
+        db: AsyncSession = Depends(get_session),
+        items_in: List[create_schema] = Body(...), # type: ignore
+        upsert: bool = Query(False, description="Actualiza los elementos que ya existan segun la clave de upsert"),
+        atomic: bool = Query(True, description="Todo o nada: si falla un elemento no se guarda ninguno"),
+    ):
+        """
+        Crea (o actualiza con upsert) muchos elementos con INSERT multi-fila por lotes.
+        Devuelve un resultado por elemento, en el mismo orden que la entrada.
+        """
+        if len(items_in) > config.bulk_max_items:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Maximo {config.bulk_max_items} elementos por peticion")
+        if upsert and not config.upsert_key:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{config.tag} no admite upsert")
+
+        # Pasamos por el modelo de BD para aplicar los valores por defecto (created_at, etc.)
+        rows = [config.db_model.model_validate(item, from_attributes=True).model_dump(exclude={"id"}) for item in items_in]
+        update_columns = [name for name in create_schema.model_fields if name in config.db_model.__table__.c] # type: ignore
+        # En upsert un elemento que ya existe solo cambia los campos que se han enviado: los omitidos conservan su valor
+        row_columns = [tuple(name for name in item.model_dump(exclude_unset=True) if name in update_columns) for item in items_in] if upsert else None
+
+        results = await bulk_insert(
+            db, config.db_model, rows, update_columns,
+            batch_size=config.bulk_batch_size,
+            upsert_key=config.upsert_key if upsert else None,
+            row_columns=row_columns,
+        )
+        failed = sum(1 for result in results if result.status == "error")
+
+        # En modo atomico cualquier fallo deshace toda la peticion
+        if failed and atomic:
+            await db.rollback()
+            for result in results:
+                if result.status != "error":
+                    result.status, result.id, result.version = "rolled_back", None, None
+            body = BulkResult(succeeded=0, failed=failed, committed=False, results=results)
+            return JSONResponse(status_code=status.HTTP_409_CONFLICT, content=body.model_dump())
+
+        for result in results:
+            record_change(db, config.db_model, "upsert" if upsert else "create", [result.id], result.version)
+        await db.commit()
+        await invalidate_cache(*(result.id for result in results if result.id is not None))
+        body = BulkResult(succeeded=len(results) - failed, failed=failed, committed=True, results=results)
+        if failed:
+            return JSONResponse(status_code=status.HTTP_207_MULTI_STATUS, content=body.model_dump())
+        return body
+
+    async def apply_update(db: AsyncSession, response: Response, new_data: Dict[str, Any], item_id: int, if_match: Optional[str]):
+        # If-Match convierte la escritura en condicional: 412 si la version ya no es la que el cliente vio
+        expected_versions = parse_if_match(if_match)
+
+        # Camino rapido: una sola sentencia, sin cargar el objeto ORM
+        if config.use_returning and supports_returning(db):
+            updated = await update_model_returning(DBModel=config.db_model,new_db_model_data=new_data,element_id=item_id,db=db,expected_versions=expected_versions)
+        else:
+            updated = await update_model(DBModel=config.db_model,new_db_model_data=new_data,element_id=item_id,db=db,expected_versions=expected_versions)
+        await invalidate_cache(item_id)
+        response.headers["ETag"] = make_etag(updated.version, updated.updated_at) # type: ignore
+        return updated
+
     update_schema = config.update_schema
     # --- Endpoint 4 : UPDATE (PUT)---
     @router.put('/{item_id}',response_model=ReadSchemaType,status_code=status.HTTP_200_OK)
-    async def update_item_put(*, db : AsyncSession = Depends(get_session), new_item_data : update_schema = Body(...), item_id : int): # type: ignore
+    async def update_item_put(*, db : AsyncSession = Depends(get_session), response : Response, new_item_data : update_schema = Body(...), item_id : int, if_match : Optional[str] = Header(None)): # type: ignore
         # Convertimos el personaje a dict para recorrerlo en el update elemento a elemento
         clean_character_data = new_item_data.model_dump()
 
         # Y con el dict limpio lo actualizamos en la BD
-        character_to_update = await update_model(DBModel=config.db_model,new_db_model_data=clean_character_data,element_id=item_id,db=db)
+        character_to_update = await apply_update(db, response, clean_character_data, item_id, if_match)
 
         # 8. Devolver el personaje creado
         return character_to_update
 
     # --- Endpoint 5 : PARTIAL UPDATE (PATCH) ---
     @router.patch('/{item_id}',response_model=ReadSchemaType,status_code=status.HTTP_200_OK)
-    async def update_item_patch(*, db : AsyncSession = Depends(get_session), new_item_data : update_schema = Body(...), item_id : int): # type: ignore
+    async def update_item_patch(*, db : AsyncSession = Depends(get_session), response : Response, new_item_data : update_schema = Body(...), item_id : int, if_match : Optional[str] = Header(None)): # type: ignore
         # Convertimos el personaje a dict para recorrerlo en el update elemento a elemento
         clean_character_data = new_item_data.model_dump(exclude_unset=True)
 
         # Y con el dict limpio lo actualizamos en la BD
-        character_to_update = await update_model(DBModel=config.db_model,new_db_model_data=clean_character_data,element_id=item_id,db=db)
+        character_to_update = await apply_update(db, response, clean_character_data, item_id, if_match)
 
         # 8. Devolver el personaje creado
         return character_to_update
 
     # --- Endpoint 6 : DELETE ---
     @router.delete('/{item_id}', status_code= status.HTTP_204_NO_CONTENT)
-    async def delete_item(*, db : AsyncSession = Depends(get_session), item_id : int):
-        to_delete = await search_model_by_id(DBModel=config.db_model,element_id=item_id,db=db)
-        #  Una vez que tenemos el personaje, lo eliminamos de la BD
-        await db.delete(to_delete)
-        await db.commit()
+    async def delete_item(*, db : AsyncSession = Depends(get_session), item_id : int, if_match : Optional[str] = Header(None)):
+        expected_versions = parse_if_match(if_match)
+        if config.use_returning and supports_returning(db):
+            await delete_model_returning(DBModel=config.db_model,element_id=item_id,db=db,expected_versions=expected_versions)
+        else:
+            to_delete = await search_model_by_id(DBModel=config.db_model,element_id=item_id,db=db)
+            if not version_matches(expected_versions, to_delete.version): # type: ignore
+                raise precondition_failed()
+            #  Una vez que tenemos el personaje, lo eliminamos de la BD
+            await db.delete(to_delete)
+            record_change(db, config.db_model, "delete", [item_id])
+            await db.commit()
+        await invalidate_cache(item_id)
     
     return router
\ No newline at end of file
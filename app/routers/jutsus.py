@@ -1,12 +1,13 @@
-from fastapi import APIRouter,status, Depends, HTTPException
+from fastapi import APIRouter,status, Depends, HTTPException, Body, Query
 from sqlmodel import select
 
 from ..utils.db_utilities import search_model_by_id, update_model
-from ..models.schemas import JutsuCreate, JutsuRead, JutsuUpdate
-from typing import Dict, List
+from ..models.schemas import JutsuCreate, JutsuRead, JutsuUpdate, JutsuReadExpanded, CharacterLearn, JutsuUser, LinkRead, Page
+from typing import Dict, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from ..db.session import get_session
-from ..models.db_models import Jutsu
+from ..db.session import get_read_session, get_session
+from ..models.db_models import Character, Jutsu
+from ..utils.links import check_link_batch, decode_link_cursor, ensure_exist, invalidate_link_views, link_page, linked_page, record_link_changes, upsert_links
 from .crud_router import create_crud_router, CRUDConfig
 
 #Definimos la configuracion de personajes
@@ -15,10 +16,44 @@ jutsu_config = CRUDConfig(
     create_schema = JutsuCreate,
     read_schema = JutsuRead,
     update_schema = JutsuUpdate,
+    expand_schema = JutsuReadExpanded,
     path_prefix = "/jutsus",
-    tag = "Jutsus"
+    tag = "Jutsus",
+    filter_fields = {"type": "eq", "rank": "eq", "name": "prefix"},
+    sort_fields = ["name", "rank"],
+    cache_enabled = True
 )
 
 #Definimos el router de characters
 router = create_crud_router(config=jutsu_config)
 
+# --- Usuarios del jutsu (tabla CharacterJutsuLink) ---
+@router.post("/{jutsu_id}/users", response_model=List[LinkRead], status_code=status.HTTP_201_CREATED)
+async def teach_jutsu(jutsu_id: int, characters_in: List[CharacterLearn] = Body(...), db: AsyncSession = Depends(get_session)):
+    """
+    Enseña un jutsu a varios personajes con un solo INSERT ... ON CONFLICT
+    """
+    check_link_batch(characters_in)
+    await ensure_exist(db, Jutsu, [jutsu_id])
+    await ensure_exist(db, Character, [item.character_id for item in characters_in])
+    links = await upsert_links(db, [{"jutsu_id": jutsu_id, **item.model_dump()} for item in characters_in])
+    pairs = [(link["character_id"], link["jutsu_id"]) for link in links]
+    await record_link_changes(db, "link", pairs)
+    await db.commit()
+    await invalidate_link_views(pairs)
+    return links
+
+@router.get("/{jutsu_id}/users", response_model=Page[JutsuUser])
+async def get_jutsu_users(
+    jutsu_id: int,
+    db: AsyncSession = Depends(get_read_session),
+    limit: int = Query(50, ge=1, le=200, description="Numero maximo de personajes por pagina"),
+    cursor: Optional[str] = Query(None, description="Token next_cursor devuelto por la pagina anterior"),
+):
+    """
+    Personajes que conocen un jutsu, ordenados por id y leidos desde la tabla de enlaces
+    """
+    rows, has_more = await linked_page(db, "jutsu_id", jutsu_id, Character, limit, decode_link_cursor(cursor, "character_id", Character))
+    if not rows and not cursor:
+        await ensure_exist(db, Jutsu, [jutsu_id])
+    return link_page(rows, has_more, limit, "character_id")
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from ..db.session import get_read_session
+from ..models.schemas import SearchResults
+from ..utils.search import SEARCH_TARGETS, search
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+
+@router.get('', response_model=SearchResults, response_model_exclude_none=True, status_code=status.HTTP_200_OK)
+async def search_all(
+    *,
+    db: AsyncSession = Depends(get_read_session),
+    q: str = Query(..., min_length=1, max_length=200, description="Texto a buscar; cada palabra tambien se busca como prefijo"),
+    types: Optional[str] = Query(None, description=f"Tipos separados por comas ({', '.join(SEARCH_TARGETS)}). Por defecto todos"),
+    limit: int = Query(10, ge=1, le=50, description="Resultados maximos por tipo"),
+):
+    """
+    Busqueda de texto completo en personajes (nombre, nombre completo y biografia), clanes y jutsus,
+    ordenada por relevancia dentro de cada tipo
+    """
+    selected = [name.strip() for name in types.split(",") if name.strip()] if types else list(SEARCH_TARGETS)
+    unknown = [name for name in selected if name not in SEARCH_TARGETS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tipos no validos: {', '.join(unknown)}. Tipos disponibles: {', '.join(SEARCH_TARGETS)}",
+        )
+
+    results = {"query": q}
+    for name in selected:
+        results[name] = await search(db, SEARCH_TARGETS[name], q, limit)
+    return results
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel, select
+from typing import Dict, List, Type
+
+from ..db.session import get_read_session
+from ..models.db_models import Clan, Jutsu
+from ..models.schemas import ClanStats, JutsuLearnersStat, RankStat
+from ..utils.stats import NULL_BUCKET, bucket_value, top_buckets
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+
+async def names_by_id(db: AsyncSession, DBModel: Type[SQLModel], buckets: List[str]) -> Dict[int, str]:
+    # Solo los nombres de los ids de la pagina, por PK
+    ids = [int(bucket) for bucket in buckets]
+    result = await db.execute(select(DBModel.id, DBModel.name).where(DBModel.id.in_(ids))) # type: ignore
+    return dict(result.tuples().all())
+
+
+@router.get('/clans', response_model=ClanStats, status_code=status.HTTP_200_OK)
+async def clan_stats(*, db: AsyncSession = Depends(get_read_session), limit: int = Query(50, ge=1, le=500, description="Numero maximo de clanes")):
+    """
+    Miembros por clan, de mas a menos, y personajes sin clan. Se leen de los contadores precalculados
+    """
+    rows = await top_buckets(db, "clan_members", limit)
+    names = await names_by_id(db, Clan, [bucket for bucket, _ in rows])
+    # Un clan borrado puede dejar su contador: se omite
+    clans = [{"id": int(bucket), "name": names[int(bucket)], "members": value} for bucket, value in rows if int(bucket) in names]
+    return {"clans": clans, "without_clan": await bucket_value(db, "clan_members", NULL_BUCKET)}
+
+
+@router.get('/ranks', response_model=List[RankStat], status_code=status.HTTP_200_OK)
+async def rank_stats(*, db: AsyncSession = Depends(get_read_session)):
+    """
+    Personajes por rango, de mas a menos (rank null = sin rango)
+    """
+    rows = await top_buckets(db, "characters_by_rank")
+    ranks = [{"rank": bucket, "characters": value} for bucket, value in rows]
+    without_rank = await bucket_value(db, "characters_by_rank", NULL_BUCKET)
+    if without_rank:
+        ranks.append({"rank": None, "characters": without_rank})
+    return ranks
+
+
+@router.get('/jutsus', response_model=List[JutsuLearnersStat], status_code=status.HTTP_200_OK)
+async def jutsu_stats(*, db: AsyncSession = Depends(get_read_session), limit: int = Query(10, ge=1, le=100, description="Numero de jutsus")):
+    """
+    Jutsus mas aprendidos (personajes que conocen cada uno)
+    """
+    rows = await top_buckets(db, "jutsu_learners", limit)
+    names = await names_by_id(db, Jutsu, [bucket for bucket, _ in rows])
+    return [{"id": int(bucket), "name": names[int(bucket)], "learners": value} for bucket, value in rows if int(bucket) in names]
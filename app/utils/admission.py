@@ -0,0 +1,142 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from ..config.settings import settings
+from .batch import BATCH_SCOPE_KEY
+from .metrics import admission_active, admission_admitted, admission_queued, admission_shed, admission_waiting, pool_wait
+
+# Rutas de operacion que nunca se rechazan: hay que poder mirar las metricas en plena sobrecarga.
+# El feed de cambios tampoco: sus conexiones duran horas y ocuparian un hueco de lectura todo ese tiempo
+EXEMPT_PATHS = {"/", "/ready", "/metrics", "/cache/stats", "/docs", "/redoc", "/openapi.json", "/changes/stream"}
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """
+    Clase de una peticion para el control de admision: 'export', 'read', 'write' o None (exenta).
+    """
+    if path in EXEMPT_PATHS:
+        return None
+    if path.rstrip("/").endswith("/export"):
+        return "export"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    return "write"
+
+
+class AdmissionLimiter:
+    """
+    Limite de peticiones simultaneas de una clase de ruta con una cola de espera acotada (FIFO).
+    Al liberar un hueco se entrega directamente al primero de la cola.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+
+    def _update_gauges(self) -> None:
+        admission_active.set(self.active, self.name)
+        admission_waiting.set(len(self._waiters), self.name)
+
+    async def acquire(self, under_pressure: bool) -> Optional[str]:
+        """
+        Espera un hueco. Devuelve None si se admite la peticion o el motivo del rechazo.
+        Con el pool saturado el limite baja a la mitad y no se encola: esperar solo alargaria la cola del pool.
+        """
+        limit = max(self.concurrency // 2, 1) if under_pressure else self.concurrency
+        if self.active < limit and not self._waiters:
+            self.active += 1
+            admission_admitted.inc(self.name)
+            self._update_gauges()
+            return None
+        if under_pressure:
+            return "pool_pressure"
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        admission_queued.inc(self.name)
+        self._update_gauges()
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # El cliente se ha ido: si ya se le habia entregado el hueco, se devuelve
+            if waiter.done():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+                self._update_gauges()
+            raise
+        if not waiter.done():
+            self._waiters.remove(waiter)
+            self._update_gauges()
+            return "queue_timeout"
+        admission_admitted.inc(self.name)
+        self._update_gauges()
+        return None
+
+    def release(self) -> None:
+        # El hueco pasa al siguiente de la cola (active no cambia) o queda libre
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.active -= 1
+        self._update_gauges()
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI de control de admision: limita las peticiones simultaneas por clase de ruta
+    (lecturas, escrituras, exportaciones) y rechaza con 503 y Retry-After las que no caben en la
+    cola, esperan demasiado o llegan con el pool de conexiones saturado. Mejor fallar rapido unas
+    pocas que hacer esperar varios segundos a todas.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.limiters: Dict[str, AdmissionLimiter] = {
+            name: AdmissionLimiter(name, concurrency, settings.ADMISSION_QUEUE_SIZE, settings.ADMISSION_QUEUE_TIMEOUT)
+            for name, concurrency in (
+                ("read", settings.ADMISSION_READ_CONCURRENCY),
+                ("write", settings.ADMISSION_WRITE_CONCURRENCY),
+                ("export", settings.ADMISSION_EXPORT_CONCURRENCY),
+            )
+        }
+
+    async def __call__(self, scope, receive, send):
+        # Las subpeticiones de /batch ya van dentro del hueco de la peticion /batch
+        admitted = scope["type"] == "http" and settings.ADMISSION_CONTROL and not scope.get(BATCH_SCOPE_KEY)
+        name = route_class(scope["method"], scope["path"]) if admitted else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiters[name]
+        under_pressure = pool_wait.value() * 1000 > settings.ADMISSION_MAX_POOL_WAIT_MS
+        reason = await limiter.acquire(under_pressure)
+        if reason is not None:
+            admission_shed.inc(name, reason)
+            response = JSONResponse(
+                {"detail": "Servidor saturado, vuelve a intentarlo en unos segundos"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+            )
+            await response(scope, receive, send)
+            return
+
+        # El hueco se mantiene hasta enviar toda la respuesta (las exportaciones van en streaming)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,171 @@
+import asyncio
+import json
+from http.cookies import SimpleCookie
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from fastapi import status
+
+# Maximo de subpeticiones por /batch y cuantas lecturas de un mismo batch se ejecutan a la vez
+MAX_BATCH_REQUESTS = 50
+BATCH_READ_CONCURRENCY = 8
+# Tiempo maximo de cada subpeticion (segundos): al superarlo se cancela y responde 504
+SUB_REQUEST_TIMEOUT = 10.0
+# Marca en el scope ASGI de las subpeticiones (el control de admision no las vuelve a contar)
+BATCH_SCOPE_KEY = "konohapi.batch"
+# Cabeceras de la peticion /batch que heredan todas las subpeticiones
+INHERITED_HEADERS = (b"authorization", b"cookie", b"user-agent")
+
+READ_METHODS = ("GET", "HEAD")
+# Unicas rutas que se pueden pedir dentro de /batch: las de los routers CRUD (respuestas finitas).
+# Streams como /changes/stream no terminan nunca y retendrian el batch y su hueco de admision
+BATCH_RESOURCES = ("characters", "clans", "jutsus")
+
+
+def batch_error(status_code: int, detail: str) -> Dict[str, Any]:
+    # Respuesta de una subpeticion rechazada sin llegar a ejecutarla
+    return {"status": status_code, "headers": {}, "body": {"detail": detail}}
+
+
+def check_sub_request(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Motivo por el que una subpeticion no se ejecuta (o None si se puede ejecutar).
+    """
+    route_path = urlsplit(path).path.rstrip("/")
+    if not path.startswith("/"):
+        return batch_error(status.HTTP_400_BAD_REQUEST, "La ruta debe empezar por '/'")
+    # "/" se queda en "" al quitar la barra final y no tiene primer segmento
+    segments = route_path.split("/")
+    if len(segments) < 2 or segments[1] not in BATCH_RESOURCES:
+        return batch_error(
+            status.HTTP_400_BAD_REQUEST,
+            f"Ruta no disponible dentro de /batch. Recursos admitidos: {', '.join('/' + name for name in BATCH_RESOURCES)}",
+        )
+    if route_path.endswith("/export"):
+        return batch_error(status.HTTP_400_BAD_REQUEST, "Las exportaciones no estan disponibles dentro de /batch")
+    return None
+
+
+def read_groups(methods: List[str]) -> List[List[int]]:
+    """
+    Agrupa los indices de las subpeticiones: las lecturas consecutivas forman un grupo que se
+    ejecuta a la vez y cada escritura va sola, en orden, separando las lecturas de antes y de despues.
+    """
+    groups: List[List[int]] = []
+    for index, method in enumerate(methods):
+        if method in READ_METHODS and groups and methods[groups[-1][0]] in READ_METHODS:
+            groups[-1].append(index)
+        else:
+            groups.append([index])
+    return groups
+
+
+def _decode_body(headers: Dict[str, str], body: bytes) -> Any:
+    if not body:
+        return None
+    if headers.get("content-type", "").startswith("application/json"):
+        return json.loads(body)
+    return body.decode("utf-8", errors="replace")
+
+
+async def run_sub_request(app, parent_scope: Dict[str, Any], method: str, path: str, body: Any, headers: Dict[str, str], cookies: Dict[str, str]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Ejecuta una subpeticion dentro del proceso, pasando por la aplicacion ASGI completa (rutas,
+    dependencias, manejadores de errores y metricas) sin volver a la red.
+    Devuelve la respuesta (status, cabeceras y cuerpo) y las cabeceras Set-Cookie que haya enviado;
+    si no termina en SUB_REQUEST_TIMEOUT segundos, un 504 como resultado de esa subpeticion.
+    """
+    target = urlsplit(path)
+    payload = b"" if body is None else json.dumps(body).encode()
+    raw_headers = [(name, value) for name, value in parent_scope["headers"] if name in INHERITED_HEADERS and name != b"cookie"]
+    if cookies:
+        raw_headers.append((b"cookie", "; ".join(f"{name}={value}" for name, value in cookies.items()).encode()))
+    # Sin Accept-Encoding: el cuerpo de cada subpeticion va dentro del JSON de /batch y tiene que llegar sin comprimir
+    raw_headers += [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items() if name.lower() != "accept-encoding"]
+    if payload:
+        raw_headers += [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]
+
+    scope = {
+        "type": "http",
+        "asgi": parent_scope.get("asgi", {"version": "3.0"}),
+        "http_version": parent_scope.get("http_version", "1.1"),
+        "method": method,
+        "scheme": parent_scope.get("scheme", "http"),
+        "server": parent_scope.get("server"),
+        "client": parent_scope.get("client"),
+        "root_path": parent_scope.get("root_path", ""),
+        "path": target.path,
+        "raw_path": target.path.encode(),
+        "query_string": target.query.encode(),
+        "headers": raw_headers,
+        "state": dict(parent_scope.get("state", {})),
+        BATCH_SCOPE_KEY: True,
+    }
+
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        # Entregado el cuerpo no llega nada mas: se anuncia la desconexion para que una ruta que siga
+        # escuchando (p. ej. un stream) termine en lugar de esperar para siempre
+        return {"type": "http.disconnect"}
+
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    response_headers: List[Tuple[bytes, bytes]] = []
+    chunks: List[bytes] = []
+
+    async def send(message):
+        nonlocal status_code, response_headers
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            response_headers = list(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await asyncio.wait_for(app(scope, receive, send), SUB_REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        # Una ruta lenta no puede retener el batch entero: se cancela (la sesion hace rollback) y se sigue
+        return batch_error(status.HTTP_504_GATEWAY_TIMEOUT, f"La subpeticion ha superado {SUB_REQUEST_TIMEOUT:g} s"), []
+    except Exception:
+        # ServerErrorMiddleware ya ha enviado el 500 y vuelve a lanzar el error para el servidor:
+        # aqui basta con devolver ese 500 como resultado de la subpeticion
+        if not response_headers:
+            return batch_error(status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal Server Error"), []
+
+    decoded = {name.decode("latin-1"): value.decode("latin-1") for name, value in response_headers if name != b"set-cookie"}
+    set_cookies = [value.decode("latin-1") for name, value in response_headers if name == b"set-cookie"]
+    decoded.pop("content-length", None)
+    return {"status": status_code, "headers": decoded, "body": _decode_body(decoded, b"".join(chunks))}, set_cookies
+
+
+async def run_batch(app, parent_scope: Dict[str, Any], sub_requests: List[Dict[str, Any]], cookies: Dict[str, str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Ejecuta las subpeticiones en orden de escritura: las lecturas consecutivas a la vez (como mucho
+    BATCH_READ_CONCURRENCY) y las escrituras de una en una. Las cookies que fijan las escrituras
+    (p. ej. la de read-your-writes) se pasan a las subpeticiones siguientes y se devuelven al cliente.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(sub_requests)
+    set_cookies: List[str] = []
+    cookies = dict(cookies)
+    semaphore = asyncio.Semaphore(BATCH_READ_CONCURRENCY)
+
+    async def run_one(index: int) -> None:
+        sub = sub_requests[index]
+        rejected = check_sub_request(sub["path"])
+        if rejected is not None:
+            results[index] = rejected
+            return
+        async with semaphore:
+            result, new_cookies = await run_sub_request(app, parent_scope, sub["method"], sub["path"], sub.get("body"), sub.get("headers") or {}, cookies)
+        results[index] = result
+        for header in new_cookies:
+            set_cookies.append(header)
+            cookies.update({name: morsel.value for name, morsel in SimpleCookie(header).items()})
+
+    for group in read_groups([sub["method"] for sub in sub_requests]):
+        await asyncio.gather(*(run_one(index) for index in group))
+    return results, set_cookies # type: ignore
@@ -0,0 +1,116 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+from ..models.schemas import BulkItemResult
+from .db_utilities import next_version_values
+
+
+def dialect_insert(db: AsyncSession, table):
+    """
+    Devuelve el INSERT del dialecto en uso, que es el que soporta ON CONFLICT.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    return insert(table)
+
+
+def build_insert_statement(db: AsyncSession, DBModel: Type[SQLModel], update_columns: Sequence[str], upsert_key: Optional[str]):
+    """
+    Construye un INSERT ... RETURNING id (y version en los modelos versionados) pensado para
+    ejecutarse con una lista de filas.
+    Si hay upsert_key, las filas que ya existan se actualizan con ON CONFLICT DO UPDATE
+    (solo las columnas de update_columns; el resto conserva su valor).
+    """
+    table = DBModel.__table__  # type: ignore[attr-defined]
+    statement = dialect_insert(db, table) if upsert_key else insert(table)
+
+    if upsert_key:
+        if not hasattr(statement, "on_conflict_do_update"):
+            raise ValueError(f"El dialecto {db.get_bind().dialect.name} no soporta upsert")
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c[upsert_key]],
+            set_={
+                **{column: statement.excluded[column] for column in update_columns if column != upsert_key},
+                **next_version_values(DBModel),
+            },
+        )
+
+    # sort_by_parameter_order garantiza que los ids vuelven en el mismo orden que las filas enviadas
+    returned = [table.c.id, table.c.version] if "version" in table.c else [table.c.id]
+    return statement.returning(*returned, sort_by_parameter_order=True)
+
+
+def _item_result(index: int, status: str, row: Any) -> BulkItemResult:
+    # row es la fila de RETURNING: (id,) o (id, version)
+    return BulkItemResult(index=index, status=status, id=row[0], version=row[1] if len(row) > 1 else None)
+
+
+def _error_message(error: Exception) -> str:
+    """
+    Extrae un mensaje legible del error del driver.
+    """
+    original = getattr(error, "orig", None)
+    return str(original if original is not None else error).splitlines()[0]
+
+
+async def bulk_insert(
+    db: AsyncSession,
+    DBModel: Type[SQLModel],
+    rows: List[Dict[str, Any]],
+    update_columns: Sequence[str],
+    batch_size: int,
+    upsert_key: Optional[str] = None,
+    row_columns: Optional[List[Tuple[str, ...]]] = None,
+) -> List[BulkItemResult]:
+    """
+    Inserta las filas en lotes de batch_size con INSERT multi-fila ... RETURNING.
+
+    Con upsert, row_columns indica que columnas actualiza cada fila si ya existe (las que envio
+    el cliente); las filas se agrupan por ese conjunto y cada grupo usa su propio ON CONFLICT.
+    Sin row_columns todas actualizan update_columns.
+
+    Cada lote va dentro de un SAVEPOINT: si falla, se reintenta fila a fila para
+    saber exactamente que elementos fallan sin perder los demas. No hace commit,
+    el llamante decide si confirma o deshace la transaccion completa.
+    """
+    ok_status = "upserted" if upsert_key else "created"
+    results: List[Optional[BulkItemResult]] = [None] * len(rows)
+
+    groups: Dict[Tuple[str, ...], List[int]] = {}
+    for index in range(len(rows)):
+        columns = row_columns[index] if upsert_key and row_columns is not None else tuple(update_columns)
+        groups.setdefault(columns, []).append(index)
+
+    for columns, indices in groups.items():
+        statement = build_insert_statement(db, DBModel, columns, upsert_key)
+        for start in range(0, len(indices), batch_size):
+            batch_indices = indices[start:start + batch_size]
+            batch = [rows[index] for index in batch_indices]
+            try:
+                async with db.begin_nested():
+                    result = await db.execute(statement, batch, execution_options={"insertmanyvalues_page_size": batch_size})
+                    returned = result.all()
+                for index, row in zip(batch_indices, returned):
+                    results[index] = _item_result(index, ok_status, row)
+                continue
+            except (IntegrityError, DBAPIError):
+                pass
+
+            # El lote ha fallado: reintentamos cada fila en su propio SAVEPOINT
+            for index, row in zip(batch_indices, batch):
+                try:
+                    async with db.begin_nested():
+                        returned = (await db.execute(statement, [row])).one()
+                    results[index] = _item_result(index, ok_status, returned)
+                except (IntegrityError, DBAPIError) as error:
+                    results[index] = BulkItemResult(index=index, status="error", error=_error_message(error))
+
+    return results # type: ignore[return-value]
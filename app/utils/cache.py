@@ -0,0 +1,252 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Protocol, Tuple
+
+from ..config.settings import settings
+
+
+class CacheBackend(ABC):
+    """
+    Almacen de la cache de respuestas. Ademas de las entradas guarda un contador de
+    generacion por namespace, que es lo que permite invalidar listados de golpe.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: int) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def get_generation(self, namespace: str) -> int: ...
+
+    @abstractmethod
+    async def bump_generation(self, namespace: str) -> int: ...
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class LRUCacheBackend(CacheBackend):
+    """
+    Cache en memoria del proceso con caducidad (TTL) y expulsion LRU al superar max_entries.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # Las generaciones van aparte para que la expulsion LRU nunca las borre:
+        # si se perdieran volverian a 0 y reaparecerian entradas antiguas
+        self._generations: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def get_generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    async def bump_generation(self, namespace: str) -> int:
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        return self._generations[namespace]
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class KeyValueStore(Protocol):
+    """
+    Subconjunto del API de redis.asyncio.Redis que necesita la cache compartida.
+    """
+
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    async def set(self, key: str, value: bytes, ex: Optional[int] = None) -> Any: ...
+
+    async def delete(self, *keys: str) -> Any: ...
+
+    async def incr(self, key: str) -> int: ...
+
+
+class LocalKeyValueStore:
+    """
+    Sustituto local de un almacen clave-valor compartido (mismo API que redis.asyncio),
+    pensado para desarrollo y tests sin servicios externos.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ex: Optional[int] = None) -> bool:
+        self._data[key] = (time.monotonic() + ex if ex else None, value)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    async def incr(self, key: str) -> int:
+        current = int((await self.get(key)) or 0) + 1
+        self._data[key] = (None, str(current).encode())
+        return current
+
+
+class SharedCacheBackend(CacheBackend):
+    """
+    Cache compartida entre workers sobre un KeyValueStore. Los valores se guardan como JSON.
+    """
+
+    def __init__(self, store: KeyValueStore, prefix: str = "konohapi:cache:"):
+        self.store = store
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.store.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        await self.store.set(self.prefix + key, json.dumps(value).encode(), ex=ttl)
+
+    async def delete(self, key: str) -> None:
+        await self.store.delete(self.prefix + key)
+
+    async def get_generation(self, namespace: str) -> int:
+        raw = await self.store.get(f"{self.prefix}gen:{namespace}")
+        return int(raw or 0)
+
+    async def bump_generation(self, namespace: str) -> int:
+        return await self.store.incr(f"{self.prefix}gen:{namespace}")
+
+
+class ResponseCache:
+    """
+    Cache de lectura (read-through) para las respuestas de la API.
+
+    - Las entradas de elemento (item) se invalidan una a una por id.
+    - El resto de entradas (listados, vistas compuestas) llevan la generacion del
+      namespace en la clave; invalidar el namespace es incrementar la generacion.
+    """
+
+    def __init__(self, backend: CacheBackend, default_ttl: int):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def _read_through(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[int]) -> Any:
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = await loader()
+        await self.backend.set(key, value, ttl or self.default_ttl)
+        return value
+
+    async def get_or_load(self, namespace: str, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[int] = None) -> Any:
+        """
+        Devuelve el valor cacheado para (namespace, key) o lo carga con loader y lo guarda.
+        """
+        generation = await self.backend.get_generation(namespace)
+        return await self._read_through(f"{namespace}:{generation}:{key}", loader, ttl)
+
+    async def get_or_load_item(self, namespace: str, item_id: int, loader: Callable[[], Awaitable[Any]], ttl: Optional[int] = None) -> Any:
+        """
+        Igual que get_or_load, para la representacion de un unico elemento.
+        """
+        return await self._read_through(f"{namespace}:item:{item_id}", loader, ttl)
+
+    async def get_items(self, namespace: str, item_ids: Iterable[int]) -> Dict[int, Any]:
+        """
+        Entradas de elemento cacheadas de esos ids (las que falten no aparecen en el resultado).
+        """
+        found: Dict[int, Any] = {}
+        for item_id in item_ids:
+            value = await self.backend.get(f"{namespace}:item:{item_id}")
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                found[item_id] = value
+        return found
+
+    async def set_item(self, namespace: str, item_id: int, value: Any, ttl: Optional[int] = None) -> None:
+        await self.backend.set(f"{namespace}:item:{item_id}", value, ttl or self.default_ttl)
+
+    async def invalidate_item(self, namespace: str, item_id: int) -> None:
+        self.invalidations += 1
+        await self.backend.delete(f"{namespace}:item:{item_id}")
+
+    async def invalidate_namespace(self, namespace: str) -> None:
+        self.invalidations += 1
+        await self.backend.bump_generation(namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "entries": self.backend.size(),
+            "evictions": getattr(self.backend, "evictions", None),
+        }
+
+
+def build_cache_backend() -> CacheBackend:
+    """
+    Crea el backend configurado en CACHE_BACKEND ('memory' o 'shared').
+    El backend compartido usa Redis si hay CACHE_URL y, si no, el almacen local.
+    """
+    if settings.CACHE_BACKEND == "memory":
+        return LRUCacheBackend(max_entries=settings.CACHE_MAX_ENTRIES)
+
+    if settings.CACHE_BACKEND == "shared":
+        if not settings.CACHE_URL:
+            return SharedCacheBackend(LocalKeyValueStore())
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as error:
+            raise RuntimeError("CACHE_URL requiere el paquete 'redis' instalado") from error
+        return SharedCacheBackend(redis_asyncio.from_url(settings.CACHE_URL))
+
+    raise ValueError(f"CACHE_BACKEND '{settings.CACHE_BACKEND}' no soportado (usa 'memory' o 'shared')")
+
+
+# Instancia global compartida por todos los routers
+response_cache = ResponseCache(build_cache_backend(), default_ttl=settings.CACHE_TTL_SECONDS)
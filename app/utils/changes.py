@@ -0,0 +1,285 @@
+import asyncio
+import json
+import logging
+import secrets
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Type, Union
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlmodel import SQLModel
+
+from ..config.settings import settings
+from ..db.session import get_engine
+from ..models.db_models import utc_now
+from .metrics import changefeed_events, changefeed_resets, changefeed_subscribers
+
+logger = logging.getLogger("konohapi.changes")
+
+# Canal de NOTIFY y eventos por notificacion (el payload de NOTIFY tiene un maximo de 8000 bytes)
+CHANGE_CHANNEL = "konohapi_changes"
+NOTIFY_MAX_EVENTS = 50
+# Clave en session.info con los cambios pendientes de publicar en el commit
+PENDING_KEY = "konohapi_changes"
+
+CHANGE_OPS = ("create", "update", "upsert", "delete", "link", "unlink")
+
+
+def resource_name(DBModel: Type[SQLModel]) -> str:
+    """
+    Nombre del recurso en los eventos: la tabla del modelo ('character', 'clan', 'jutsu').
+    """
+    return DBModel.__tablename__ # type: ignore
+
+
+def feed_backend() -> str:
+    """
+    Backend configurado en CHANGE_FEED_BACKEND: con 'auto', NOTIFY si la BD es PostgreSQL y en memoria si no.
+    """
+    if settings.CHANGE_FEED_BACKEND == "auto":
+        return "postgres" if get_engine().url.get_backend_name() == "postgresql" else "memory"
+    if settings.CHANGE_FEED_BACKEND in ("postgres", "memory"):
+        return settings.CHANGE_FEED_BACKEND
+    raise ValueError(f"CHANGE_FEED_BACKEND '{settings.CHANGE_FEED_BACKEND}' no soportado (usa 'auto', 'postgres' o 'memory')")
+
+
+def record_change(db: AsyncSession, DBModel: Type[SQLModel], op: str, item_ids: Iterable[Optional[int]], version: Optional[int] = None) -> None:
+    """
+    Apunta en la sesion el cambio de unas filas. Se publica cuando la transaccion hace commit
+    y se descarta si hace rollback, asi nunca se anuncia una escritura que no ha llegado a la BD.
+    """
+    pending = db.info.setdefault(PENDING_KEY, [])
+    at = utc_now().isoformat()
+    for item_id in item_ids:
+        if item_id is not None:
+            pending.append({"resource": resource_name(DBModel), "op": op, "id": item_id, "version": version, "at": at})
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_pending(session: Session) -> None:
+    # Con PostgreSQL los eventos viajan con NOTIFY dentro de la misma transaccion: la BD solo los
+    # entrega si el commit se completa, y a todos los workers que escuchan el canal (tambien a este)
+    pending = session.info.get(PENDING_KEY)
+    if not pending or changes.backend != "postgres":
+        return
+    for start in range(0, len(pending), NOTIFY_MAX_EVENTS):
+        payload = json.dumps(pending[start:start + NOTIFY_MAX_EVENTS])
+        session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANGE_CHANNEL, "payload": payload})
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending and changes.backend == "memory":
+        for change in pending:
+            changes.broker.publish(change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+class Subscription:
+    """
+    Cola de eventos de un cliente conectado, con su filtro de recursos (None = todos).
+    Si el cliente no consume a tiempo y la cola se llena, se vacia y recibe un reset.
+    """
+
+    def __init__(self, transport: str, resources: Optional[Set[str]], queue_size: int):
+        self.transport = transport
+        self.resources = resources
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(queue_size)
+
+    def matches(self, change: Dict[str, Any]) -> bool:
+        return self.resources is None or change["resource"] in self.resources
+
+    def push(self, change: Dict[str, Any]) -> None:
+        if not self.matches(change):
+            return
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            self.reset("overflow")
+
+    def reset(self, reason: str) -> None:
+        # Los eventos que se pierden ya no se pueden recuperar: el cliente tiene que volver a cargar
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        changefeed_resets.inc(reason)
+        self.queue.put_nowait({"reset": reason})
+
+    async def get(self) -> Dict[str, Any]:
+        return await self.queue.get()
+
+
+class ChangeBroker:
+    """
+    Reparte los eventos de cambio a los suscriptores de este worker y guarda los ultimos para que
+    un cliente que se reconecta pueda reanudar desde su ultimo cursor ('<epoca>-<secuencia>').
+    La epoca cambia cuando se pierde la continuidad (p. ej. se cae la conexion LISTEN).
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.epoch = secrets.token_hex(4)
+        self.seq = 0
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self._subscribers: Set[Subscription] = set()
+
+    def cursor(self) -> str:
+        return f"{self.epoch}-{self.seq}"
+
+    def publish(self, change: Dict[str, Any]) -> None:
+        self.seq += 1
+        change = {**change, "seq": self.seq, "cursor": f"{self.epoch}-{self.seq}"}
+        self._buffer.append(change)
+        changefeed_events.inc(change["resource"], change["op"])
+        for subscription in self._subscribers:
+            subscription.push(change)
+
+    def reset(self, reason: str) -> None:
+        """
+        Se ha podido perder algun evento: nueva epoca, fuera el historial y reset a todos los suscriptores.
+        """
+        self.epoch = secrets.token_hex(4)
+        self.seq = 0
+        self._buffer.clear()
+        for subscription in self._subscribers:
+            subscription.reset(reason)
+
+    def _replay(self, after: str) -> Optional[List[Dict[str, Any]]]:
+        # Eventos posteriores al cursor, o None si ya no estan todos (otra epoca o fuera del historial)
+        epoch, _, seq = after.rpartition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        first_kept = self._buffer[0]["seq"] if self._buffer else self.seq + 1
+        if int(seq) < first_kept - 1:
+            return None
+        return [change for change in self._buffer if change["seq"] > int(seq)]
+
+    def subscribe(self, transport: str, resources: Optional[Set[str]], after: Optional[str]) -> Optional[Subscription]:
+        """
+        Registra un suscriptor (None si ya no caben mas en este worker). Con after se le envian
+        primero los eventos que se perdio; si no se pueden recuperar empieza con un reset.
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscription = Subscription(transport, resources, self.queue_size)
+        if after:
+            replay = self._replay(after)
+            if replay is None:
+                subscription.reset("resume_unavailable")
+            else:
+                for change in replay:
+                    subscription.push(change)
+        self._subscribers.add(subscription)
+        self._update_gauge()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        self._update_gauge()
+
+    def _update_gauge(self) -> None:
+        for transport in ("sse", "websocket"):
+            changefeed_subscribers.set(sum(1 for subscription in self._subscribers if subscription.transport == transport), transport)
+
+
+class PostgresChangeListener:
+    """
+    Una conexion LISTEN por worker, fuera del pool, que pasa al broker los NOTIFY de todos los workers.
+    Se arranca con el primer suscriptor y se reconecta sola; tras una reconexion el broker hace reset.
+    """
+
+    def __init__(self, url: Union[str, URL], broker: ChangeBroker):
+        # asyncpg recibe la URL sin el driver de SQLAlchemy (postgresql+asyncpg -> postgresql)
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.broker = broker
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            import asyncpg
+        except ImportError as error:
+            raise RuntimeError("El feed de cambios con PostgreSQL requiere el paquete 'asyncpg' instalado") from error
+        self._task = asyncio.get_running_loop().create_task(self._run(asyncpg))
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        for change in json.loads(payload):
+            self.broker.publish(change)
+
+    async def _run(self, asyncpg) -> None:
+        delay = 1.0
+        connected_before = False
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(CHANGE_CHANNEL, self._on_notify)
+                if connected_before:
+                    # Mientras no habia conexion se han podido perder notificaciones
+                    self.broker.reset("listener_reconnected")
+                connected_before, delay = True, 1.0
+                await lost.wait()
+            except asyncio.CancelledError:
+                if connection is not None:
+                    await connection.close()
+                raise
+            except Exception as error:
+                logger.warning("Feed de cambios: fallo en la conexion LISTEN (%s), reintento en %.0f s", error, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+class ChangeFeed:
+    """
+    Punto de entrada del feed de cambios: broker del worker y, con PostgreSQL, su conexion LISTEN.
+    El backend se decide la primera vez que hace falta, con el engine ya creado.
+    """
+
+    def __init__(self):
+        self._backend: Optional[str] = None
+        self.broker = ChangeBroker(settings.CHANGE_FEED_BUFFER, settings.CHANGE_FEED_QUEUE_SIZE, settings.CHANGE_FEED_MAX_SUBSCRIBERS)
+        self.listener: Optional[PostgresChangeListener] = None
+
+    @property
+    def backend(self) -> str:
+        if self._backend is None:
+            self._backend = feed_backend()
+        return self._backend
+
+    def subscribe(self, transport: str, resources: Optional[Set[str]], after: Optional[str]) -> Optional[Subscription]:
+        if self.backend == "postgres":
+            if self.listener is None:
+                self.listener = PostgresChangeListener(get_engine().url, self.broker)
+            self.listener.start()
+        return self.broker.subscribe(transport, resources, after)
+
+    async def close(self) -> None:
+        """
+        Cierra la conexion LISTEN (al apagar la app). Se vuelve a abrir con el siguiente suscriptor.
+        """
+        if self.listener is not None:
+            await self.listener.stop()
+        self._backend = None
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.broker.unsubscribe(subscription)
+
+
+# Instancia global del worker (un solo LISTEN por proceso)
+changes = ChangeFeed()
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+from fastapi import HTTPException, status
+
+from .metrics import singleflight_coalesced, singleflight_leaders, singleflight_timeouts
+
+
+def _consume_exception(flight: "asyncio.Future[Any]") -> None:
+    # Si ninguna peticion esperaba la carga, evita el aviso de excepcion sin recoger
+    if not flight.cancelled():
+        flight.exception()
+
+
+def flight_key(*parts: Any, query: Iterable[Tuple[str, str]] = ()) -> str:
+    """
+    Clave de una lectura: sus partes fijas mas los parametros de la query ordenados.
+    """
+    return ":".join(str(part) for part in parts) + "?" + "&".join(f"{key}={value}" for key, value in sorted(query))
+
+
+class SingleFlight:
+    """
+    Agrupa las lecturas concurrentes identicas: la primera peticion con una clave (lider) ejecuta
+    la carga y las que llegan mientras esta en curso esperan su resultado en lugar de repetirla.
+
+    No es una cache: en cuanto termina la carga la clave se libera y la siguiente peticion vuelve
+    a la BD. Los errores de la carga (p. ej. un 404) tambien se comparten.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, "asyncio.Future[Any]"] = {}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def run(self, name: str, key: str, loader: Callable[[], Awaitable[Any]], timeout: float) -> Any:
+        """
+        Ejecuta loader o se une a la carga en curso con la misma clave. name agrupa las metricas
+        (p. ej. 'characters:item'). Si la carga en curso tarda mas de timeout segundos se responde
+        504 y la clave se libera, para que las siguientes peticiones no esperen a un lider atascado.
+        """
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                return await self._lead(name, key, loader)
+
+            singleflight_coalesced.inc(name)
+            try:
+                # shield: si esta peticion se cancela o se cansa, la carga sigue para los demas
+                return await asyncio.wait_for(asyncio.shield(flight), timeout)
+            except asyncio.TimeoutError:
+                singleflight_timeouts.inc(name)
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="La lectura en curso ha superado el tiempo de espera")
+            except asyncio.CancelledError:
+                # Se ha cancelado el lider (no esta peticion): se reintenta, normalmente como nuevo lider
+                if flight.cancelled():
+                    continue
+                raise
+
+    async def _lead(self, name: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        flight: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        flight.add_done_callback(_consume_exception)
+        self._flights[key] = flight
+        singleflight_leaders.inc(name)
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as error:
+            flight.set_exception(error)
+            raise
+        else:
+            flight.set_result(value)
+            return value
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+
+# Instancia global compartida por las rutas de lectura
+read_flights = SingleFlight()
@@ -0,0 +1,207 @@
+import gzip
+import hashlib
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from fastapi import Request, Response, status
+from starlette.concurrency import run_in_threadpool
+
+from ..config.settings import settings
+from .etag import encoded_etag
+from .metrics import compression_cpu_seconds, compression_responses, compression_reused, compression_saved_bytes
+from .serialization import JSON_MEDIA_TYPE
+
+Compressor = Callable[[bytes, int], bytes]
+
+# Preferencia del servidor cuando el cliente acepta varias con la misma q, y nivel por defecto
+# de cada una: compromiso entre ratio y CPU para respuestas generadas en cada peticion
+PREFERENCE = ("zstd", "br", "gzip")
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+# Paquete que necesita cada codificacion (gzip va en la libreria estandar)
+ENCODING_PACKAGES = {"br": "brotli", "zstd": "zstandard"}
+
+
+def _gzip(body: bytes, level: int) -> bytes:
+    # mtime=0: la misma entrada produce siempre los mismos bytes
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def _load_compressor(encoding: str) -> Optional[Compressor]:
+    # None si el paquete de la codificacion no esta instalado
+    if encoding == "gzip":
+        return _gzip
+    try:
+        if encoding == "br":
+            import brotli
+            return lambda body, level: brotli.compress(body, quality=level)
+        import zstandard
+        return lambda body, level: zstandard.ZstdCompressor(level=level).compress(body)
+    except ImportError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def available_compressors() -> Dict[str, Compressor]:
+    """
+    Compresores ofrecidos, en orden de preferencia. Con COMPRESSION_ENCODINGS vacio son todos los
+    instalados (gzip siempre; br con 'brotli' y zstd con 'zstandard'); si la lista pide uno que no
+    esta instalado es un error de configuracion.
+    """
+    if not settings.COMPRESSION_ENCODINGS:
+        loaded = {encoding: _load_compressor(encoding) for encoding in PREFERENCE}
+        return {encoding: compressor for encoding, compressor in loaded.items() if compressor is not None}
+
+    compressors: Dict[str, Compressor] = {}
+    for encoding in (name.strip() for name in settings.COMPRESSION_ENCODINGS.split(",") if name.strip()):
+        if encoding not in PREFERENCE:
+            raise ValueError(f"COMPRESSION_ENCODINGS: '{encoding}' no soportada (usa {', '.join(PREFERENCE)})")
+        compressor = _load_compressor(encoding)
+        if compressor is None:
+            raise RuntimeError(f"COMPRESSION_ENCODINGS incluye '{encoding}', que requiere el paquete '{ENCODING_PACKAGES[encoding]}' instalado")
+        compressors[encoding] = compressor
+    return compressors
+
+
+def negotiate(accept_encoding: Optional[str], encodings: Sequence[str]) -> Optional[str]:
+    """
+    Codificacion a usar segun Accept-Encoding: la de mayor q entre las ofrecidas y, a igual q,
+    la primera de encodings. None si el cliente no acepta ninguna.
+    """
+    if not accept_encoding:
+        return None
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressedBodyStore:
+    """
+    Cuerpos ya comprimidos en memoria del proceso (LRU acotado en bytes), por codificacion, nivel y
+    hash del cuerpo. Como la clave es el contenido no hace falta invalidar: un cuerpo nuevo es otra clave.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, int, bytes], bytes]" = OrderedDict()
+
+    def get(self, key: Tuple[str, int, bytes]) -> Optional[bytes]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Tuple[str, int, bytes], value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._entries[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+# Instancia global compartida por las rutas que reutilizan cuerpos comprimidos
+compressed_bodies = CompressedBodyStore(max_bytes=settings.COMPRESSION_CACHE_BYTES)
+
+
+class ResponseCompressor:
+    """
+    Compresion negociada (Accept-Encoding) de las respuestas JSON de una ruta. Los cuerpos de menos
+    de min_size bytes se envian sin comprimir y los de COMPRESSION_THREADPOOL_SIZE o mas se comprimen
+    en el threadpool. Con reuse los cuerpos comprimidos se guardan en compressed_bodies y un cuerpo
+    identico no se vuelve a comprimir (lecturas cacheables).
+    Cada codificacion lleva su propio ETag (sufijo '-gzip', '-br', '-zstd'); If-None-Match e If-Match
+    aceptan cualquiera de ellos porque todos identifican la misma version del recurso.
+    """
+
+    def __init__(self, route: str, min_size: Optional[int] = None, levels: Optional[Dict[str, int]] = None, reuse: bool = False, enabled: bool = True):
+        self.route = route
+        self.min_size = settings.COMPRESSION_MIN_SIZE if min_size is None else min_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.reuse = reuse
+        self.enabled = enabled and settings.COMPRESSION
+
+    def _compress_timed(self, body: bytes, encoding: str, level: int) -> Tuple[bytes, float]:
+        # Tiempo de CPU del hilo que comprime (el del bucle de eventos o uno del threadpool)
+        start = time.thread_time()
+        compressed = available_compressors()[encoding](body, level)
+        return compressed, time.thread_time() - start
+
+    async def compress(self, body: bytes, encoding: str) -> bytes:
+        level = self.levels[encoding]
+        key = (encoding, level, hashlib.blake2b(body, digest_size=16).digest()) if self.reuse else None
+        if key is not None:
+            cached = compressed_bodies.get(key)
+            if cached is not None:
+                compression_reused.inc(self.route, encoding)
+                return cached
+
+        # Un cuerpo grande bloquearia el bucle de eventos mientras se comprime: va a un hilo
+        if len(body) >= settings.COMPRESSION_THREADPOOL_SIZE:
+            compressed, cpu_seconds = await run_in_threadpool(self._compress_timed, body, encoding, level)
+        else:
+            compressed, cpu_seconds = self._compress_timed(body, encoding, level)
+        compression_cpu_seconds.inc(self.route, encoding, amount=cpu_seconds)
+        if key is not None:
+            compressed_bodies.set(key, compressed)
+        return compressed
+
+    def encoding_for(self, request: Request, body: bytes) -> Optional[str]:
+        """
+        Codificacion que se usaria para este cuerpo (None si va sin comprimir).
+        """
+        if not self.enabled or len(body) < self.min_size:
+            return None
+        return negotiate(request.headers.get("accept-encoding"), list(available_compressors()))
+
+    def not_modified(self, request: Request, body: bytes, etag: str) -> Response:
+        """
+        304 con el ETag de la representacion que se habria enviado.
+        """
+        headers = {"ETag": encoded_etag(etag, self.encoding_for(request, body))}
+        if self.enabled:
+            headers["Vary"] = "Accept-Encoding"
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    async def response(self, request: Request, body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+        """
+        Respuesta JSON con body comprimido si el cliente lo acepta y merece la pena.
+        """
+        if not self.enabled:
+            return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+        headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+        encoding = self.encoding_for(request, body)
+        if encoding is None:
+            return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+        compressed = await self.compress(body, encoding)
+        # Si no se gana nada (datos ya comprimidos o muy repetidos por azar) se envia tal cual
+        if len(compressed) >= len(body):
+            return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+        compression_responses.inc(self.route, encoding)
+        compression_saved_bytes.inc(self.route, encoding, amount=len(body) - len(compressed))
+        if "ETag" in headers:
+            headers["ETag"] = encoded_etag(headers["ETag"], encoding)
+        return Response(content=compressed, media_type=JSON_MEDIA_TYPE, headers={**headers, "Content-Encoding": encoding})
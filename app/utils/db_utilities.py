@@ -1,10 +1,53 @@
 from sqlmodel import select,SQLModel
 from fastapi import HTTPException, status
 from typing import TypeVar, Type, Dict, Any
+from sqlalchemy import delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..models.db_models import utc_now
+from .changes import record_change
+from .etag import ANY_VERSION, ExpectedVersions, version_matches
+
 model_type = TypeVar("model_type",bound=SQLModel)
 
+def not_found(DBModel : Type[SQLModel], element_id : int) -> HTTPException:
+    """
+    Construye el 404 estandar para un elemento que no existe.
+    """
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Error, resultado del modelo {DBModel} no encontrado con el id : {element_id}')
+
+def supports_returning(db : AsyncSession) -> bool:
+    """
+    Indica si el dialecto de la sesion admite UPDATE ... RETURNING y DELETE ... RETURNING.
+    """
+    dialect = db.get_bind().dialect
+    return bool(dialect.update_returning and dialect.delete_returning)
+
+def precondition_failed() -> HTTPException:
+    """
+    Construye el 412 de una escritura condicional (If-Match) cuya version no coincide.
+    """
+    return HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="If-Match no coincide con la version actual")
+
+def next_version_values(DBModel : Type[SQLModel]) -> Dict[str,Any]:
+    """
+    Valores que toda escritura debe aplicar a los modelos versionados: version + 1 y updated_at.
+    """
+    table = DBModel.__table__ # type: ignore
+    if "version" not in table.c:
+        return {}
+    return {"version": table.c.version + 1, "updated_at": utc_now()}
+
+def version_condition(DBModel : Type[SQLModel], expected_versions : ExpectedVersions):
+    """
+    Condicion WHERE que comprueba la precondicion If-Match en la propia sentencia.
+    Devuelve None si no hay que comprobar nada.
+    """
+    if expected_versions is None or expected_versions == ANY_VERSION:
+        return None
+    table = DBModel.__table__ # type: ignore
+    return table.c.version.in_(expected_versions)
+
 async def search_model_by_id(DBModel : Type[model_type] , element_id : int, db : AsyncSession) -> model_type :
     """
     Obtiene un elemento de la base de datos por su ID.
@@ -15,25 +58,37 @@ async def search_model_by_id(DBModel : Type[model_type] , element_id : int, db :
     
     # Manejo del 404
     if not element:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Error, resultado del modelo {DBModel} no encontrado con el id : {element_id}')
+        raise not_found(DBModel,element_id)
     
     return element
 
-async def update_model(DBModel : Type[model_type] ,new_db_model_data : Dict[str,Any], element_id : int, db : AsyncSession) -> model_type:
+async def update_model(DBModel : Type[model_type] ,new_db_model_data : Dict[str,Any], element_id : int, db : AsyncSession, expected_versions : ExpectedVersions = None) -> model_type:
     """
     Busca un elemento en la BD y actualiza todo el elemento o solo una parte, segun el valor de patch.
+    Si se pasan expected_versions (cabecera If-Match) y no coinciden lanza 412.
     """
     # Buscamos el personaje con la id pasada por el usuario
 
     character_to_update = await search_model_by_id(DBModel,element_id,db)
 
+    # Escritura condicional: la version cargada debe ser la que el cliente espera
+    if hasattr(character_to_update, "version") and not version_matches(expected_versions, character_to_update.version): # type: ignore
+        raise precondition_failed()
+
     # 4. Recorremos los datos obtenidos de la BD y los modificados por los pasados por el usuario
     
     for key,value in new_db_model_data.items():
         setattr(character_to_update,key,value)
 
+    # Subimos la version para que cambie el ETag
+    if new_db_model_data and hasattr(character_to_update, "version"):
+        character_to_update.version += 1 # type: ignore
+        character_to_update.updated_at = utc_now() # type: ignore
+
     # 5. Agregar la sesion
     db.add(character_to_update)
+    if new_db_model_data:
+        record_change(db, DBModel, "update", [element_id], getattr(character_to_update, "version", None))
 
     # 6. Guardar en la BD (commit)
     await db.commit()
@@ -42,4 +97,62 @@ async def update_model(DBModel : Type[model_type] ,new_db_model_data : Dict[str,
     await db.refresh(character_to_update)
 
     # 8. Devolver el personaje creado
-    return character_to_update
\ No newline at end of file
+    return character_to_update
+
+async def _check_missing_row(DBModel : Type[SQLModel], element_id : int, db : AsyncSession, expected_versions : ExpectedVersions) -> HTTPException:
+    """
+    Cuando una sentencia condicional no devuelve filas puede ser porque el elemento no existe (404)
+    o porque su version no coincide (412). Solo en ese caso se hace una consulta extra para distinguirlo.
+    """
+    if version_condition(DBModel, expected_versions) is None:
+        return not_found(DBModel,element_id)
+    table = DBModel.__table__ # type: ignore
+    exists = (await db.execute(select(table.c.id).where(table.c.id == element_id))).first()
+    return precondition_failed() if exists else not_found(DBModel,element_id)
+
+async def update_model_returning(DBModel : Type[model_type] ,new_db_model_data : Dict[str,Any], element_id : int, db : AsyncSession, expected_versions : ExpectedVersions = None) -> model_type:
+    """
+    Actualiza un elemento con una unica sentencia UPDATE ... RETURNING, sin cargarlo antes.
+    Si la sentencia no devuelve ninguna fila el elemento no existe (404) o su version
+    no coincide con la de If-Match (412).
+    """
+    # Sin datos que cambiar no hay UPDATE posible: basta con devolver el elemento
+    if not new_db_model_data:
+        element = await search_model_by_id(DBModel,element_id,db)
+        if hasattr(element, "version") and not version_matches(expected_versions, element.version): # type: ignore
+            raise precondition_failed()
+        return element
+
+    table = DBModel.__table__ # type: ignore
+    query = update(table).where(table.c.id == element_id).values(**new_db_model_data, **next_version_values(DBModel)).returning(*table.c)
+    condition = version_condition(DBModel, expected_versions)
+    if condition is not None:
+        query = query.where(condition)
+    row = (await db.execute(query)).mappings().first()
+
+    if row is None:
+        raise await _check_missing_row(DBModel, element_id, db, expected_versions)
+
+    record_change(db, DBModel, "update", [element_id], row.get("version"))
+    await db.commit()
+
+    # Construimos el modelo a partir de la fila devuelta, sin volver a consultar la BD
+    return DBModel.model_validate(dict(row))
+
+async def delete_model_returning(DBModel : Type[SQLModel], element_id : int, db : AsyncSession, expected_versions : ExpectedVersions = None) -> None:
+    """
+    Elimina un elemento con una unica sentencia DELETE ... RETURNING.
+    Lanza HTTPException 404 si no existia o 412 si su version no coincide con la de If-Match.
+    """
+    table = DBModel.__table__ # type: ignore
+    query = delete(table).where(table.c.id == element_id).returning(table.c.id)
+    condition = version_condition(DBModel, expected_versions)
+    if condition is not None:
+        query = query.where(condition)
+    deleted_id = (await db.execute(query)).scalar()
+
+    if deleted_id is None:
+        raise await _check_missing_row(DBModel, element_id, db, expected_versions)
+
+    record_change(db, DBModel, "delete", [element_id])
+    await db.commit()
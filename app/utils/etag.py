@@ -0,0 +1,137 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, status
+
+# Instante de referencia para convertir updated_at (UTC sin zona horaria) en un entero estable
+_EPOCH = datetime(1970, 1, 1)
+
+# Valor especial de If-Match: cualquier version existente
+ANY_VERSION = "*"
+
+# Lo que devuelve parse_if_match: None (sin cabecera), '*' o la lista de versiones aceptadas
+ExpectedVersions = Union[None, str, List[int]]
+
+
+def _timestamp(updated_at: Union[datetime, str]) -> int:
+    """
+    Convierte updated_at en microsegundos desde 1970. Admite la fecha en ISO 8601
+    porque las respuestas cacheadas la guardan ya serializada.
+    """
+    if isinstance(updated_at, str):
+        updated_at = datetime.fromisoformat(updated_at)
+    if updated_at.tzinfo is not None:
+        updated_at = updated_at.replace(tzinfo=None) - updated_at.utcoffset()  # type: ignore[operator]
+    delta = updated_at - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def make_etag(version: int, updated_at: Union[datetime, str]) -> str:
+    """
+    ETag fuerte de una fila a partir de su version y su fecha de actualizacion.
+    """
+    return f'"{version}-{_timestamp(updated_at)}"'
+
+
+def collection_etag(rows: Iterable[Tuple[int, int]], *extra: object) -> str:
+    """
+    ETag debil de un listado: resume (id, version) de cada fila y los datos de la pagina.
+    """
+    digest = hashlib.sha1()
+    for item_id, version in rows:
+        digest.update(f"{item_id}:{version};".encode())
+    digest.update(repr(extra).encode())
+    return f'W/"{digest.hexdigest()[:20]}"'
+
+
+def body_etag(payload: object) -> str:
+    """
+    ETag debil calculado sobre el cuerpo (ya serializado a bytes o serializable a JSON). Se usa cuando
+    la respuesta incluye datos de otras tablas (relaciones expandidas) que no cambian la version de la fila.
+    """
+    if isinstance(payload, bytes):
+        raw = payload
+    else:
+        raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return f'W/"{hashlib.sha1(raw).hexdigest()[:20]}"'
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    ETag de la representacion comprimida: el del recurso con la codificacion como sufijo
+    ('"3-1700000000000000-gzip"'), porque un validador fuerte identifica unos bytes concretos.
+    """
+    if encoding is None:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _strip_encoding(etag: str) -> str:
+    # Quita el sufijo de codificacion: la version y el hash son numeros y hex sin guiones, asi que
+    # un ultimo segmento solo de letras tras un guion solo puede ser la codificacion
+    head, dash, tail = etag.rstrip('"').rpartition("-")
+    if dash and tail.isalpha():
+        return f'{head}"'
+    return etag
+
+
+def _split_header(header: str) -> List[str]:
+    return [_strip_encoding(value.strip()) for value in header.split(",") if value.strip()]
+
+
+def none_match(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Indica si la cabecera If-None-Match coincide con el ETag (comparacion debil, sin tener en
+    cuenta la codificacion), es decir, si se puede responder 304 Not Modified.
+    """
+    if not if_none_match:
+        return False
+    candidates = _split_header(if_none_match)
+    if ANY_VERSION in candidates:
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.removeprefix("W/") == opaque for candidate in candidates)
+
+
+def parse_if_match(if_match: Optional[str]) -> ExpectedVersions:
+    """
+    Interpreta la cabecera If-Match y devuelve las versiones aceptadas.
+    El ETag de una representacion comprimida vale igual: identifica la misma version.
+    Lanza 412 si ningun ETag tiene el formato de esta API, porque nunca podria coincidir.
+    La fecha del ETag no se compara: version sube en cada escritura y basta para detectar
+    conflictos, mientras que la precision de updated_at depende de la BD (SQLite guarda las
+    filas rellenadas por la migracion sin microsegundos).
+    """
+    if if_match is None:
+        return None
+    candidates = _split_header(if_match)
+    if ANY_VERSION in candidates:
+        return ANY_VERSION
+
+    expected = []
+    for candidate in candidates:
+        # If-Match usa comparacion fuerte: un ETag debil nunca coincide
+        if candidate.startswith("W/"):
+            continue
+        try:
+            version, timestamp = candidate.strip('"').split("-", 1)
+            # La fecha no se compara, pero tiene que ser un numero para que el ETag sea de esta API
+            int(timestamp)
+            expected.append(int(version))
+        except ValueError:
+            continue
+
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="If-Match no coincide con la version actual")
+    return expected
+
+
+def version_matches(expected: ExpectedVersions, version: int) -> bool:
+    """
+    Comprueba en Python si una fila ya cargada cumple la precondicion If-Match.
+    """
+    if expected is None or expected == ANY_VERSION:
+        return True
+    return version in expected
@@ -0,0 +1,158 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload, noload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import SQLModel
+
+# Arbol de expansion: relacion -> sub-arbol (vacio si no se expande mas)
+ExpandTree = Dict[str, "ExpandTree"]
+
+
+def model_relationships(DBModel: Type[SQLModel]) -> Dict[str, Any]:
+    """
+    Relaciones declaradas en el modelo ORM, indexadas por nombre.
+    """
+    return dict(sa_inspect(DBModel).relationships.items())
+
+
+def parse_expand(expand: Optional[str], DBModel: Type[SQLModel], max_depth: int, max_paths: int) -> ExpandTree:
+    """
+    Convierte 'clan,jutsus.users' en un arbol de relaciones validado contra el modelo.
+    Lanza HTTPException 400 si una relacion no existe o se superan los limites configurados.
+    """
+    tree: ExpandTree = {}
+    if not expand:
+        return tree
+
+    paths = [path.strip() for path in expand.split(",") if path.strip()]
+    if len(paths) > max_paths:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Como maximo se pueden expandir {max_paths} relaciones")
+
+    for path in paths:
+        names = path.split(".")
+        if len(names) > max_depth:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"'{path}' supera la profundidad maxima de expansion ({max_depth})")
+
+        # Recorremos la ruta validando cada salto contra las relaciones del modelo correspondiente
+        node, model = tree, DBModel
+        for name in names:
+            relationships = model_relationships(model)
+            if name not in relationships:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"'{name}' no es una relacion de {model.__name__}. Relaciones disponibles: {', '.join(relationships) or 'ninguna'}",
+                )
+            node = node.setdefault(name, {})
+            model = relationships[name].mapper.class_
+    return tree
+
+
+def expand_options(DBModel: Type[SQLModel], tree: ExpandTree, entity: Any = None) -> List[Any]:
+    """
+    Opciones de carga para la query segun el arbol de expansion.
+
+    Las relaciones a uno van con joinedload (se resuelven en la misma query). Las colecciones
+    quedan con noload: las carga despues load_collections, como mucho max_items por padre.
+    entity es el alias del modelo cuando la query no selecciona el modelo directamente.
+    """
+    options = []
+    relationships = model_relationships(DBModel)
+    for name, subtree in tree.items():
+        relationship = relationships[name]
+        attribute = getattr(entity if entity is not None else DBModel, name)
+        if relationship.uselist:
+            options.append(noload(attribute))
+            continue
+        loader = joinedload(attribute)
+        for child in expand_options(relationship.mapper.class_, subtree):
+            loader = loader.options(child)
+        options.append(loader)
+    return options
+
+
+async def _load_limited(db: AsyncSession, parents: Sequence[SQLModel], name: str, relationship: Any, subtree: ExpandTree, max_items: int) -> List[SQLModel]:
+    # Una query por coleccion y nivel: row_number() por padre corta en la BD a max_items filas,
+    # asi una pagina con colecciones enormes nunca trae mas de len(parents) * max_items hijos
+    ChildModel = relationship.mapper.class_
+    child_table = ChildModel.__table__  # type: ignore[attr-defined]
+    (parent_column, owner_column), = relationship.synchronize_pairs
+    source = child_table
+    if relationship.secondary is not None:
+        # Muchos a muchos: el padre esta en la tabla de enlaces
+        (child_column, link_column), = relationship.secondary_synchronize_pairs
+        source = child_table.join(relationship.secondary, child_column == link_column)
+
+    parent_ids = {getattr(parent, parent_column.key) for parent in parents}
+    position = func.row_number().over(partition_by=owner_column, order_by=child_table.c.id)
+    ranked = (
+        select(child_table, owner_column.label("expand_owner"), position.label("expand_position"))
+        .select_from(source)
+        .where(owner_column.in_(parent_ids))
+        .subquery()
+    )
+    entity = aliased(ChildModel, ranked)
+    query = (
+        select(entity, ranked.c.expand_owner)
+        .where(ranked.c.expand_position <= max_items)
+        .order_by(ranked.c.expand_owner, ranked.c.expand_position)
+        .options(*expand_options(ChildModel, subtree, entity))
+    )
+
+    children_by_parent: Dict[Any, List[SQLModel]] = defaultdict(list)
+    for child, owner_id in await db.execute(query):
+        children_by_parent[owner_id].append(child)
+    for parent in parents:
+        set_committed_value(parent, name, children_by_parent.get(getattr(parent, parent_column.key), []))
+    return [child for children in children_by_parent.values() for child in children]
+
+
+async def load_collections(db: AsyncSession, DBModel: Type[SQLModel], items: Sequence[SQLModel], tree: ExpandTree, max_items: int) -> None:
+    """
+    Carga las colecciones del arbol de expansion de items (ya leidos con expand_options), como mucho
+    max_items elementos por padre y con una query por coleccion y nivel, sin importar el tamaño de la pagina.
+    """
+    if not items:
+        return
+    relationships = model_relationships(DBModel)
+    for name, subtree in tree.items():
+        relationship = relationships[name]
+        if relationship.uselist:
+            children = await _load_limited(db, items, name, relationship, subtree, max_items)
+        else:
+            children = [child for child in (getattr(item, name) for item in items) if child is not None]
+        if subtree:
+            # Un mismo hijo puede colgar de varios padres (muchos a muchos): se procesa una vez
+            unique = list({id(child): child for child in children}.values())
+            await load_collections(db, relationship.mapper.class_, unique, subtree, max_items)
+
+
+def dump_relations(item: SQLModel, tree: ExpandTree, max_items: int) -> Dict[str, Any]:
+    """
+    Vuelca solo las relaciones del arbol (ya cargadas) de un objeto ORM.
+    Las colecciones ya vienen limitadas por load_collections; el recorte a max_items solo protege
+    de colecciones cargadas por otro camino.
+    """
+    data: Dict[str, Any] = {}
+    for name, subtree in tree.items():
+        value = getattr(item, name)
+        if value is None:
+            data[name] = None
+        elif isinstance(value, list):
+            data[name] = [dump_expanded(child, subtree, max_items) for child in value[:max_items]]
+        else:
+            data[name] = dump_expanded(value, subtree, max_items)
+    return data
+
+
+def dump_expanded(item: SQLModel, tree: ExpandTree, max_items: int) -> Dict[str, Any]:
+    """
+    Vuelca un objeto ORM a dict junto con las relaciones del arbol.
+    """
+    data = item.model_dump()
+    data.update(dump_relations(item, tree, max_items))
+    return data
@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from datetime import date
+from typing import Any, AsyncIterator, List, Sequence
+
+from sqlalchemy.sql import Select
+
+from ..db.session import read_async_session
+
+# Formatos de exportacion soportados y su content-type
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value: Any) -> str:
+    """
+    Convierte a texto los valores que json no sabe serializar (fechas en ISO 8601).
+    """
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _ndjson_chunk(columns: List[str], rows: Sequence[Sequence]) -> bytes:
+    """
+    Serializa un bloque de filas como NDJSON (un objeto JSON por linea).
+    """
+    lines = [json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False) for row in rows]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _csv_chunk(rows: Sequence[Sequence]) -> bytes:
+    """
+    Serializa un bloque de filas como CSV.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_export(query: Select, export_format: str, chunk_size: int) -> AsyncIterator[bytes]:
+    """
+    Recorre el resultado de la query con un cursor del lado del servidor y va emitiendo
+    bloques de chunk_size filas ya serializados, sin materializar la tabla en memoria.
+
+    Abre su propia sesion (sobre la replica de lectura, si la hay) porque el generador se consume
+    mientras se envia la respuesta.
+    """
+    columns = [column.name for column in query.selected_columns]
+
+    if export_format == "csv":
+        yield _csv_chunk([columns])
+
+    async with read_async_session() as session:
+        # yield_per activa el cursor de servidor y fija cuantas filas se piden a la BD cada vez
+        result = await session.stream(query.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions(chunk_size):
+            if export_format == "csv":
+                yield _csv_chunk(rows)
+            else:
+                yield _ndjson_chunk(columns, rows)
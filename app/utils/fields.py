@@ -0,0 +1,42 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Type
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import load_only
+from sqlmodel import SQLModel
+
+from .expand import ExpandTree, dump_relations
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Optional[List[str]]:
+    """
+    Interpreta el parametro fields ('id,name,rank') y valida que todos los campos sean publicos.
+    Devuelve None si no se ha pedido un subconjunto de campos.
+    """
+    if not fields:
+        return None
+
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos no validos: {', '.join(unknown)}. Campos disponibles: {', '.join(allowed)}",
+        )
+    return names
+
+
+def load_only_option(DBModel: Type[SQLModel], field_names: Iterable[str]):
+    """
+    Opcion de carga que limita el SELECT a las columnas indicadas.
+    """
+    return load_only(*(getattr(DBModel, name) for name in dict.fromkeys(field_names)))
+
+
+def project_item(item: SQLModel, field_names: Sequence[str], tree: ExpandTree, max_items: int) -> Dict[str, Any]:
+    """
+    Vuelca solo los campos pedidos (y las relaciones expandidas) de un objeto cargado con load_only.
+    No usa model_dump porque leeria tambien las columnas diferidas y provocaria cargas perezosas.
+    """
+    data: Dict[str, Any] = {name: getattr(item, name) for name in field_names}
+    data.update(dump_relations(item, tree, max_items))
+    return data
@@ -0,0 +1,150 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+from ..models.db_models import Character, CharacterJutsuLink, Jutsu
+from ..models.schemas import PageMeta
+from .bulk import dialect_insert
+from .cache import response_cache
+from .changes import record_change
+from .pagination import decode_cursor, encode_cursor
+
+LINK_TABLE = CharacterJutsuLink.__table__  # type: ignore[attr-defined]
+# Enlaces por peticion de aprendizaje: todos van en un solo INSERT multi-fila
+MAX_LINKS_PER_REQUEST = 1000
+# Namespaces de cache de los dos extremos: su detalle con ?expand=jutsus / ?expand=users incluye los enlaces
+LINK_NAMESPACES = ((Character, "characters"), (Jutsu, "jutsus"))
+
+
+def check_link_batch(items: Sequence[Any]) -> None:
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La lista de enlaces esta vacia")
+    if len(items) > MAX_LINKS_PER_REQUEST:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Maximo {MAX_LINKS_PER_REQUEST} enlaces por peticion")
+
+
+async def ensure_exist(db: AsyncSession, DBModel: Type[SQLModel], ids: Sequence[int]) -> None:
+    """
+    Comprueba con una sola query que existen todos los ids. Lanza 404 con los que faltan.
+    """
+    id_column = DBModel.__table__.c.id  # type: ignore[attr-defined]
+    found = set((await db.execute(select(id_column).where(id_column.in_(set(ids))))).scalars())
+    missing = sorted(set(ids) - found)
+    if missing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No existen {DBModel.__name__} con id: {', '.join(map(str, missing))}")
+
+
+async def upsert_links(db: AsyncSession, links: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Enlaces personaje-jutsu en un solo INSERT multi-fila: se insertan si no existen y solo se
+    actualiza el episodio si viene informado. Devuelve los enlaces tal como quedan en la BD.
+    """
+    # Un mismo par dos veces en la sentencia haria fallar ON CONFLICT: gana el ultimo
+    unique = list({(link["character_id"], link["jutsu_id"]): link for link in links}.values())
+    statement = dialect_insert(db, LINK_TABLE)
+    statement = statement.on_conflict_do_update(
+        index_elements=[LINK_TABLE.c.character_id, LINK_TABLE.c.jutsu_id],
+        set_={"learned_in_episode": func.coalesce(statement.excluded.learned_in_episode, LINK_TABLE.c.learned_in_episode)},
+    ).returning(*LINK_TABLE.c, sort_by_parameter_order=True)
+    result = await db.execute(statement, unique)
+    return [dict(row._mapping) for row in result]
+
+
+async def delete_link(db: AsyncSession, character_id: int, jutsu_id: int) -> bool:
+    result = await db.execute(delete(LINK_TABLE).where(LINK_TABLE.c.character_id == character_id, LINK_TABLE.c.jutsu_id == jutsu_id))
+    return result.rowcount > 0  # type: ignore[attr-defined]
+
+
+def _link_ends(links: Sequence[Tuple[int, int]]) -> List[Tuple[Type[SQLModel], str, List[int]]]:
+    # (modelo, namespace, ids) de cada extremo para pares (character_id, jutsu_id)
+    ends = (sorted({character_id for character_id, _ in links}), sorted({jutsu_id for _, jutsu_id in links}))
+    return [(DBModel, namespace, ids) for (DBModel, namespace), ids in zip(LINK_NAMESPACES, ends)]
+
+
+async def record_link_changes(db: AsyncSession, op: str, links: Sequence[Tuple[int, int]]) -> None:
+    """
+    Apunta en el feed de cambios los enlaces creados ('link') o borrados ('unlink'), con un evento por
+    personaje y por jutsu. El enlace no cambia la version de las filas: el evento lleva la actual.
+    """
+    for DBModel, _, ids in _link_ends(links):
+        table = DBModel.__table__  # type: ignore[attr-defined]
+        for item_id, version in await db.execute(select(table.c.id, table.c.version).where(table.c.id.in_(ids))):
+            record_change(db, DBModel, op, [item_id], version)
+
+
+async def invalidate_link_views(links: Sequence[Tuple[int, int]]) -> None:
+    """
+    Invalida en cache el detalle de los personajes y jutsus enlazados y los listados de los dos
+    recursos (las expansiones cacheadas incluyen los enlaces).
+    """
+    for _, namespace, ids in _link_ends(links):
+        for item_id in ids:
+            await response_cache.invalidate_item(namespace, item_id)
+        await response_cache.invalidate_namespace(namespace)
+
+
+async def linked_page(db: AsyncSession, owner_column: str, owner_id: int, TargetModel: Type[SQLModel], limit: int, after: Optional[int]) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Pagina de elementos enlazados a owner_id, leida desde la tabla de enlaces y ordenada por el id
+    del otro extremo. El filtro y el orden coinciden con un indice de la tabla de enlaces
+    (PK (character_id, jutsu_id) o ix (jutsu_id, character_id)), asi que cada pagina es un
+    recorrido de rango sin ordenar todos los enlaces del propietario.
+    """
+    target_column = LINK_TABLE.c.jutsu_id if owner_column == "character_id" else LINK_TABLE.c.character_id
+    target = TargetModel.__table__  # type: ignore[attr-defined]
+    query = (
+        select(*target.c, LINK_TABLE.c.learned_in_episode)
+        .select_from(LINK_TABLE.join(target, target.c.id == target_column))
+        .where(LINK_TABLE.c[owner_column] == owner_id)
+        .order_by(target_column)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        query = query.where(target_column > after)
+    rows = [dict(row._mapping) for row in await db.execute(query)]
+    return rows[:limit], len(rows) > limit
+
+
+def decode_link_cursor(cursor: Optional[str], key: str, TargetModel: Type[SQLModel]) -> Optional[int]:
+    """
+    Id del ultimo elemento de la pagina anterior (las paginas de enlaces solo se ordenan por id).
+    """
+    if not cursor:
+        return None
+    return decode_cursor(cursor, key, TargetModel, "id")[1]
+
+
+def link_page(rows: List[Dict[str, Any]], has_more: bool, limit: int, key: str) -> Dict[str, Any]:
+    next_cursor = encode_cursor(key, None, rows[-1]["id"]) if has_more else None
+    return {"items": rows, "meta": PageMeta(limit=limit, count=len(rows), sort=key, has_more=has_more, next_cursor=next_cursor)}
+
+
+async def characters_sharing_jutsus(db: AsyncSession, character_id: int, limit: int, min_shared: int = 1) -> List[Dict[str, Any]]:
+    """
+    Personajes que comparten jutsus con character_id, ordenados por numero de jutsus en comun.
+    Es un unico agregado sobre la tabla de enlaces (autojoin por jutsu_id) que solo lee indices:
+    la PK para los jutsus del personaje e ix (jutsu_id, character_id) para sus otros usuarios.
+    """
+    mine = LINK_TABLE.alias("mine")
+    other = LINK_TABLE.alias("other")
+    shared = func.count().label("shared_jutsus")
+    overlap = (
+        select(other.c.character_id, shared)
+        .select_from(mine.join(other, and_(other.c.jutsu_id == mine.c.jutsu_id, other.c.character_id != mine.c.character_id)))
+        .where(mine.c.character_id == character_id)
+        .group_by(other.c.character_id)
+        .having(func.count() >= min_shared)
+        .order_by(shared.desc(), other.c.character_id)
+        .limit(limit)
+        .subquery()
+    )
+    character = Character.__table__  # type: ignore[attr-defined]
+    query = (
+        select(character.c.id, character.c.name, overlap.c.shared_jutsus)
+        .select_from(overlap.join(character, character.c.id == overlap.c.character_id))
+        .order_by(overlap.c.shared_jutsus.desc(), character.c.id)
+    )
+    return [dict(row._mapping) for row in await db.execute(query)]
@@ -0,0 +1,298 @@
+import bisect
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from ..config.settings import settings
+
+logger = logging.getLogger("konohapi.sql")
+
+# Valores de las etiquetas de una serie, en el orden en que se declararon
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """
+    Histograma acumulado con etiquetas, en el formato de Prometheus (buckets le, _sum y _count).
+    """
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Por serie: cuentas por bucket (la ultima posicion es +Inf), suma y numero de observaciones
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        counts, total = self._series.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, label_values, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, label_values)} {total[0]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, label_values)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """
+    Contador monotono con etiquetas.
+    """
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str]):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Gauge:
+    """
+    Valor instantaneo con etiquetas (sube y baja).
+    """
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str]):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *label_values: str) -> None:
+        self._values[label_values] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class DecayingAverage:
+    """
+    Media movil exponencial en el tiempo: cada observacion pesa menos cuanto mas antigua es
+    (la mitad cada half_life segundos). Sin observaciones nuevas el valor tiende a 0, asi que
+    una presion pasada no se queda 'pegada' cuando deja de haber trafico.
+    """
+
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self._value = 0.0
+        self._updated = time.monotonic()
+
+    def _decay(self, now: float) -> float:
+        return 0.5 ** ((now - self._updated) / self.half_life)
+
+    def observe(self, value: float) -> None:
+        now = time.monotonic()
+        # Cada observacion entra con peso 1/4 sobre lo acumulado (ya envejecido)
+        self._value = self._value * self._decay(now) * 0.75 + value * 0.25
+        self._updated = now
+
+    def value(self) -> float:
+        return self._value * self._decay(time.monotonic())
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+request_duration = Histogram("konohapi_http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta", ("method", "route", "status"), LATENCY_BUCKETS)
+request_queries = Histogram("konohapi_http_request_queries", "Queries SQL ejecutadas por peticion", ("method", "route"), QUERY_COUNT_BUCKETS)
+request_db_time = Histogram("konohapi_http_request_db_seconds", "Tiempo en la BD por peticion", ("method", "route"), LATENCY_BUCKETS)
+queries_total = Counter("konohapi_db_queries_total", "Queries SQL ejecutadas", ("engine",))
+slow_queries_total = Counter("konohapi_db_slow_queries_total", "Queries SQL por encima de SLOW_QUERY_MS", ("engine",))
+pool_checkout = Histogram("konohapi_db_pool_checkout_seconds", "Espera para obtener una conexion del pool", ("engine",), LATENCY_BUCKETS)
+singleflight_leaders = Counter("konohapi_singleflight_leaders_total", "Cargas ejecutadas por lecturas agrupadas (single-flight)", ("flight",))
+singleflight_coalesced = Counter("konohapi_singleflight_coalesced_total", "Peticiones servidas con la carga en curso de otra peticion identica", ("flight",))
+singleflight_timeouts = Counter("konohapi_singleflight_timeouts_total", "Peticiones que se cansaron de esperar una carga en curso", ("flight",))
+admission_admitted = Counter("konohapi_admission_admitted_total", "Peticiones admitidas por el control de admision", ("route_class",))
+admission_queued = Counter("konohapi_admission_queued_total", "Peticiones que han esperado turno en la cola de admision", ("route_class",))
+admission_shed = Counter("konohapi_admission_shed_total", "Peticiones rechazadas con 503 por el control de admision", ("route_class", "reason"))
+admission_active = Gauge("konohapi_admission_active", "Peticiones en curso por clase de ruta", ("route_class",))
+admission_waiting = Gauge("konohapi_admission_waiting", "Peticiones esperando turno por clase de ruta", ("route_class",))
+compression_responses = Counter("konohapi_compression_responses_total", "Respuestas enviadas comprimidas", ("route", "encoding"))
+compression_saved_bytes = Counter("konohapi_compression_saved_bytes_total", "Bytes ahorrados por la compresion (sin comprimir - comprimido)", ("route", "encoding"))
+compression_cpu_seconds = Counter("konohapi_compression_cpu_seconds_total", "Tiempo de CPU dedicado a comprimir respuestas", ("route", "encoding"))
+compression_reused = Counter("konohapi_compression_reused_total", "Respuestas servidas con un cuerpo ya comprimido (sin volver a comprimir)", ("route", "encoding"))
+changefeed_events = Counter("konohapi_changefeed_events_total", "Eventos del feed de cambios repartidos en este worker", ("resource", "op"))
+changefeed_resets = Counter("konohapi_changefeed_resets_total", "Suscripciones que han tenido que volver a cargar los datos (reset)", ("reason",))
+changefeed_subscribers = Gauge("konohapi_changefeed_subscribers", "Suscriptores conectados al feed de cambios", ("transport",))
+
+# Espera reciente para obtener una conexion, de todos los engines: es la señal de BD saturada
+pool_wait = DecayingAverage(half_life=2.0)
+
+# Engines instrumentados, por nombre ('primary', 'replica'), para exponer el estado de sus pools
+_engines: Dict[str, AsyncEngine] = {}
+
+
+@dataclass
+class RequestStats:
+    """
+    Queries y tiempo de BD acumulados durante una peticion.
+    """
+    queries: int = 0
+    db_time: float = 0.0
+
+
+# Estadisticas de la peticion en curso (None fuera de una peticion, p.ej. en scripts)
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Pool de conexiones que mide cuanto tarda cada checkout: la espera en la cola cuando el pool
+    esta lleno mas, si hace falta, abrir una conexion nueva.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - start
+            pool_checkout.observe(elapsed, getattr(self, "logging_name", None) or "primary")
+            pool_wait.observe(elapsed)
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """
+    Registra los eventos que cuentan las queries y el tiempo de BD de cada peticion,
+    y avisan en el log de las queries lentas.
+    """
+    _engines[name] = engine
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        queries_total.inc(name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            slow_queries_total.inc(name)
+            logger.warning("Query lenta (%.1f ms, engine %s): %s", elapsed * 1000, name, statement)
+
+
+def _pool_gauges() -> List[str]:
+    """
+    Estado actual de los pools: tamaño, conexiones en uso, overflow y saturacion (en uso / maximo).
+    """
+    gauges = {
+        "konohapi_db_pool_size": "Conexiones fijas del pool",
+        "konohapi_db_pool_checked_out": "Conexiones del pool en uso",
+        "konohapi_db_pool_overflow": "Conexiones abiertas por encima del tamaño del pool",
+        "konohapi_db_pool_saturation": "Conexiones en uso sobre el maximo (pool_size + max_overflow)",
+    }
+    values: Dict[str, List[str]] = {metric: [] for metric in gauges}
+    for name, engine in sorted(_engines.items()):
+        pool = engine.sync_engine.pool
+        # SQLite y otros pools sin tamaño fijo no tienen estas cifras
+        if not isinstance(pool, QueuePool):
+            continue
+        labels = _format_labels(("engine",), (name,))
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        values["konohapi_db_pool_size"].append(f"konohapi_db_pool_size{labels} {pool.size()}")
+        values["konohapi_db_pool_checked_out"].append(f"konohapi_db_pool_checked_out{labels} {pool.checkedout()}")
+        values["konohapi_db_pool_overflow"].append(f"konohapi_db_pool_overflow{labels} {max(pool.overflow(), 0)}")
+        values["konohapi_db_pool_saturation"].append(f"konohapi_db_pool_saturation{labels} {pool.checkedout() / capacity if capacity else 0.0}")
+
+    lines = []
+    for metric, description in gauges.items():
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} gauge", *values[metric]]
+    return lines
+
+
+def render_metrics() -> str:
+    """
+    Todas las metricas en el formato de texto de Prometheus.
+    """
+    lines: List[str] = []
+    for metric in (
+        request_duration, request_queries, request_db_time, queries_total, slow_queries_total, pool_checkout,
+        singleflight_leaders, singleflight_coalesced, singleflight_timeouts,
+        admission_admitted, admission_queued, admission_shed, admission_active, admission_waiting,
+        compression_responses, compression_saved_bytes, compression_cpu_seconds, compression_reused,
+        changefeed_events, changefeed_resets, changefeed_subscribers,
+    ):
+        lines += metric.render()
+    lines += _pool_gauges()
+    lines += ["# HELP konohapi_db_pool_wait_recent_seconds Media reciente de la espera por una conexion", "# TYPE konohapi_db_pool_wait_recent_seconds gauge", f"konohapi_db_pool_wait_recent_seconds {pool_wait.value()}"]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide cada peticion (latencia, queries y tiempo de BD) por plantilla de ruta.
+    Con SERVER_TIMING activo añade la cabecera Server-Timing a la respuesta para depurar.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.SERVER_TIMING:
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    timing = f'app;dur={elapsed_ms:.1f}, db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"'
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            # La plantilla (/characters/{item_id}) y no la ruta real, para no crear una serie por id
+            route = scope.get("route")
+            route_label = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            request_duration.observe(time.perf_counter() - start, method, route_label, str(status_code))
+            request_queries.observe(stats.queries, method, route_label)
+            request_db_time.observe(stats.db_time, method, route_label)
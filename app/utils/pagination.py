@@ -0,0 +1,175 @@
+import base64
+import binascii
+import inspect
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Type, Tuple, Union, get_args, get_origin
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import Select
+from sqlmodel import SQLModel
+
+# Operadores de filtro soportados por la factoria CRUD
+FILTER_OPERATORS = ("eq", "prefix")
+
+
+def get_column(DBModel: Type[SQLModel], field_name: str):
+    """
+    Devuelve la columna de la tabla asociada a un campo del modelo.
+    """
+    return DBModel.__table__.c[field_name]  # type: ignore[attr-defined]
+
+
+def field_python_type(DBModel: Type[SQLModel], field_name: str) -> Type[Any]:
+    """
+    Devuelve el tipo Python de un campo del modelo, sin el Optional.
+    """
+    annotation = DBModel.model_fields[field_name].annotation
+    if get_origin(annotation) is Union:
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    return annotation  # type: ignore[return-value]
+
+
+def encode_cursor(sort: str, value: Any, last_id: int) -> str:
+    """
+    Codifica la posicion del ultimo elemento devuelto en un token opaco.
+    """
+    payload = {"s": sort, "v": value, "id": last_id}
+    raw = json.dumps(payload, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, DBModel: Type[SQLModel], sort_field: str) -> Tuple[Any, int]:
+    """
+    Decodifica un cursor y devuelve (valor_de_ordenacion, id).
+    Lanza HTTPException 400 si el cursor no es valido o no corresponde a la ordenacion pedida.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, last_id = payload["v"], int(payload["id"])
+        cursor_sort = payload["s"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor no valido")
+
+    # Un cursor generado con otra ordenacion apuntaria a una posicion sin sentido
+    if cursor_sort != sort:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El cursor no corresponde a la ordenacion indicada")
+
+    # Los valores no nativos de JSON (fechas) viajan como texto y hay que reconstruirlos
+    if value is not None and sort_field != "id":
+        python_type = field_python_type(DBModel, sort_field)
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        elif python_type is date:
+            value = date.fromisoformat(value)
+
+    return value, last_id
+
+
+def parse_sort(sort: Optional[str], sort_fields: Tuple[str, ...]) -> Tuple[str, bool]:
+    """
+    Interpreta el parametro sort ('campo' o '-campo') y devuelve (campo, descendente).
+    """
+    if not sort:
+        return "id", False
+
+    descending = sort.startswith("-")
+    field_name = sort.lstrip("-")
+    if field_name != "id" and field_name not in sort_fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No se puede ordenar por '{field_name}'. Campos permitidos: {', '.join(('id',) + sort_fields)}",
+        )
+    return field_name, descending
+
+
+def parse_ids(ids: str, max_items: int) -> List[int]:
+    """
+    Interpreta el parametro ids ('1,2,3') de la lectura multiple. Quita duplicados sin cambiar el orden.
+    """
+    try:
+        item_ids = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids debe ser una lista de enteros separados por comas")
+    if not item_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids no puede estar vacio")
+    if len(item_ids) > max_items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Maximo {max_items} ids por peticion")
+    return item_ids
+
+
+def apply_filters(query: Select, DBModel: Type[SQLModel], filter_fields: Dict[str, str], filters: Dict[str, Any]) -> Select:
+    """
+    Añade a la query las condiciones WHERE de los filtros declarados en la configuracion.
+    """
+    for field_name, value in filters.items():
+        if value is None:
+            continue
+        column = get_column(DBModel, field_name)
+        if filter_fields[field_name] == "prefix":
+            query = query.where(column.startswith(value, autoescape=True))
+        else:
+            query = query.where(column == value)
+    return query
+
+
+def apply_keyset(query: Select, DBModel: Type[SQLModel], sort_field: str, descending: bool, cursor: Optional[Tuple[Any, int]]) -> Select:
+    """
+    Ordena la query por (campo, id) y, si hay cursor, continua justo despues de la ultima fila devuelta.
+    Los NULL van al final en orden ascendente y al principio en descendente, de forma que
+    el orden descendente es exactamente el inverso del ascendente.
+    """
+    id_column = get_column(DBModel, "id")
+
+    if sort_field == "id":
+        if cursor is not None:
+            query = query.where(id_column < cursor[1] if descending else id_column > cursor[1])
+        return query.order_by(id_column.desc() if descending else id_column.asc())
+
+    column = get_column(DBModel, sort_field)
+    if cursor is not None:
+        value, last_id = cursor
+        if descending:
+            if value is None:
+                condition = or_(and_(column.is_(None), id_column < last_id), column.is_not(None))
+            else:
+                condition = or_(column < value, and_(column == value, id_column < last_id))
+        else:
+            if value is None:
+                condition = and_(column.is_(None), id_column > last_id)
+            else:
+                condition = or_(column > value, and_(column == value, id_column > last_id), column.is_(None))
+        query = query.where(condition)
+
+    if descending:
+        return query.order_by(column.desc().nulls_first(), id_column.desc())
+    return query.order_by(column.asc().nulls_last(), id_column.asc())
+
+
+def build_filter_dependency(DBModel: Type[SQLModel], filter_fields: Dict[str, str]) -> Callable[..., Dict[str, Any]]:
+    """
+    Construye una dependencia de FastAPI con un parametro de query por cada filtro declarado,
+    de forma que aparezcan documentados en OpenAPI con su tipo correcto.
+    """
+    parameters = []
+    for field_name, operator in filter_fields.items():
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Operador de filtro '{operator}' no soportado para '{field_name}'")
+        python_type = str if operator == "prefix" else field_python_type(DBModel, field_name)
+        description = f"Filtra por prefijo de {field_name}" if operator == "prefix" else f"Filtra por {field_name}"
+        parameters.append(
+            inspect.Parameter(
+                field_name,
+                inspect.Parameter.KEYWORD_ONLY,
+                default=Query(None, description=description),
+                annotation=Optional[python_type],
+            )
+        )
+
+    def filters_dependency(**kwargs: Any) -> Dict[str, Any]:
+        return kwargs
+
+    filters_dependency.__signature__ = inspect.Signature(parameters)  # type: ignore[attr-defined]
+    return filters_dependency
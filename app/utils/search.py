@@ -0,0 +1,148 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+# Pesos de tsvector (A > B > C) y su equivalente para bm25 en SQLite
+BM25_WEIGHTS = {"A": 10.0, "B": 4.0, "C": 1.0}
+# Similitud trigram minima para aceptar un resultado solo por parecido (erratas)
+TRIGRAM_THRESHOLD = 0.3
+
+
+@dataclass(frozen=True)
+class SearchTarget:
+    """
+    Tabla en la que se busca: columnas del texto completo con su peso y columnas con indice trigram.
+    """
+    table: str
+    columns: Tuple[Tuple[str, str], ...]
+    trigram_columns: Tuple[str, ...]
+
+    @property
+    def fts_table(self) -> str:
+        return f"{self.table}_fts"
+
+
+# Tipos que acepta /search, en el orden en que se devuelven
+SEARCH_TARGETS: Dict[str, SearchTarget] = {
+    "characters": SearchTarget("character", (("name", "A"), ("full_name", "A"), ("biography", "C")), ("name", "full_name")),
+    "clans": SearchTarget("clan", (("name", "A"), ("description", "B")), ("name",)),
+    "jutsus": SearchTarget("jutsu", (("name", "A"),), ("name",)),
+}
+
+
+def search_terms(query: str) -> List[str]:
+    """
+    Palabras de la busqueda, sin signos: evita inyectar operadores de tsquery o de FTS5.
+    """
+    return re.findall(r"\w+", query.lower())
+
+
+# --- DDL de los indices de busqueda ---
+
+def postgres_search_ddl(target: SearchTarget) -> List[str]:
+    """
+    Columna tsvector generada con su indice GIN e indices trigram para los nombres.
+    Es lo mismo que crea la migracion d4e7a1c9b350 en las BDs gestionadas con Alembic.
+    """
+    vector = " || ".join(f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')" for column, weight in target.columns)
+    return [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"ALTER TABLE {target.table} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{target.table}_search_vector ON {target.table} USING gin (search_vector)",
+        *(f"CREATE INDEX IF NOT EXISTS ix_{target.table}_{column}_trgm ON {target.table} USING gin ({column} gin_trgm_ops)" for column in target.trigram_columns),
+    ]
+
+
+def sqlite_search_ddl(target: SearchTarget) -> List[str]:
+    """
+    Tabla FTS5 de contenido externo sobre la tabla original, sincronizada con triggers.
+    Es lo mismo que crea la migracion d4e7a1c9b350 en las BDs SQLite gestionadas con Alembic.
+    """
+    names = [column for column, _ in target.columns]
+    columns = ", ".join(names)
+    new_values = ", ".join(f"new.{column}" for column in names)
+    old_values = ", ".join(f"old.{column}" for column in names)
+    fts = target.fts_table
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{target.table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {target.table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {target.table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {target.table} BEGIN {delete_old} {insert_new} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _create_search_indexes(metadata, connection, **kwargs):
+    # Las BDs creadas con create_all (tests, benchmarks) tambien tienen busqueda
+    dialect = connection.dialect.name
+    for target in SEARCH_TARGETS.values():
+        if target.table not in metadata.tables:
+            continue
+        statements = postgres_search_ddl(target) if dialect == "postgresql" else sqlite_search_ddl(target) if dialect == "sqlite" else []
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+
+
+@event.listens_for(SQLModel.metadata, "before_drop")
+def _drop_search_indexes(metadata, connection, **kwargs):
+    # En PostgreSQL la columna y los indices caen con la tabla; las tablas FTS5 son aparte
+    if connection.dialect.name == "sqlite":
+        for target in SEARCH_TARGETS.values():
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {target.fts_table}")
+
+
+# --- Consultas ---
+
+def _postgres_query(target: SearchTarget):
+    similarity = ", ".join(f"similarity(coalesce({column}, ''), :query)" for column in target.trigram_columns)
+    trigram_match = " OR ".join(f"{column} % :query" for column in target.trigram_columns)
+    return text(
+        f"SELECT id, name, ts_rank_cd(search_vector, to_tsquery('simple', :tsquery)) + greatest({similarity}) AS score "
+        f"FROM {target.table} "
+        f"WHERE search_vector @@ to_tsquery('simple', :tsquery) OR {trigram_match} "
+        "ORDER BY score DESC, id LIMIT :limit"
+    )
+
+
+def _sqlite_query(target: SearchTarget):
+    weights = ", ".join(str(BM25_WEIGHTS[weight]) for _, weight in target.columns)
+    fts = target.fts_table
+    # bm25 devuelve valores negativos (mas negativo = mas relevante)
+    return text(
+        f"SELECT t.id, t.name, -bm25({fts}, {weights}) AS score "
+        f"FROM {fts} JOIN {target.table} AS t ON t.id = {fts}.rowid "
+        f"WHERE {fts} MATCH :match "
+        "ORDER BY score DESC, t.id LIMIT :limit"
+    )
+
+
+async def search(db: AsyncSession, target: SearchTarget, query: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Busqueda ordenada por relevancia en una tabla. Cada palabra se busca tambien como prefijo
+    ('naru' encuentra 'Naruto'); en PostgreSQL ademas se aceptan nombres parecidos (trigram).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        await db.execute(text(f"SET LOCAL pg_trgm.similarity_threshold = {TRIGRAM_THRESHOLD}"))
+        statement = _postgres_query(target)
+        params = {"tsquery": " & ".join(f"{term}:*" for term in terms), "query": " ".join(terms), "limit": limit}
+    elif dialect == "sqlite":
+        statement = _sqlite_query(target)
+        params = {"match": " ".join(f'"{term}"*' for term in terms), "limit": limit}
+    else:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=f"La busqueda no esta disponible con la BD {dialect} (solo PostgreSQL y SQLite)")
+
+    result = await db.execute(statement, params)
+    return [{"id": row.id, "name": row.name, "score": round(float(row.score), 4)} for row in result]
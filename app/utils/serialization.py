@@ -0,0 +1,48 @@
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Type
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+@lru_cache(maxsize=None)
+def type_adapter(schema: Type[Any]) -> TypeAdapter:
+    """
+    TypeAdapter del schema, construido una sola vez por tipo (crearlo compila el validador y el serializador).
+    """
+    return TypeAdapter(schema)
+
+
+def dump_model_json(schema: Type[Any], value: Any, exclude_unset: bool = False) -> bytes:
+    """
+    Vuelca value a bytes JSON segun el schema. Si value ya es una instancia del schema
+    no se valida, y si es un dict se valida una sola vez antes de serializar.
+    """
+    adapter = type_adapter(schema)
+    if not isinstance(value, schema):
+        value = adapter.validate_python(value)
+    return adapter.dump_json(value, exclude_unset=exclude_unset)
+
+
+def json_dumper(use_orjson: bool) -> Callable[[Any], bytes]:
+    """
+    Funcion que vuelca a bytes JSON los payloads que ya son dicts (cache, campos proyectados).
+    Por defecto usa el serializador de pydantic-core; con use_orjson, orjson.
+    """
+    if not use_orjson:
+        return to_json
+    try:
+        import orjson
+    except ImportError as error:
+        raise RuntimeError("use_orjson requiere el paquete 'orjson' instalado") from error
+    return orjson.dumps
+
+
+def json_response(body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Respuesta con un cuerpo JSON ya serializado, sin pasar por la validacion ni el encoder de FastAPI.
+    """
+    return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
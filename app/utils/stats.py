@@ -0,0 +1,178 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlmodel import SQLModel
+
+from ..models.db_models import StatsCounter
+
+# Valor de bucket que representa NULL (personajes sin clan o sin rango)
+NULL_BUCKET = ""
+
+
+@dataclass(frozen=True)
+class StatsMetric:
+    """
+    Contador de filas de una tabla agrupadas por una columna.
+    """
+    name: str
+    table: str
+    column: str
+
+
+# Metricas que mantienen los triggers, agrupadas por tabla
+STATS_METRICS: Tuple[StatsMetric, ...] = (
+    StatsMetric("clan_members", "character", "clan_id"),
+    StatsMetric("characters_by_rank", "character", "rank"),
+    StatsMetric("jutsu_learners", "characterjutsulink", "jutsu_id"),
+)
+
+_UPSERT = "ON CONFLICT (metric, bucket) DO UPDATE SET value = statscounter.value + excluded.value"
+
+
+def _metrics_by_table() -> Dict[str, List[StatsMetric]]:
+    tables: Dict[str, List[StatsMetric]] = {}
+    for metric in STATS_METRICS:
+        tables.setdefault(metric.table, []).append(metric)
+    return tables
+
+
+def _bucket(metric: StatsMetric, source: str) -> str:
+    return f"coalesce(CAST({source}.{metric.column} AS TEXT), '')"
+
+
+# --- DDL de los triggers ---
+
+def _postgres_delta(metrics: List[StatsMetric], old: bool, new: bool) -> str:
+    # Sin emparejar filas: en un UPDATE se resta todo lo antiguo y se suma todo lo nuevo,
+    # y las filas que no cambian de grupo se anulan en el sum()
+    parts = []
+    for metric in metrics:
+        if old:
+            parts.append(f"SELECT '{metric.name}' AS metric, {_bucket(metric, 'old_rows')} AS bucket, -1 AS delta FROM old_rows")
+        if new:
+            parts.append(f"SELECT '{metric.name}' AS metric, {_bucket(metric, 'new_rows')} AS bucket, 1 AS delta FROM new_rows")
+    # El ORDER BY fija el orden en que se bloquean los contadores y evita interbloqueos
+    return (
+        "INSERT INTO statscounter (metric, bucket, value) "
+        f"SELECT metric, bucket, sum(delta) FROM ({' UNION ALL '.join(parts)}) AS changes "
+        f"GROUP BY metric, bucket HAVING sum(delta) <> 0 ORDER BY metric, bucket {_UPSERT}"
+    )
+
+
+def postgres_stats_ddl() -> List[str]:
+    """
+    Triggers por sentencia con tablas de transicion: una escritura masiva (bulk, ingesta con COPY)
+    actualiza cada contador una sola vez, con su delta agregado. Es lo mismo que crea la
+    migracion a6d2e4b8c913 en las BDs gestionadas con Alembic.
+    """
+    statements = []
+    for table, metrics in _metrics_by_table().items():
+        for event_name, old, new in (("insert", False, True), ("delete", True, False), ("update", True, True)):
+            function = f"{table}_stats_{event_name}"
+            transition = " ".join(part for part, enabled in (("OLD TABLE AS old_rows", old), ("NEW TABLE AS new_rows", new)) if enabled)
+            statements += [
+                f"CREATE OR REPLACE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN {_postgres_delta(metrics, old, new)}; RETURN NULL; END $$",
+                f"DROP TRIGGER IF EXISTS {function} ON {table}",
+                f"CREATE TRIGGER {function} AFTER {event_name.upper()} ON {table} REFERENCING {transition} FOR EACH STATEMENT EXECUTE FUNCTION {function}()",
+            ]
+    return statements
+
+
+def _sqlite_bump(metric: StatsMetric, source: str, delta: int) -> str:
+    return f"INSERT INTO statscounter (metric, bucket, value) VALUES ('{metric.name}', {_bucket(metric, source)}, {delta}) {_UPSERT};"
+
+
+def sqlite_stats_ddl() -> List[str]:
+    """
+    SQLite no tiene triggers por sentencia: un trigger por fila y, en los UPDATE, solo si cambia la columna.
+    """
+    statements = []
+    for table, metrics in _metrics_by_table().items():
+        inserts = " ".join(_sqlite_bump(metric, "new", 1) for metric in metrics)
+        deletes = " ".join(_sqlite_bump(metric, "old", -1) for metric in metrics)
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_stats_ai AFTER INSERT ON {table} BEGIN {inserts} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_stats_ad AFTER DELETE ON {table} BEGIN {deletes} END",
+        ]
+        for metric in metrics:
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_stats_au_{metric.column} AFTER UPDATE OF {metric.column} ON {table} "
+                f"WHEN old.{metric.column} IS NOT new.{metric.column} "
+                f"BEGIN {_sqlite_bump(metric, 'old', -1)} {_sqlite_bump(metric, 'new', 1)} END"
+            )
+    return statements
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _create_stats_triggers(metadata, connection, **kwargs):
+    # Las BDs creadas con create_all (tests, benchmarks) tambien mantienen los contadores
+    if StatsCounter.__tablename__ not in metadata.tables:  # type: ignore[attr-defined]
+        return
+    dialect = connection.dialect.name
+    statements = postgres_stats_ddl() if dialect == "postgresql" else sqlite_stats_ddl() if dialect == "sqlite" else []
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+# --- Reconstruccion completa ---
+
+def rebuild_statements() -> List[str]:
+    return ["DELETE FROM statscounter"] + [
+        f"INSERT INTO statscounter (metric, bucket, value) "
+        f"SELECT '{metric.name}', {_bucket(metric, metric.table)}, count(*) FROM {metric.table} GROUP BY {metric.table}.{metric.column}"
+        for metric in STATS_METRICS
+    ]
+
+
+async def rebuild_stats(conn: AsyncConnection) -> None:
+    """
+    Recalcula todos los contadores desde las tablas. En PostgreSQL bloquea las escrituras
+    (no las lecturas) mientras dura, para no perder los deltas de transacciones concurrentes.
+    """
+    if conn.dialect.name == "postgresql":
+        tables = ", ".join(sorted({metric.table for metric in STATS_METRICS}))
+        await conn.exec_driver_sql(f"LOCK TABLE {tables} IN SHARE MODE")
+    for statement in rebuild_statements():
+        await conn.exec_driver_sql(statement)
+
+
+async def stats_drift(conn: AsyncConnection) -> Dict[str, List[Tuple[str, int, int]]]:
+    """
+    Compara los contadores con el recuento real: por metrica, (bucket, guardado, real) de los que no cuadran.
+    """
+    drift: Dict[str, List[Tuple[str, int, int]]] = {}
+    for metric in STATS_METRICS:
+        stored = dict((await conn.execute(text("SELECT bucket, value FROM statscounter WHERE metric = :metric"), {"metric": metric.name})).tuples().all())
+        actual = dict((await conn.exec_driver_sql(
+            f"SELECT {_bucket(metric, metric.table)}, count(*) FROM {metric.table} GROUP BY {metric.table}.{metric.column}"
+        )).tuples().all())
+        mismatches = [(bucket, stored.get(bucket, 0), actual.get(bucket, 0)) for bucket in sorted(set(stored) | set(actual)) if stored.get(bucket, 0) != actual.get(bucket, 0)]
+        if mismatches:
+            drift[metric.name] = mismatches
+    return drift
+
+
+# --- Lecturas ---
+
+async def top_buckets(db: AsyncSession, metric: str, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+    """
+    Buckets de una metrica de mayor a menor valor. Solo lee el indice (metric, value) de statscounter.
+    """
+    query = (
+        select(StatsCounter.bucket, StatsCounter.value)
+        .where(StatsCounter.metric == metric, StatsCounter.value > 0, StatsCounter.bucket != NULL_BUCKET)
+        .order_by(StatsCounter.value.desc(), StatsCounter.bucket)  # type: ignore[attr-defined]
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return list((await db.execute(query)).tuples().all())
+
+
+async def bucket_value(db: AsyncSession, metric: str, bucket: str) -> int:
+    """
+    Valor de un solo contador (busqueda por la PK).
+    """
+    value = (await db.execute(select(StatsCounter.value).where(StatsCounter.metric == metric, StatsCounter.bucket == bucket))).scalar()
+    return value or 0
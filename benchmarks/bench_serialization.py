@@ -0,0 +1,98 @@
+"""
+Micro-benchmark de la serializacion del listado: respuesta validada por FastAPI
+(response_model) frente al camino rapido con TypeAdapter y bytes JSON.
+
+No necesita base de datos: las filas se construyen en memoria y las peticiones se
+hacen en proceso con httpx.ASGITransport, asi que solo se mide la serializacion.
+
+Uso:
+    python -m benchmarks.bench_serialization --items 200 --requests 500
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import httpx
+from fastapi import FastAPI
+
+from app.models.db_models import Character
+from app.models.schemas import CharacterReadExpanded, Page, PageMeta
+from app.utils.expand import dump_expanded
+from app.utils.serialization import dump_model_json, json_response
+
+page_schema = Page[CharacterReadExpanded]
+
+
+def build_rows(count: int, biography_size: int) -> List[Character]:
+    return [
+        Character(
+            id=index,
+            name=f"Ninja {index}",
+            full_name=f"Ninja {index} de la Hoja",
+            rank="Chunin",
+            clan_id=index % 10,
+            biography="x" * biography_size,
+            image_url=f"https://example.com/{index}.png",
+            created_at=datetime(2024, 1, 1),
+            updated_at=datetime(2024, 1, 1),
+        )
+        for index in range(1, count + 1)
+    ]
+
+
+def build_app(rows: List[Character]) -> FastAPI:
+    app = FastAPI()
+
+    def load_page() -> Dict[str, Any]:
+        # Misma forma que la pagina que construye la factoria CRUD
+        return {
+            "items": [dump_expanded(row, {}, 100) for row in rows],
+            "meta": PageMeta(limit=len(rows), count=len(rows), sort="id", has_more=False),
+        }
+
+    @app.get("/before", response_model=page_schema, response_model_exclude_unset=True)
+    async def before():
+        return load_page()
+
+    @app.get("/after", response_model=page_schema, response_model_exclude_unset=True)
+    async def after():
+        return json_response(dump_model_json(page_schema, load_page(), exclude_unset=True))
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int) -> float:
+    # Calentamiento para no medir la primera construccion de validadores
+    for _ in range(10):
+        (await client.get(path)).raise_for_status()
+    start = time.perf_counter()
+    for _ in range(requests):
+        (await client.get(path)).raise_for_status()
+    return requests / (time.perf_counter() - start)
+
+
+async def main(items: int, requests: int, biography_size: int):
+    app = build_app(build_rows(items, biography_size))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        # Ambas rutas deben devolver exactamente el mismo JSON
+        before_body = (await client.get("/before")).json()
+        assert before_body == (await client.get("/after")).json(), "las dos rutas devuelven cuerpos distintos"
+
+        before = await measure(client, "/before", requests)
+        after = await measure(client, "/after", requests)
+
+    print(f"{items} elementos por pagina, biografia de {biography_size} caracteres, {requests} peticiones")
+    print(f"  response_model (antes): {before:10.1f} req/s")
+    print(f"  TypeAdapter (despues):  {after:10.1f} req/s")
+    print(f"  mejora:                 {after / before:10.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200, help="Elementos por pagina")
+    parser.add_argument("--requests", type=int, default=500, help="Peticiones medidas por ruta")
+    parser.add_argument("--biography-size", type=int, default=2000, help="Longitud de la biografia de cada personaje")
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.requests, args.biography_size))
@@ -0,0 +1,67 @@
+"""
+Arranque en frio de la app: cada medicion es un proceso nuevo de Python que mide
+por separado importar app.main, crear la app (create_app, rutas y schemas), arrancarla
+(lifespan: engines y pool precalentado) y responder la primera peticion a /ready.
+
+Importar app.main es lo que pagan los tests y los comandos que no levantan la app;
+la suma de las cuatro fases es lo que tarda un worker en atender su primera peticion.
+
+Uso:
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+from .common import DEFAULT_DATABASE_URL
+
+PHASES = ("import", "create_app", "startup", "first_request")
+
+# Se ejecuta en un proceso nuevo en cada medicion, para que nada este ya importado
+PROBE = r"""
+import asyncio, json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+application = app.main.create_app()
+created = time.perf_counter()
+
+async def run():
+    import httpx
+    async with application.router.lifespan_context(application):
+        started = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=application), base_url="http://bench") as client:
+            assert (await client.get("/ready")).status_code == 200
+        return started, time.perf_counter()
+
+started, answered = asyncio.run(run())
+print(json.dumps({"import": imported - start, "create_app": created - imported, "startup": started - created, "first_request": answered - started}))
+"""
+
+
+def measure(runs: int, database_url: str) -> Dict[str, List[float]]:
+    env = {**os.environ, "DATABASE_URL": database_url}
+    timings: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", PROBE], env=env, check=True, capture_output=True, text=True).stdout
+        for phase, seconds in json.loads(output.strip().splitlines()[-1]).items():
+            timings[phase].append(seconds)
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Procesos medidos")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL, help="URL async de la BD (SQLite/aiosqlite o PostgreSQL local)")
+    args = parser.parse_args()
+
+    timings = measure(args.runs, args.database_url)
+    totals = [sum(run) for run in zip(*timings.values())]
+    print(f"{args.runs} arranques en frio (mediana, ms)")
+    for phase in PHASES:
+        print(f"  {phase:<14} {statistics.median(timings[phase]) * 1000:8.1f}")
+    print(f"  {'total':<14} {statistics.median(totals) * 1000:8.1f}")
@@ -0,0 +1,15 @@
+import os
+
+# BD por defecto de los benchmarks: un fichero SQLite local, sin servicios externos
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///./bench.db"
+
+
+def use_database(database_url: str) -> None:
+    """
+    Configura el entorno antes de importar la app: settings lee DATABASE_URL al crearse.
+    Activa tambien Server-Timing, de donde el driver de carga saca las queries por peticion.
+    """
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["SERVER_TIMING"] = "true"
+    # Los benchmarks miden la app, no el log de queries lentas
+    os.environ.setdefault("SLOW_QUERY_MS", "60000")
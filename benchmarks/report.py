@@ -0,0 +1,102 @@
+import json
+import math
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Percentil por rango mas cercano sobre una lista ya ordenada.
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(values)) - 1, 0)
+    return values[rank]
+
+
+@dataclass
+class ScenarioResult:
+    """
+    Resultado de un escenario: latencias en milisegundos, throughput y queries por peticion.
+    """
+    name: str
+    requests: int
+    errors: int
+    duration: float
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries_per_request: Optional[float]
+
+
+@dataclass
+class ScenarioSamples:
+    """
+    Muestras en bruto que va recogiendo el driver de carga para un escenario.
+    """
+    name: str
+    latencies: List[float] = field(default_factory=list)
+    queries: List[int] = field(default_factory=list)
+    errors: int = 0
+
+    def summarize(self, duration: float) -> ScenarioResult:
+        latencies = sorted(self.latencies)
+        total = len(latencies) + self.errors
+        return ScenarioResult(
+            name=self.name,
+            requests=total,
+            errors=self.errors,
+            duration=round(duration, 3),
+            rps=round(total / duration, 1) if duration else 0.0,
+            p50_ms=round(percentile(latencies, 50) * 1000, 2),
+            p95_ms=round(percentile(latencies, 95) * 1000, 2),
+            p99_ms=round(percentile(latencies, 99) * 1000, 2),
+            # Sin cabecera Server-Timing (servidor sin SERVER_TIMING) no se conocen las queries
+            queries_per_request=round(sum(self.queries) / len(self.queries), 2) if self.queries else None,
+        )
+
+
+def format_table(results: List[ScenarioResult]) -> str:
+    header = f"{'escenario':<18}{'peticiones':>11}{'errores':>9}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        queries = "-" if result.queries_per_request is None else f"{result.queries_per_request:.2f}"
+        lines.append(
+            f"{result.name:<18}{result.requests:>11}{result.errors:>9}{result.rps:>10.1f}"
+            f"{result.p50_ms:>10.2f}{result.p95_ms:>10.2f}{result.p99_ms:>10.2f}{queries:>9}"
+        )
+    return "\n".join(lines)
+
+
+def save_results(path: str, results: List[ScenarioResult], metadata: Dict[str, object]) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"metadata": metadata, "results": [asdict(result) for result in results]}, file, indent=2)
+
+
+def load_results(path: str) -> Dict[str, ScenarioResult]:
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    return {item["name"]: ScenarioResult(**item) for item in data["results"]}
+
+
+def compare(results: List[ScenarioResult], baseline: Dict[str, ScenarioResult], tolerance: float) -> List[str]:
+    """
+    Compara con una ejecucion anterior y devuelve las regresiones: p95, req/s o queries por peticion
+    peores que la tolerancia relativa (0.1 = 10 %), o errores nuevos.
+    """
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            continue
+        if base.p95_ms and result.p95_ms > base.p95_ms * (1 + tolerance):
+            regressions.append(f"{result.name}: p95 {base.p95_ms:.2f} ms -> {result.p95_ms:.2f} ms")
+        if base.rps and result.rps < base.rps * (1 - tolerance):
+            regressions.append(f"{result.name}: {base.rps:.1f} req/s -> {result.rps:.1f} req/s")
+        # Las queries medias tambien con tolerancia: con cache dependen de la proporcion de aciertos
+        if base.queries_per_request is not None and result.queries_per_request is not None and result.queries_per_request > base.queries_per_request * (1 + tolerance):
+            regressions.append(f"{result.name}: {base.queries_per_request:.2f} -> {result.queries_per_request:.2f} queries por peticion")
+        if result.errors > base.errors:
+            regressions.append(f"{result.name}: {base.errors} -> {result.errors} errores")
+    return regressions
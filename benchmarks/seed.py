@@ -0,0 +1,102 @@
+"""
+Generador de datos sinteticos para los benchmarks: clanes, personajes, jutsus y enlaces
+CharacterJutsuLink. Con la misma semilla genera siempre los mismos datos.
+
+Uso:
+    python -m benchmarks.seed --database-url sqlite+aiosqlite:///./bench.db --characters 10000
+"""
+import argparse
+import asyncio
+import random
+from typing import Any, Dict, List
+
+from .common import DEFAULT_DATABASE_URL, use_database
+
+RANKS = ("Genin", "Chunin", "Jonin", "Kage", "Anbu", None)
+JUTSU_TYPES = ("Ninjutsu", "Taijutsu", "Genjutsu", "Kekkei Genkai")
+JUTSU_RANKS = ("E", "D", "C", "B", "A", "S")
+
+
+def _batches(rows: List[Dict[str, Any]], size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+async def seed_database(engine, clans: int, characters: int, jutsus: int, links_per_character: int, biography_size: int = 2000, seed: int = 42, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Recrea las tablas y las rellena con datos sinteticos. Devuelve cuantas filas se han insertado por tabla.
+    """
+    from sqlmodel import SQLModel
+    from app.models.db_models import Character, CharacterJutsuLink, Clan, Jutsu, utc_now
+    import app.utils.search  # noqa: F401  (create_all crea tambien los indices de busqueda)
+    import app.utils.stats  # noqa: F401  (y los triggers de los contadores de /stats)
+
+    rng = random.Random(seed)
+    now = utc_now()
+
+    clan_rows = [{"id": index, "name": f"Clan {index}", "description": f"Clan sintetico {index}", "version": 1, "updated_at": now} for index in range(1, clans + 1)]
+    jutsu_rows = [
+        {"id": index, "name": f"Jutsu {index}", "type": rng.choice(JUTSU_TYPES), "rank": rng.choice(JUTSU_RANKS), "version": 1, "updated_at": now}
+        for index in range(1, jutsus + 1)
+    ]
+    character_rows = [
+        {
+            "id": index,
+            "external_id": f"bench-{index}",
+            "name": f"Ninja {index}",
+            "full_name": f"Ninja {index} de la Hoja",
+            "rank": rng.choice(RANKS),
+            "clan_id": rng.randint(1, clans) if clans else None,
+            "biography": "x" * biography_size,
+            "image_url": f"https://example.com/characters/{index}.png",
+            "created_at": now,
+            "version": 1,
+            "updated_at": now,
+        }
+        for index in range(1, characters + 1)
+    ]
+    link_rows = [
+        {"character_id": character_id, "jutsu_id": jutsu_id, "learned_in_episode": rng.randint(1, 500)}
+        for character_id in range(1, characters + 1)
+        for jutsu_id in rng.sample(range(1, jutsus + 1), min(links_per_character, jutsus))
+    ]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+        await conn.run_sync(SQLModel.metadata.create_all)
+        # INSERT con executemany por lotes, en orden de claves ajenas
+        for model, rows in ((Clan, clan_rows), (Jutsu, jutsu_rows), (Character, character_rows), (CharacterJutsuLink, link_rows)):
+            for batch in _batches(rows, batch_size):
+                await conn.execute(model.__table__.insert(), batch)  # type: ignore[attr-defined]
+
+        # En PostgreSQL las secuencias no avanzan con ids explicitos: las ponemos al final
+        if conn.dialect.name == "postgresql":
+            for table in ("clan", "jutsu", "character"):
+                await conn.exec_driver_sql(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}")
+
+    return {"clans": len(clan_rows), "jutsus": len(jutsu_rows), "characters": len(character_rows), "links": len(link_rows)}
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--clans", type=int, default=50, help="Numero de clanes")
+    parser.add_argument("--characters", type=int, default=5000, help="Numero de personajes")
+    parser.add_argument("--jutsus", type=int, default=500, help="Numero de jutsus")
+    parser.add_argument("--links-per-character", type=int, default=5, help="Jutsus aprendidos por personaje")
+    parser.add_argument("--biography-size", type=int, default=2000, help="Longitud de la biografia de cada personaje")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla del generador")
+
+
+async def main(args: argparse.Namespace):
+    use_database(args.database_url)
+    from app.db.session import dispose_engines, get_engine
+
+    counts = await seed_database(get_engine(), args.clans, args.characters, args.jutsus, args.links_per_character, args.biography_size, args.seed)
+    await dispose_engines()
+    print(", ".join(f"{count} {table}" for table, count in counts.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL, help="URL async de la BD (SQLite/aiosqlite o PostgreSQL local)")
+    add_seed_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,88 @@
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+
+import httpx
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlmodel import SQLModel
+
+from app.db.session import dispose_engines, get_engine
+from app.main import create_app
+from app.utils.cache import LRUCacheBackend, response_cache
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    # Cada test usa su propia BD: la cache en memoria no puede arrastrar entradas de otro
+    monkeypatch.setattr(response_cache, "backend", LRUCacheBackend(max_entries=1000))
+
+
+@pytest.fixture
+def database_url(tmp_path) -> str:
+    return f"sqlite+aiosqlite:///{tmp_path / 'konohapi.db'}"
+
+
+@pytest.fixture
+def migrated_database_url(database_url, monkeypatch) -> str:
+    # BD creada con las migraciones de Alembic (alembic/env.py lee DATABASE_URL) en lugar de create_all
+    monkeypatch.setenv("DATABASE_URL", database_url)
+    command.upgrade(Config(str(ALEMBIC_INI)), "head")
+    return database_url
+
+
+@asynccontextmanager
+async def api_app(database_url: str, read_database_url: Optional[str] = None, create_tables: bool = True) -> AsyncIterator[FastAPI]:
+    """
+    App nueva con las tablas creadas. Con read_database_url (la misma BD con otra URL) hay un engine
+    de lectura distinto y la app se comporta como si tuviera replica.
+    Con create_tables=False se usa la BD tal como esta (p. ej. creada con las migraciones).
+    """
+    app = create_app(database_url, read_database_url)
+    try:
+        if create_tables:
+            async with get_engine().begin() as connection:
+                await connection.run_sync(SQLModel.metadata.create_all)
+        yield app
+    finally:
+        await dispose_engines()
+
+
+def http_client(app: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://konohapi")
+
+
+@asynccontextmanager
+async def api_client(database_url: str, read_database_url: Optional[str] = None, create_tables: bool = True) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Cliente HTTP contra una app nueva (ver api_app).
+    """
+    async with api_app(database_url, read_database_url, create_tables) as app:
+        async with http_client(app) as client:
+            yield client
+
+
+def statement_kinds(statements: List[str]) -> List[str]:
+    # Tipo de cada sentencia (SELECT, UPDATE...), para comprobar cuantas van a la BD
+    return [statement.split(None, 1)[0].upper() for statement in statements]
+
+
+@contextmanager
+def recorded_statements():
+    # Sentencias SQL que llegan al driver mientras dura el bloque
+    statements: List[str] = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = get_engine().sync_engine
+    event.listen(engine, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_execute)
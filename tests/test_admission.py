@@ -0,0 +1,61 @@
+import asyncio
+
+from app.config.settings import settings
+from app.utils.admission import AdmissionLimiter
+from app.utils.metrics import admission_active, admission_waiting
+
+from .conftest import api_client
+
+
+def gauge_value(gauge, label: str) -> float:
+    prefix = f'{gauge.name}{{route_class="{label}"}} '
+    return next(float(line[len(prefix):]) for line in gauge.render() if line.startswith(prefix))
+
+
+def test_limiter_queues_sheds_and_hands_over():
+    async def scenario():
+        limiter = AdmissionLimiter("tests", concurrency=1, queue_size=1, queue_timeout=5)
+        assert await limiter.acquire(under_pressure=False) is None
+
+        queued = asyncio.create_task(limiter.acquire(under_pressure=False))
+        await asyncio.sleep(0)
+        assert (gauge_value(admission_active, "tests"), gauge_value(admission_waiting, "tests")) == (1, 1)
+        assert await limiter.acquire(under_pressure=False) == "queue_full"
+        assert await limiter.acquire(under_pressure=True) == "pool_pressure"
+
+        # Al liberar, el hueco pasa al que esperaba sin quedar libre entre medias
+        limiter.release()
+        assert await queued is None
+        assert (gauge_value(admission_active, "tests"), gauge_value(admission_waiting, "tests")) == (1, 0)
+
+        limiter.release()
+        assert gauge_value(admission_active, "tests") == 0
+
+    asyncio.run(scenario())
+
+
+def test_limiter_queue_timeout():
+    async def scenario():
+        limiter = AdmissionLimiter("tests-timeout", concurrency=1, queue_size=1, queue_timeout=0.01)
+        assert await limiter.acquire(under_pressure=False) is None
+        assert await limiter.acquire(under_pressure=False) == "queue_timeout"
+        assert gauge_value(admission_waiting, "tests-timeout") == 0
+
+    asyncio.run(scenario())
+
+
+def test_middleware_sheds_reads_but_not_exempt_routes(database_url, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_READ_CONCURRENCY", 0)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_SIZE", 0)
+
+    async def scenario():
+        async with api_client(database_url) as client:
+            shed = await client.get("/characters")
+            assert shed.status_code == 503
+            assert shed.headers["retry-after"] == str(settings.ADMISSION_RETRY_AFTER)
+            assert (await client.post("/characters", json={"name": "Naruto"})).status_code == 201
+            metrics = await client.get("/metrics")
+            assert metrics.status_code == 200
+            assert 'konohapi_admission_shed_total{route_class="read",reason="queue_full"} 1' in metrics.text
+
+    asyncio.run(scenario())
@@ -0,0 +1,41 @@
+import asyncio
+
+from .conftest import api_client
+
+
+def test_ids_returns_items_in_order_and_missing(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            for name in ("Naruto", "Sasuke", "Sakura"):
+                await client.post("/characters", json={"name": name})
+            response = await client.get("/characters?ids=3,99,1")
+            assert response.status_code == 200
+            body = response.json()
+            assert [item["name"] for item in body["items"]] == ["Sakura", "Naruto"]
+            assert body["missing"] == [99]
+
+            assert (await client.get("/characters?ids=1&sort=name")).status_code == 400
+            assert (await client.get("/characters?ids=uno")).status_code == 400
+
+    asyncio.run(scenario())
+
+
+def test_batch_runs_crud_routes_and_rejects_the_rest(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            response = await client.post("/batch", json={"requests": [
+                {"method": "POST", "path": "/characters", "body": {"name": "Naruto"}},
+                {"path": "/characters/1"},
+                {"path": "/"},
+                {"path": "/changes/stream"},
+                {"path": "/batch"},
+                {"path": "/characters/export"},
+                {"path": "characters"},
+            ]})
+            assert response.status_code == 200
+            responses = response.json()["responses"]
+            assert [item["status"] for item in responses] == [201, 200, 400, 400, 400, 400, 400]
+            assert responses[1]["body"]["name"] == "Naruto"
+            assert responses[1]["headers"]["etag"]
+
+    asyncio.run(scenario())
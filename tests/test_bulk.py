@@ -0,0 +1,28 @@
+import asyncio
+
+from .conftest import api_client
+
+
+def test_upsert_only_updates_sent_fields(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/clans", json={"name": "Uzumaki"})
+            created = await client.post("/characters", json={
+                "name": "Naruto", "external_id": "naruto", "rank": "Genin", "clan_id": 1, "biography": "Jinchuriki del Kyubi",
+            })
+            assert created.status_code == 201
+
+            response = await client.post("/characters/bulk?upsert=true", json=[
+                {"name": "Naruto Uzumaki", "external_id": "naruto"},
+                {"name": "Hinata", "external_id": "hinata", "rank": "Chunin"},
+            ])
+            assert response.status_code == 201
+            results = response.json()["results"]
+            assert [result["status"] for result in results] == ["upserted", "upserted"]
+            assert [result["version"] for result in results] == [2, 1]
+
+            naruto = (await client.get("/characters/1")).json()
+            assert naruto["name"] == "Naruto Uzumaki"
+            assert (naruto["rank"], naruto["clan_id"], naruto["biography"]) == ("Genin", 1, "Jinchuriki del Kyubi")
+
+    asyncio.run(scenario())
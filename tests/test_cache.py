@@ -0,0 +1,47 @@
+import asyncio
+
+from app.utils.cache import response_cache
+
+from .conftest import api_client, recorded_statements, statement_kinds
+
+
+def test_reads_are_cached_until_a_write(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/clans", json={"name": "Hyuga"})
+            hits = response_cache.hits
+
+            first = await client.get("/clans/1")
+            with recorded_statements() as statements:
+                second = await client.get("/clans/1")
+                listed = await client.get("/clans")
+                listed_again = await client.get("/clans")
+            assert second.content == first.content
+            assert listed_again.content == listed.content
+            # Solo el primer listado va a la BD: el detalle y el segundo listado salen de la cache
+            assert statement_kinds(statements) == ["SELECT"]
+            assert response_cache.hits - hits == 2
+
+            await client.patch("/clans/1", json={"description": "Portadores del Byakugan"})
+            assert (await client.get("/clans/1")).json()["description"] == "Portadores del Byakugan"
+            await client.post("/clans", json={"name": "Uchiha"})
+            assert [clan["name"] for clan in (await client.get("/clans")).json()["items"]] == ["Hyuga", "Uchiha"]
+
+            stats = (await client.get("/cache/stats")).json()
+            assert stats["invalidations"] > 0 and stats["entries"] > 0
+
+    asyncio.run(scenario())
+
+
+def test_character_writes_invalidate_clan_members(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/clans", json={"name": "Nara"})
+            await client.post("/characters", json={"name": "Shikamaru", "clan_id": 1})
+            assert [member["name"] for member in (await client.get("/clans/1/true")).json()["members"]] == ["Shikamaru"]
+
+            # La vista de miembros esta en cache, pero la escribe otro router: tiene que invalidarse igual
+            await client.post("/characters", json={"name": "Shikaku", "clan_id": 1})
+            assert [member["name"] for member in (await client.get("/clans/1/true")).json()["members"]] == ["Shikamaru", "Shikaku"]
+
+    asyncio.run(scenario())
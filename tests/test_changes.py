@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import pytest
+
+from app.utils.changes import changes
+
+from .conftest import api_app, http_client
+
+STREAM_SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http", "root_path": "",
+    "method": "GET", "path": "/changes/stream", "raw_path": b"/changes/stream", "query_string": b"resources=character",
+    "headers": [(b"host", b"konohapi")], "client": ("127.0.0.1", 5000), "server": ("konohapi", 80),
+}
+
+
+def sse_events(chunks):
+    # Eventos 'change' del stream SSE recibido hasta ahora
+    events = []
+    for block in b"".join(chunks).decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if fields.get("event") == "change":
+            events.append(json.loads(fields["data"]))
+    return events
+
+
+def test_stream_delivers_changes_and_unsubscribes(database_url):
+    async def scenario():
+        async with api_app(database_url) as app:
+            subscribers = len(changes.broker._subscribers)
+            chunks, disconnected = [], asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.body":
+                    chunks.append(message.get("body", b""))
+
+            stream = asyncio.create_task(app(dict(STREAM_SCOPE), receive, send))
+            while not chunks:
+                await asyncio.sleep(0.01)
+            assert b"event: ready" in chunks[0]
+
+            async with http_client(app) as client:
+                await client.post("/clans", json={"name": "Uzumaki"})
+                await client.post("/characters", json={"name": "Naruto"})
+                await client.post("/characters/bulk", json=[{"name": "Sasuke"}, {"name": "Sakura"}])
+                await client.patch("/characters/1", json={"rank": "Genin"})
+            while len(sse_events(chunks)) < 4:
+                await asyncio.sleep(0.01)
+
+            events = sse_events(chunks)
+            assert {event["resource"] for event in events} == {"character"}
+            assert [(event["op"], event["id"], event["version"]) for event in events] == [
+                ("create", 1, 1), ("create", 2, 1), ("create", 3, 1), ("update", 1, 2),
+            ]
+
+            disconnected.set()
+            await asyncio.wait_for(stream, 5)
+            assert len(changes.broker._subscribers) == subscribers
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_before_body_releases_subscription(database_url):
+    async def scenario():
+        async with api_app(database_url) as app:
+            subscribers = len(changes.broker._subscribers)
+
+            async def receive():
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                # El cliente ya se ha ido: falla el envio de las cabeceras y el cuerpo no llega a empezar
+                raise OSError("connection reset")
+
+            with pytest.raises(OSError):
+                await asyncio.wait_for(app(dict(STREAM_SCOPE), receive, send), 5)
+            assert len(changes.broker._subscribers) == subscribers
+
+    asyncio.run(scenario())
+
+
+def test_resume_after_cursor_replays_missed_events(database_url):
+    async def scenario():
+        async with api_app(database_url) as app:
+            async with http_client(app) as client:
+                await client.post("/jutsus", json={"name": "Rasengan"})
+                cursor = changes.broker.cursor()
+                await client.post("/jutsus", json={"name": "Chidori"})
+
+            resumed = changes.subscribe("sse", {"jutsu"}, cursor)
+            lost = changes.subscribe("sse", None, "otra-epoca-1")
+            try:
+                assert (await resumed.get())["id"] == 2
+                assert resumed.queue.empty()
+                assert (await lost.get()) == {"reset": "resume_unavailable"}
+            finally:
+                changes.unsubscribe(resumed)
+                changes.unsubscribe(lost)
+
+    asyncio.run(scenario())
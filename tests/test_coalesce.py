@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.coalesce import SingleFlight, flight_key
+
+
+def test_flight_key_ignores_query_order():
+    assert flight_key("characters", "list", query=[("b", "2"), ("a", "1")]) == flight_key("characters", "list", query=[("a", "1"), ("b", "2")])
+    assert flight_key("characters", "item", 1) != flight_key("characters", "item", 2)
+
+
+def test_identical_reads_share_one_load():
+    async def scenario():
+        flights, calls = SingleFlight(), 0
+        release = asyncio.Event()
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return calls
+
+        readers = [asyncio.create_task(flights.run("tests", "key", loader, timeout=5)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*readers) == [1] * 5
+        # No es una cache: terminada la carga, la siguiente lectura vuelve a cargar
+        assert flights.in_flight() == 0
+        assert await flights.run("tests", "key", loader, timeout=5) == 2
+
+    asyncio.run(scenario())
+
+
+def test_errors_are_shared_and_slow_leaders_time_out():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise HTTPException(status_code=404)
+
+        results = await asyncio.gather(*(flights.run("tests", "missing", failing, timeout=5) for _ in range(3)), return_exceptions=True)
+        assert [result.status_code for result in results] == [404, 404, 404]
+
+        async def stuck():
+            await asyncio.sleep(10)
+
+        leader = asyncio.create_task(flights.run("tests", "stuck", stuck, timeout=5))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as timed_out:
+            await flights.run("tests", "stuck", stuck, timeout=0.01)
+        assert timed_out.value.status_code == 504
+        # La clave se libera para que las siguientes peticiones no esperen al lider atascado
+        assert flights.in_flight() == 0
+        leader.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_follower_takes_over_when_the_leader_is_cancelled():
+    async def scenario():
+        flights, calls = SingleFlight(), 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        leader = asyncio.create_task(flights.run("tests", "key", loader, timeout=5))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.run("tests", "key", loader, timeout=5))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == 2
+
+    asyncio.run(scenario())
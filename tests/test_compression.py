@@ -0,0 +1,53 @@
+import asyncio
+
+from app.config.settings import settings
+
+from .conftest import api_client
+
+BIOGRAPHY = "Hijo del Cuarto Hokage y jinchuriki del Kyubi. " * 60
+
+
+def test_compressed_responses_carry_encoded_etags(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/characters", json={"name": "Naruto", "biography": BIOGRAPHY})
+            await client.post("/characters", json={"name": "Konohamaru"})
+
+            plain = await client.get("/characters/1", headers={"Accept-Encoding": "identity"})
+            gzipped = await client.get("/characters/1", headers={"Accept-Encoding": "gzip"})
+            assert "content-encoding" not in plain.headers
+            assert gzipped.headers["content-encoding"] == "gzip"
+            assert "accept-encoding" in gzipped.headers["vary"].lower()
+            assert gzipped.content == plain.content
+            # Otro ETag para otros bytes: el del recurso con la codificacion como sufijo
+            assert gzipped.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+
+            # Cualquiera de los dos ETags identifica la misma version
+            for etag in (plain.headers["etag"], gzipped.headers["etag"]):
+                not_modified = await client.get("/characters/1", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+                assert not_modified.status_code == 304
+                assert not_modified.headers["etag"] == gzipped.headers["etag"]
+            updated = await client.patch("/characters/1", json={"rank": "Genin"}, headers={"If-Match": gzipped.headers["etag"]})
+            assert updated.status_code == 200
+
+            # Por debajo de COMPRESSION_MIN_SIZE no compensa comprimir
+            small = await client.get("/characters/2", headers={"Accept-Encoding": "gzip"})
+            assert "content-encoding" not in small.headers
+            assert not small.headers["etag"].endswith('-gzip"')
+
+    asyncio.run(scenario())
+
+
+def test_large_bodies_are_compressed_in_the_threadpool(database_url, monkeypatch):
+    monkeypatch.setattr(settings, "COMPRESSION_THREADPOOL_SIZE", 1)
+
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/clans", json={"name": "Uzumaki", "description": BIOGRAPHY})
+            plain = await client.get("/clans/1", headers={"Accept-Encoding": "identity"})
+            for _ in range(2):
+                gzipped = await client.get("/clans/1", headers={"Accept-Encoding": "gzip"})
+                assert gzipped.headers["content-encoding"] == "gzip"
+                assert gzipped.content == plain.content
+
+    asyncio.run(scenario())
@@ -0,0 +1,47 @@
+import asyncio
+
+from sqlalchemy import text
+
+from app.db.session import get_engine
+
+from .conftest import api_client
+
+
+def test_conditional_get_and_if_match(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/characters", json={"name": "Kakashi"})
+            first = await client.get("/characters/1")
+            etag = first.headers["etag"]
+
+            assert (await client.get("/characters/1", headers={"If-None-Match": etag})).status_code == 304
+
+            updated = await client.patch("/characters/1", json={"rank": "Jonin"}, headers={"If-Match": etag})
+            assert updated.status_code == 200
+            assert (await client.get("/characters/1", headers={"If-None-Match": etag})).status_code == 200
+
+            # El ETag ya no es el actual: la escritura no se aplica
+            stale = await client.patch("/characters/1", json={"rank": "Hokage"}, headers={"If-Match": etag})
+            assert stale.status_code == 412
+            assert (await client.delete("/characters/1", headers={"If-Match": etag})).status_code == 412
+            assert (await client.patch("/characters/1", json={"rank": "Hokage"}, headers={"If-Match": "W/\"abc\""})).status_code == 412
+            assert (await client.get("/characters/1")).json()["rank"] == "Jonin"
+
+            assert (await client.delete("/characters/1", headers={"If-Match": "*"})).status_code == 204
+
+    asyncio.run(scenario())
+
+
+def test_if_match_on_rows_without_microseconds(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/jutsus", json={"name": "Kage Bunshin"})
+            # Como las filas que rellena la migracion con CURRENT_TIMESTAMP: sin microsegundos
+            async with get_engine().begin() as connection:
+                await connection.execute(text("UPDATE jutsu SET updated_at = CURRENT_TIMESTAMP"))
+
+            etag = (await client.get("/jutsus/1")).headers["etag"]
+            response = await client.patch("/jutsus/1", json={"rank": "B"}, headers={"If-Match": etag})
+            assert response.status_code == 200
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+import asyncio
+
+from sqlalchemy import event
+
+from app.models.db_models import Character, Jutsu
+from app.routers.characters import character_config
+from app.routers.clans import clan_config
+
+from .conftest import api_client
+
+
+class LoadCounter:
+    """
+    Cuenta las filas que el ORM materializa para un modelo (evento 'load'), no las que se serializan.
+    """
+
+    def __init__(self, DBModel):
+        self.DBModel = DBModel
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(self.DBModel, "load", self._on_load)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.DBModel, "load", self._on_load)
+
+    def _on_load(self, target, context):
+        self.count += 1
+
+
+def test_expand_members_limits_fetched_rows(database_url, monkeypatch):
+    monkeypatch.setattr(clan_config, "max_expand_items", 3)
+
+    async def scenario():
+        async with api_client(database_url) as client:
+            for name in ("Uchiha", "Hyuga"):
+                await client.post("/clans", json={"name": name})
+            members = [{"name": f"Ninja {index}", "clan_id": 1 + index % 2} for index in range(20)]
+            assert (await client.post("/characters/bulk", json=members)).status_code == 201
+
+            with LoadCounter(Character) as loaded:
+                response = await client.get("/clans?expand=members")
+            assert response.status_code == 200
+            clans = response.json()["items"]
+            assert [len(clan["members"]) for clan in clans] == [3, 3]
+            # Ids consecutivos de cada clan: los primeros por id
+            assert [member["id"] for member in clans[0]["members"]] == [1, 3, 5]
+            assert loaded.count == 6
+
+    asyncio.run(scenario())
+
+
+def test_expand_many_to_many_limits_fetched_rows(database_url, monkeypatch):
+    monkeypatch.setattr(character_config, "max_expand_items", 2)
+
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/characters/bulk", json=[{"name": "Naruto"}, {"name": "Sasuke"}])
+            await client.post("/jutsus/bulk", json=[{"name": f"Jutsu {index}"} for index in range(5)])
+            for character_id in (1, 2):
+                await client.post(f"/characters/{character_id}/jutsus", json=[{"jutsu_id": jutsu_id} for jutsu_id in range(1, 6)])
+
+            with LoadCounter(Jutsu) as loaded:
+                response = await client.get("/characters/1?expand=jutsus.users")
+            assert response.status_code == 200
+            character = response.json()
+            assert [jutsu["id"] for jutsu in character["jutsus"]] == [1, 2]
+            assert all(len(jutsu["users"]) == 2 for jutsu in character["jutsus"])
+            assert loaded.count == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,36 @@
+import asyncio
+import csv
+import io
+import json
+
+from app.routers.characters import character_config
+
+from .conftest import api_client
+
+
+def test_export_streams_every_row(database_url, monkeypatch):
+    # Bloques pequenos para que la exportacion necesite varias vueltas del cursor
+    monkeypatch.setattr(character_config, "export_chunk_size", 2)
+
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/characters/bulk", json=[
+                {"name": f"Genin {number}", "rank": "Genin" if number % 2 else "Chunin"} for number in range(1, 8)
+            ])
+
+            ndjson = await client.get("/characters/export")
+            assert ndjson.status_code == 200
+            assert ndjson.headers["content-type"] == "application/x-ndjson"
+            assert ndjson.headers["content-disposition"] == 'attachment; filename="characters.ndjson"'
+            rows = [json.loads(line) for line in ndjson.text.splitlines()]
+            assert [row["id"] for row in rows] == list(range(1, 8))
+
+            exported = await client.get("/characters/export?format=csv&rank=Genin")
+            assert exported.headers["content-type"].startswith("text/csv")
+            header, *records = list(csv.reader(io.StringIO(exported.text)))
+            assert {"id", "name", "rank"} <= set(header)
+            assert [record[header.index("name")] for record in records] == ["Genin 1", "Genin 3", "Genin 5", "Genin 7"]
+
+            assert (await client.get("/characters/export?format=xml")).status_code == 422
+
+    asyncio.run(scenario())
@@ -0,0 +1,33 @@
+import asyncio
+
+from .conftest import api_client, recorded_statements
+
+
+def test_fields_are_projected_into_the_select(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/characters", json={"name": "Itachi", "rank": "Anbu", "biography": "Una biografia muy larga"})
+
+            with recorded_statements() as statements:
+                listed = await client.get("/characters?fields=name,rank")
+                detail = await client.get("/characters/1?fields=name")
+            assert listed.json()["items"] == [{"name": "Itachi", "rank": "Anbu"}]
+            assert detail.json() == {"name": "Itachi"}
+            assert detail.headers["etag"]
+            # Las columnas que no se piden no se leen de la BD
+            assert statements and all("biography" not in statement for statement in statements)
+
+            assert (await client.get("/characters?ids=1&fields=rank")).json()["items"] == [{"rank": "Anbu"}]
+            assert (await client.get("/characters?fields=name,version")).status_code == 400
+
+    asyncio.run(scenario())
+
+
+def test_fields_on_cached_resources(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/jutsus", json={"name": "Rasengan", "type": "Ninjutsu", "rank": "A"})
+            assert (await client.get("/jutsus/1?fields=type")).json() == {"type": "Ninjutsu"}
+            assert (await client.get("/jutsus?fields=name&sort=name")).json()["items"] == [{"name": "Rasengan"}]
+
+    asyncio.run(scenario())
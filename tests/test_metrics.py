@@ -0,0 +1,38 @@
+import asyncio
+import re
+
+from app.config.settings import settings
+
+from .conftest import api_client
+
+
+def metric_value(text: str, line_prefix: str) -> float:
+    # Valor de la serie que empieza por line_prefix en la salida de /metrics (0 si aun no existe)
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_requests_are_measured_per_route_template(database_url, monkeypatch):
+    monkeypatch.setattr(settings, "SERVER_TIMING", True)
+    detail_count = 'konohapi_http_request_duration_seconds_count{method="GET",route="/characters/{item_id}",status="200"}'
+    query_sum = 'konohapi_http_request_queries_sum{method="GET",route="/characters/{item_id}"}'
+
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/characters", json={"name": "Might Guy"})
+            await client.post("/characters", json={"name": "Rock Lee"})
+            before = (await client.get("/metrics")).text
+
+            response = await client.get("/characters/1")
+            assert re.search(r'db;dur=[\d.]+;desc="1 queries"', response.headers["server-timing"])
+            await client.get("/characters/2")
+
+            after = (await client.get("/metrics")).text
+            assert metric_value(after, detail_count) - metric_value(before, detail_count) == 2
+            assert metric_value(after, query_sum) - metric_value(before, query_sum) == 2
+            # Una serie por plantilla de ruta, nunca por id
+            assert "/characters/1" not in after
+
+    asyncio.run(scenario())
@@ -0,0 +1,50 @@
+import asyncio
+
+from .conftest import api_client
+
+NAMES = ["Naruto", "Sasuke", "Sakura", "Kakashi", "Shikamaru", "Hinata", "Neji"]
+
+
+async def collect(client, query: str):
+    # Recorre todas las paginas siguiendo next_cursor
+    names, cursor = [], None
+    while True:
+        params = f"{query}&cursor={cursor}" if cursor else query
+        body = (await client.get(f"/characters?{params}")).json()
+        names += [item["name"] for item in body["items"]]
+        assert body["meta"]["count"] == len(body["items"])
+        if not body["meta"]["has_more"]:
+            assert body["meta"]["next_cursor"] is None
+            return names
+        cursor = body["meta"]["next_cursor"]
+
+
+def test_keyset_pagination_filters_and_sort(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            for index, name in enumerate(NAMES):
+                await client.post("/characters", json={"name": name, "rank": "Genin" if index % 2 else "Chunin"})
+
+            assert await collect(client, "limit=3") == NAMES
+            assert await collect(client, "limit=2&sort=name") == sorted(NAMES)
+            assert await collect(client, "limit=2&sort=-name") == sorted(NAMES, reverse=True)
+            assert await collect(client, "limit=2&rank=Genin") == NAMES[1::2]
+            assert await collect(client, "limit=2&name=Sa&sort=name") == ["Sakura", "Sasuke"]
+
+    asyncio.run(scenario())
+
+
+def test_invalid_paging_parameters(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            for name in NAMES[:3]:
+                await client.post("/characters", json={"name": name})
+            cursor = (await client.get("/characters?limit=1&sort=name")).json()["meta"]["next_cursor"]
+
+            assert (await client.get("/characters?sort=biography")).status_code == 400
+            assert (await client.get("/characters?cursor=basura")).status_code == 400
+            # El cursor guarda la ordenacion: no vale para otra distinta
+            assert (await client.get(f"/characters?cursor={cursor}&sort=rank")).status_code == 400
+            assert (await client.get("/characters?limit=0")).status_code == 422
+
+    asyncio.run(scenario())
@@ -0,0 +1,58 @@
+import asyncio
+
+from app.db.session import READ_YOUR_WRITES_COOKIE
+
+from .conftest import api_client
+
+
+def replica_url(database_url: str) -> str:
+    # Misma BD con otra URL: basta para que el engine de lectura sea distinto del principal
+    return f"{database_url}?replica=1"
+
+
+def test_bulk_partial_success_sets_cookie(database_url):
+    async def scenario():
+        async with api_client(database_url, replica_url(database_url)) as client:
+            response = await client.post(
+                "/characters/bulk?atomic=false",
+                json=[{"name": "Naruto", "external_id": "naruto"}, {"name": "Menma", "external_id": "naruto"}],
+            )
+            assert response.status_code == 207
+            assert response.json()["committed"] is True
+            assert READ_YOUR_WRITES_COOKIE in response.cookies
+
+    asyncio.run(scenario())
+
+
+def test_failed_write_does_not_set_cookie(database_url):
+    async def scenario():
+        async with api_client(database_url, replica_url(database_url)) as client:
+            response = await client.patch("/characters/1", json={"name": "Kakashi"})
+            assert response.status_code == 404
+            assert READ_YOUR_WRITES_COOKIE not in response.cookies
+
+    asyncio.run(scenario())
+
+
+def test_no_cookie_without_replica(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            response = await client.post("/characters", json={"name": "Naruto"})
+            assert response.status_code == 201
+            assert READ_YOUR_WRITES_COOKIE not in response.cookies
+
+    asyncio.run(scenario())
+
+
+def test_forget_jutsu_sets_cookie(database_url):
+    async def scenario():
+        async with api_client(database_url, replica_url(database_url)) as client:
+            await client.post("/characters", json={"name": "Naruto"})
+            await client.post("/jutsus", json={"name": "Rasengan"})
+            await client.post("/characters/1/jutsus", json=[{"jutsu_id": 1}])
+            client.cookies.clear()
+            response = await client.delete("/characters/1/jutsus/1")
+            assert response.status_code == 204
+            assert READ_YOUR_WRITES_COOKIE in response.cookies
+
+    asyncio.run(scenario())
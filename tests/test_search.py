@@ -0,0 +1,36 @@
+import asyncio
+
+from .conftest import api_client
+
+
+async def seed_and_search(client):
+    await client.post("/clans", json={"name": "Uchiha", "description": "Portadores del Sharingan"})
+    await client.post("/characters", json={"name": "Sasuke", "full_name": "Sasuke Uchiha", "clan_id": 1})
+    await client.post("/characters", json={"name": "Naruto", "biography": "Amigo de Sasuke"})
+    await client.post("/jutsus", json={"name": "Chidori"})
+    response = await client.get("/search", params={"q": "sasu"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_search_ranks_names_above_biographies(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            results = await seed_and_search(client)
+            assert [hit["name"] for hit in results["characters"]] == ["Sasuke", "Naruto"]
+            assert results["clans"] == [] and results["jutsus"] == []
+
+            await client.patch("/characters/1", json={"name": "Itachi", "full_name": "Itachi Uchiha"})
+            renamed = (await client.get("/search", params={"q": "itachi", "types": "characters"})).json()
+            assert [hit["id"] for hit in renamed["characters"]] == [1]
+
+    asyncio.run(scenario())
+
+
+def test_search_on_database_built_by_migrations(migrated_database_url):
+    async def scenario():
+        async with api_client(migrated_database_url, create_tables=False) as client:
+            results = await seed_and_search(client)
+            assert [hit["name"] for hit in results["characters"]] == ["Sasuke", "Naruto"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,42 @@
+import asyncio
+
+from app.models.schemas import CharacterRead, ClanRead, JutsuRead
+from app.routers.characters import character_config
+
+from .conftest import api_client
+
+
+def test_detail_matches_read_schema(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/clans", json={"name": "Uzumaki"})
+            await client.post("/jutsus", json={"name": "Rasengan"})
+            await client.post("/characters", json={"name": "Naruto", "external_id": "naruto", "clan_id": 1})
+
+            for path, schema in (("/characters/1", CharacterRead), ("/clans/1", ClanRead), ("/jutsus/1", JutsuRead)):
+                # La segunda lectura sale de la cache en los recursos que la tienen
+                for _ in range(2):
+                    response = await client.get(path)
+                    assert response.status_code == 200
+                    assert set(response.json()) == set(schema.model_fields)
+                    assert response.headers["etag"]
+
+            expanded = (await client.get("/characters/1?expand=clan")).json()
+            assert set(expanded) == set(CharacterRead.model_fields) | {"clan"}
+
+    asyncio.run(scenario())
+
+
+def test_fast_and_default_serialization_agree(database_url, monkeypatch):
+    async def read_all(client):
+        return [(await client.get(path)).json() for path in ("/characters", "/characters/1", "/characters?ids=1,2")]
+
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/characters", json={"name": "Gaara", "rank": "Kazekage"})
+            await client.post("/characters", json={"name": "Temari"})
+            fast = await read_all(client)
+            monkeypatch.setattr(character_config, "fast_serialization", False)
+            assert await read_all(client) == fast
+
+    asyncio.run(scenario())
@@ -0,0 +1,41 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+from app.db import session
+from app.main import create_app
+
+from .conftest import api_client
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_import_creates_no_engine():
+    # Proceso nuevo: en este ya hay modulos importados por otros tests
+    code = "import app.main, app.db.session as session; assert session._engine is None; app.main.create_app(); assert session._engine is None"
+    subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, check=True)
+
+
+def test_lifespan_creates_and_disposes_engines(database_url):
+    async def scenario():
+        app = create_app(database_url)
+        await session.dispose_engines()
+        async with app.router.lifespan_context(app):
+            assert session.get_engine().url.database.endswith("konohapi.db")
+        assert session._engine is None
+
+    asyncio.run(scenario())
+
+
+def test_ready_pings_every_database(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            body = (await client.get("/ready")).json()
+            assert body["status"] == "ok" and list(body["databases"]) == ["primary"]
+        async with api_client(database_url, f"{database_url}?replica=1") as client:
+            body = (await client.get("/ready")).json()
+            assert list(body["databases"]) == ["primary", "replica"]
+            assert all(database["status"] == "ok" for database in body["databases"].values())
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+import asyncio
+
+from .conftest import api_client
+
+
+def test_stats_follow_every_write(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/clans", json={"name": "Uchiha"})
+            await client.post("/clans", json={"name": "Senju"})
+            await client.post("/characters/bulk", json=[
+                {"name": "Sasuke", "rank": "Genin", "clan_id": 1},
+                {"name": "Itachi", "rank": "Anbu", "clan_id": 1},
+                {"name": "Tsunade", "clan_id": 2},
+                {"name": "Naruto", "rank": "Genin"},
+            ])
+            await client.post("/jutsus", json={"name": "Chidori"})
+            await client.post("/jutsus", json={"name": "Amaterasu"})
+            await client.post("/characters/1/jutsus", json=[{"jutsu_id": 1}, {"jutsu_id": 2}])
+            await client.post("/jutsus/2/users", json=[{"character_id": 2}])
+
+            clans = (await client.get("/stats/clans")).json()
+            assert [(clan["name"], clan["members"]) for clan in clans["clans"]] == [("Uchiha", 2), ("Senju", 1)]
+            assert clans["without_clan"] == 1
+            ranks = (await client.get("/stats/ranks")).json()
+            assert ranks == [{"rank": "Genin", "characters": 2}, {"rank": "Anbu", "characters": 1}, {"rank": None, "characters": 1}]
+            jutsus = (await client.get("/stats/jutsus")).json()
+            assert [(jutsu["name"], jutsu["learners"]) for jutsu in jutsus] == [("Amaterasu", 2), ("Chidori", 1)]
+
+            # Cambiar de clan, borrar y olvidar un jutsu mueven los contadores
+            await client.patch("/characters/4", json={"clan_id": 2})
+            await client.delete("/characters/3")
+            await client.delete("/characters/1/jutsus/2")
+            clans = (await client.get("/stats/clans")).json()
+            assert sorted((clan["name"], clan["members"]) for clan in clans["clans"]) == [("Senju", 1), ("Uchiha", 2)]
+            assert clans["without_clan"] == 0
+            jutsus = (await client.get("/stats/jutsus")).json()
+            assert sorted((jutsu["name"], jutsu["learners"]) for jutsu in jutsus) == [("Amaterasu", 1), ("Chidori", 1)]
+
+    asyncio.run(scenario())
+
+
+def test_stats_on_database_built_by_migrations(migrated_database_url):
+    async def scenario():
+        async with api_client(migrated_database_url, create_tables=False) as client:
+            await client.post("/clans", json={"name": "Hyuga"})
+            await client.post("/characters", json={"name": "Neji", "rank": "Jonin", "clan_id": 1})
+            await client.post("/characters", json={"name": "Hinata", "rank": "Genin", "clan_id": 1})
+            clans = (await client.get("/stats/clans")).json()
+            assert [(clan["name"], clan["members"]) for clan in clans["clans"]] == [("Hyuga", 2)]
+
+    asyncio.run(scenario())
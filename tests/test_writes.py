@@ -0,0 +1,46 @@
+import asyncio
+
+from app.routers.characters import character_config
+
+from .conftest import api_client, recorded_statements, statement_kinds
+
+
+def test_writes_use_a_single_returning_statement(database_url):
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/characters", json={"name": "Jiraiya", "rank": "Sannin"})
+
+            with recorded_statements() as statements:
+                patched = await client.patch("/characters/1", json={"rank": "Gama Sennin"})
+            assert patched.status_code == 200
+            assert patched.json()["rank"] == "Gama Sennin"
+            assert statement_kinds(statements) == ["UPDATE"]
+
+            put = await client.put("/characters/1", json={"name": "Jiraiya"})
+            assert put.status_code == 200
+            # PUT sustituye el elemento: lo que no se envia queda vacio
+            assert put.json()["rank"] is None
+
+            with recorded_statements() as statements:
+                assert (await client.delete("/characters/1")).status_code == 204
+            assert statement_kinds(statements) == ["DELETE"]
+
+            assert (await client.patch("/characters/1", json={"rank": "Sannin"})).status_code == 404
+            assert (await client.delete("/characters/1")).status_code == 404
+
+    asyncio.run(scenario())
+
+
+def test_orm_path_gives_the_same_results(database_url, monkeypatch):
+    monkeypatch.setattr(character_config, "use_returning", False)
+
+    async def scenario():
+        async with api_client(database_url) as client:
+            await client.post("/characters", json={"name": "Tsunade", "rank": "Sannin"})
+            patched = await client.patch("/characters/1", json={"rank": "Hokage"})
+            assert (patched.status_code, patched.json()["rank"]) == (200, "Hokage")
+            assert patched.headers["etag"].startswith('"2-')
+            assert (await client.delete("/characters/1")).status_code == 204
+            assert (await client.get("/characters/1")).status_code == 404
+
+    asyncio.run(scenario())